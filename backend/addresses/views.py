@@ -2,6 +2,7 @@ from addresses.filters import AddressFilter
 from addresses.models import Address, City, Country, Region
 from addresses.serializers import (AddressSerializer, CitySerializer,
                                    CountrySerializer, RegionSerializer)
+from core.pagination import KeysetPaginator
 from core.permissions import IsAdmin, IsOwner, ReadOnly
 from django_filters import rest_framework as filters
 from rest_framework import viewsets
@@ -31,3 +32,5 @@ class AddressViewSet(viewsets.ModelViewSet):
     queryset = Address.objects.all()
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = AddressFilter
+    pagination_class = KeysetPaginator
+    estimate_count = True
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from attributes.models import Attribute, DataType, Unit
+from attributes.models import Attribute, AttributeName, AttributeValue, DataType, Unit
 
 
 @admin.register(Unit)
@@ -16,3 +16,14 @@ class AttributeAdmin(admin.ModelAdmin):
 @admin.register(DataType)
 class DataTypeAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(AttributeName)
+class AttributeNameAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+
+@admin.register(AttributeValue)
+class AttributeValueAdmin(admin.ModelAdmin):
+    list_display = ('attribute', 'object_id', 'name', 'number', 'unit', 'choice', 'boolean')
+    raw_id_fields = ('attribute', 'name', 'choice')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from attributes.models import StrTypeChoice
+from attributes.resolvers import resolver
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ключи вариантов строк StrTypeChoice и объединяет варианты с одинаковым ключом.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            removed, changed = StrTypeChoice.dedupe()
+            transaction.on_commit(lambda: resolver.invalidate('choices'))
+        self.stdout.write(self.style.SUCCESS(f'Удалено дублей: {removed}, обновлено ключей: {changed}'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from attributes.models import AttributeValue
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает проекцию значений атрибутов AttributeValue по атрибутам.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = AttributeValue.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Строк значений: {count}'))
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_attribute_values(apps, schema_editor):
+    Attribute = apps.get_model('attributes', 'Attribute')
+    AttributeName = apps.get_model('attributes', 'AttributeName')
+    AttributeValue = apps.get_model('attributes', 'AttributeValue')
+
+    names = Attribute.objects.values_list('data_type__name', flat=True).distinct().order_by()
+    AttributeName.objects.bulk_create(AttributeName(name=name) for name in names)
+    name_ids = dict(AttributeName.objects.values_list('name', 'pk'))
+
+    rows = Attribute.objects.order_by().values_list(
+        'pk', 'content_type_id', 'object_id', 'data_type__name', 'data_type__strtype__value',
+        'data_type__inttype__value', 'data_type__inttype__unit', 'data_type__floattype__value',
+        'data_type__floattype__unit', 'data_type__booltype__value',
+    )
+    values = []
+    for attribute_id, content_type_id, object_id, name, choice_id, int_value, int_unit, float_value, float_unit, bool_value in rows.iterator(chunk_size=5000):
+        value = AttributeValue(attribute_id=attribute_id, content_type_id=content_type_id, object_id=object_id, name_id=name_ids[name])
+        if choice_id is not None:
+            value.choice_id = choice_id
+        elif bool_value is not None:
+            value.boolean = bool_value
+        elif int_value is not None:
+            value.number, value.unit_id = int_value, int_unit
+        elif float_value is not None:
+            value.number, value.unit_id = float_value, float_unit
+        else:
+            continue
+        values.append(value)
+    AttributeValue.objects.bulk_create(values, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attributes', '0011_alter_attribute_content_type'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttributeName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='название')),
+            ],
+            options={
+                'verbose_name': 'название атрибута',
+                'verbose_name_plural': 'названия атрибутов',
+            },
+        ),
+        migrations.CreateModel(
+            name='AttributeValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('number', models.FloatField(blank=True, null=True, verbose_name='число')),
+                ('boolean', models.BooleanField(blank=True, null=True, verbose_name='логическое значение')),
+                ('attribute', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='attributes.attribute', verbose_name='атрибут')),
+                ('choice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='attributes.strtypechoice', verbose_name='вариант')),
+                ('content_type', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('name', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='attributes.attributename', verbose_name='название')),
+                ('unit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='attributes.unit', verbose_name='единица измерения')),
+            ],
+            options={
+                'verbose_name': 'значение атрибута',
+                'verbose_name_plural': 'значения атрибутов',
+                'indexes': [models.Index(condition=models.Q(('number__isnull', False)), fields=['content_type', 'name', 'number', 'object_id'], name='attributes_value_number_idx'), models.Index(condition=models.Q(('choice__isnull', False)), fields=['content_type', 'name', 'choice', 'object_id'], name='attributes_value_choice_idx'), models.Index(condition=models.Q(('boolean__isnull', False)), fields=['content_type', 'name', 'boolean', 'object_id'], name='attributes_value_bool_idx'), models.Index(fields=['content_type', 'object_id'], name='attributes_value_object_idx')],
+            },
+        ),
+        migrations.RunPython(fill_attribute_values, migrations.RunPython.noop),
+    ]
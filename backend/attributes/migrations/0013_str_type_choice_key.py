@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:52
+
+from attributes.parsers import normalize_choice
+from django.db import migrations, models
+
+
+def fill_str_type_choice_keys(apps, schema_editor):
+    StrTypeChoice = apps.get_model('attributes', 'StrTypeChoice')
+    AttributeValue = apps.get_model('attributes', 'AttributeValue')
+    through = apps.get_model('attributes', 'StrType').value.through
+
+    groups = {}
+    for pk, name in StrTypeChoice.objects.order_by('pk').values_list('pk', 'name').iterator(chunk_size=5000):
+        groups.setdefault(normalize_choice(name), []).append(pk)
+
+    for keeper_id, *duplicate_ids in groups.values():
+        for duplicate_id in duplicate_ids:
+            through.objects.filter(
+                strtypechoice_id=duplicate_id,
+                strtype_id__in=through.objects.filter(strtypechoice_id=keeper_id).values('strtype_id'),
+            ).delete()
+            through.objects.filter(strtypechoice_id=duplicate_id).update(strtypechoice_id=keeper_id)
+            AttributeValue.objects.filter(
+                choice_id=duplicate_id,
+                attribute_id__in=AttributeValue.objects.filter(choice_id=keeper_id).values('attribute_id'),
+            ).delete()
+            AttributeValue.objects.filter(choice_id=duplicate_id).update(choice_id=keeper_id)
+        if duplicate_ids:
+            StrTypeChoice.objects.filter(pk__in=duplicate_ids).delete()
+
+    StrTypeChoice.objects.bulk_update(
+        (StrTypeChoice(pk=pks[0], key=key) for key, pks in groups.items()),
+        ('key',),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attributes', '0012_attribute_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='strtypechoice',
+            name='key',
+            field=models.CharField(editable=False, max_length=100, null=True, verbose_name='ключ'),
+        ),
+        migrations.RunPython(fill_str_type_choice_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='strtypechoice',
+            name='key',
+            field=models.CharField(editable=False, max_length=100, unique=True, verbose_name='ключ'),
+        ),
+    ]
@@ -1,11 +1,18 @@
-import re
+from functools import reduce
+from operator import or_
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from django.db.models import Model, UniqueConstraint
+from django.db import connection, models, transaction
+from django.db.models import Count, Exists, Model, OuterRef, Q, QuerySet, UniqueConstraint, Value
+from django.db.models.functions import Cast, Concat
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from polymorphic.models import PolymorphicModel
+from attributes.parsers import find_unit, normalize_choice, parse_raw_value
+from attributes.resolvers import resolver
+from core.cache import bump_cache_version
 from rest_framework.exceptions import ValidationError
 
 
@@ -31,13 +38,128 @@ class AttrCategory(models.Model):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def get_ids(names) -> dict:
+        """Словарь `{название: id}`, недостающие категории создаются одной вставкой."""
+        names = set(names)
+        if not names:
+            return {}
+        AttrCategory.objects.bulk_create((AttrCategory(name=name) for name in names), ignore_conflicts=True)
+        return dict(AttrCategory.objects.filter(name__in=names).values_list('name', 'pk'))
+
 
 class StrTypeChoice(models.Model):
+    """
+    Модель варианта значения строкового типа данных.
+
+    Варианты сопоставляются по нормализованному ключу `key` точным совпадением
+    по уникальному индексу, см. `attributes.parsers.normalize_choice()`.
+
+    ### Fields:
+    - name (`CharField`): Вариант в исходном написании.
+    - key (`CharField`): Нормализованный ключ, заполняется при сохранении.
+
+    ### Methods:
+    - get_or_create_many(values): Варианты по набору строк с созданием недостающих.
+    - merge(keeper_id, duplicate_ids): Переносит связи дублей на вариант и удаляет дубли.
+    - dedupe(): Пересчитывает ключи и объединяет совпавшие варианты.
+
+    """
     name = models.CharField(max_length=100)
+    key = models.CharField(_('ключ'), max_length=100, unique=True, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.key = normalize_choice(self.name)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_or_create_many(values) -> dict:
+        """
+        Статический метод получения вариантов по набору строк.
+
+        Существующие варианты находятся одним запросом по ключам, недостающие создаются
+        одной вставкой, пропускающей конфликты с параллельными вставками.
+
+        ### Args:
+        - values (`Iterable[str]`): Строки вариантов.
+
+        ### Returns:
+        - `dict`: Словарь `{ключ: StrTypeChoice}`.
+
+        """
+        names = {}
+        for value in values:
+            names.setdefault(normalize_choice(value), value.strip())
+        choices = StrTypeChoice.objects.in_bulk(names, field_name='key')
+        missing = names.keys() - choices.keys()
+        if missing:
+            StrTypeChoice.objects.bulk_create(
+                (StrTypeChoice(name=names[key], key=key) for key in missing),
+                ignore_conflicts=True,
+            )
+            choices.update(StrTypeChoice.objects.in_bulk(missing, field_name='key'))
+        return choices
+
+    @staticmethod
+    def merge(keeper_id: int, duplicate_ids) -> None:
+        """
+        Статический метод объединения вариантов.
+
+        Связи `StrType.value` и строки `AttributeValue` дублей переносятся на `keeper_id`
+        (кроме уже существующих у того же типа данных или атрибута), дубли удаляются.
+
+        """
+        through = StrType.value.through
+        for duplicate_id in duplicate_ids:
+            through.objects.filter(
+                strtypechoice_id=duplicate_id,
+                strtype_id__in=through.objects.filter(strtypechoice_id=keeper_id).values('strtype_id'),
+            ).delete()
+            through.objects.filter(strtypechoice_id=duplicate_id).update(strtypechoice_id=keeper_id)
+            AttributeValue.objects.filter(
+                choice_id=duplicate_id,
+                attribute_id__in=AttributeValue.objects.filter(choice_id=keeper_id).values('attribute_id'),
+            ).delete()
+            AttributeValue.objects.filter(choice_id=duplicate_id).update(choice_id=keeper_id)
+        StrTypeChoice.objects.filter(pk__in=duplicate_ids).delete()
+
+    @staticmethod
+    def dedupe() -> tuple:
+        """
+        Статический метод пересчета ключей и объединения вариантов с одинаковым ключом
+        в вариант с наименьшим `id`.
+
+        ### Returns:
+        - `tuple`: Пара `(количество удаленных дублей, количество обновленных ключей)`.
+
+        """
+        groups = {}
+        for pk, name in StrTypeChoice.objects.order_by('pk').values_list('pk', 'name').iterator(chunk_size=5000):
+            groups.setdefault(normalize_choice(name), []).append(pk)
+
+        removed = 0
+        for keeper_id, *duplicate_ids in groups.values():
+            if duplicate_ids:
+                StrTypeChoice.merge(keeper_id, duplicate_ids)
+                removed += len(duplicate_ids)
+
+        keys = {pks[0]: key for key, pks in groups.items()}
+        changed = [
+            StrTypeChoice(pk=pk, key=keys[pk])
+            for pk, key in StrTypeChoice.objects.values_list('pk', 'key').iterator(chunk_size=5000)
+            if keys.get(pk) != key
+        ]
+        if changed:
+            # Временные ключи в верхнем регистре не совпадают ни с одним нормализованным ключом.
+            StrTypeChoice.objects.filter(pk__in=[choice.pk for choice in changed]).update(
+                key=Concat(Value('TMP:'), Cast('pk', models.CharField()), output_field=models.CharField()),
+            )
+            StrTypeChoice.objects.bulk_update(changed, ('key',), batch_size=5000)
+        return removed, len(changed)
+
 
 class Unit(models.Model):
     """
@@ -68,12 +190,29 @@ class DataType(PolymorphicModel):
     ### Fields:
     - name (`CharField`): Название типа данных.
 
+    ### Attributes:
+    - SUBTYPES (`tuple`): Пары (краткое название типа, обратная связь на таблицу наследника).
+    - BOOL_VALUES (`dict`): Строковые представления логических значений в фильтрах.
+
     ### Methods:
     - __str__(): Возвращает строковое представление объекта.
     - parse_value_get_or_create(data_type_name, data_type_value): Статический метод для разбора значения атрибута и создания или получения объекта типа данных.
     - parse_value(input_string, params): Статический метод для разбора значения атрибута.
+    - get_or_create_many(keys): Статический метод получения и создания типов данных по набору ключей.
 
     """
+    SUBTYPES = (
+        ('int', 'inttype'),
+        ('float', 'floattype'),
+        ('bool', 'booltype'),
+        ('str', 'strtype'),
+    )
+    BOOL_VALUES = {
+        'true': True, '1': True, 'да': True, 'есть': True,
+        'false': False, '0': False, 'нет': False,
+    }
+    INSERT_BATCH_SIZE = 5000
+
     name = models.CharField(max_length=100)
 
     def __str__(self):
@@ -84,6 +223,10 @@ class DataType(PolymorphicModel):
         """
         Статический метод для разбора значения атрибута и создания или получения объекта типа данных.
 
+        Тип данных подбирается по тому же ключу, что и в `DataType.get_or_create_many()`:
+        строковый — среди типов с таким названием и единственным вариантом, поэтому значения
+        разных объектов с одним названием не перезаписывают друг друга.
+
         ### Args:
         - data_type_name (`str`): Название типа данных.
         - data_type_value (`str`): Строка со значениями типа данных.
@@ -99,21 +242,22 @@ class DataType(PolymorphicModel):
 
         params = DataType.parse_value(data_type_value, params)
 
-        poly_model = params.pop('poly_model')
-        str_type_choice_instance = params.pop('choice', None)
-
-        instance, _ = poly_model.objects.get_or_create(**params)
-
-        if str_type_choice_instance:
-            instance.value.set((str_type_choice_instance,))
+        type_name = {model_name: type_name for type_name, model_name in DataType.SUBTYPES}[params['poly_model']._meta.model_name]
+        if type_name == 'str':
+            key = (type_name, data_type_name, params['choice'].pk, None)
+        else:
+            unit = params.get('unit')
+            key = (type_name, data_type_name, params['value'], unit.pk if unit else None)
 
-        return instance
+        return DataType.objects.get(pk=DataType.get_or_create_many((key,))[key])
 
     @staticmethod
     def parse_value(input_string: str, params: dict) -> dict:
         """
         Статический метод для разбора значения атрибута.
 
+        ЕИ и варианты строк берутся из кеша процесса `attributes.resolvers.resolver`.
+
         ### Args:
         - input_string (`str`): Входная строка для разбора.
         - params (`dict`): Словарь с общими параметрами.
@@ -122,39 +266,26 @@ class DataType(PolymorphicModel):
         - `dict`: Обновленный словарь с параметрами.
 
         """
-        input_string = input_string.replace(',', '.').lower()
+        type_name, value, unit = parse_raw_value(input_string)
 
-        float_or_int_with_unit_pattern = re.compile(r'(?P<number>\d+(?:\.\d+)?)(\s*)(?P<unit>[a-zA-ZА-Яа-я]*)$')
-        bool_pattern = re.compile(r'^(да|есть|нет)$', re.IGNORECASE)
-        match = float_or_int_with_unit_pattern.match(input_string)
-
-        if match:
-            number = match.group('number')
-            unit = match.group('unit')
-            if '.' in number:
-                poly_model, value = FloatType, float(number)
-            else:
-                poly_model, value = IntType, int(number)
-
-            if len(unit) > 2:
-                unit_instance = Unit.objects.filter(name__icontains=unit, name_many__icontains=unit).first()
-            else:
-                unit_instance = Unit.objects.filter(name__icontains=unit, name_many__icontains=unit, symbol__iexact=unit).first()
+        if type_name in ('int', 'float'):
+            unit_instance = resolver.get_unit(unit)
 
             params.update({
-                'poly_model': poly_model,
+                'poly_model': FloatType if type_name == 'float' else IntType,
                 'value': value,
                 **({'unit': unit_instance} if unit_instance else {})
             })
-        elif bool_pattern.match(input_string.lower()):
+        elif type_name == 'bool':
             params.update({
                 'poly_model': BoolType,
-                'value': input_string.lower() in ('да', 'есть'),
+                'value': value,
             })
         else:
-            string_instance = StrTypeChoice.objects.filter(name__icontains=input_string).first()
+            string_instance = resolver.get_choice(value)
             if not string_instance:
-                string_instance = StrTypeChoice.objects.create(name=input_string)
+                string_instance = StrTypeChoice.get_or_create_many((value,))[normalize_choice(value)]
+                resolver.remember_choice(value, string_instance)
 
             params.update({
                 'poly_model': StrType,
@@ -162,6 +293,99 @@ class DataType(PolymorphicModel):
             })
         return params
 
+    @staticmethod
+    def get_or_create_many(keys) -> dict:
+        """
+        Статический метод получения типов данных по набору ключей.
+
+        Существующие типы данных находятся одним запросом на подтип: числовые и логические
+        по `(название, значение, ЕИ)`, строковые — среди типов с единственным вариантом.
+        Недостающие создаются: родительские строки и связи `StrType.value` — `bulk_create`,
+        строки наследников — вставкой пачками по `INSERT_BATCH_SIZE`.
+
+        ### Args:
+        - keys (`Iterable[tuple]`): Ключи `(тип, название, значение, id ЕИ)`, где тип — одно
+        из `int`, `float`, `bool`, `str`, значение `str` — id варианта `StrTypeChoice`,
+        а id ЕИ для `bool` и `str` — `None`.
+
+        ### Returns:
+        - `dict`: Словарь `{ключ: id типа данных}`.
+
+        """
+        keys = set(keys)
+        models_by_type = {'int': IntType, 'float': FloatType, 'bool': BoolType, 'str': StrType}
+        data_types = {}
+        for type_name in ('int', 'float', 'bool'):
+            type_keys = [key for key in keys if key[0] == type_name]
+            if not type_keys:
+                continue
+            fields = ('pk', 'name', 'value', 'unit_id') if type_name != 'bool' else ('pk', 'name', 'value')
+            existing = models_by_type[type_name].objects.filter(
+                name__in={key[1] for key in type_keys},
+                value__in={key[2] for key in type_keys},
+            ).order_by('pk').values_list(*fields)
+            for pk, *key in existing:
+                data_types.setdefault((type_name, *key, None) if type_name == 'bool' else (type_name, *key), pk)
+
+        through = StrType.value.through
+        str_keys = [key for key in keys if key[0] == 'str']
+        if str_keys:
+            names = {key[1] for key in str_keys}
+            single = (
+                through.objects
+                .filter(strtype__name__in=names)
+                .values('strtype_id')
+                .annotate(choices=Count('pk'))
+                .filter(choices=1)
+                .values('strtype_id')
+            )
+            existing = (
+                through.objects
+                .filter(strtype_id__in=single, strtype__name__in=names, strtypechoice_id__in={key[2] for key in str_keys})
+                .order_by('strtype_id')
+                .values_list('strtype_id', 'strtype__name', 'strtypechoice_id')
+            )
+            for pk, name, choice_id in existing:
+                data_types.setdefault(('str', name, choice_id, None), pk)
+
+        keys = [key for key in keys if key not in data_types]
+        if not keys:
+            return data_types
+        content_types = ContentType.objects.get_for_models(*models_by_type.values(), for_concrete_models=False)
+        parents = DataType.objects.bulk_create(
+            DataType(name=key[1], polymorphic_ctype_id=content_types[models_by_type[key[0]]].pk) for key in keys
+        )
+        children = {type_name: [] for type_name in models_by_type}
+        for key, parent in zip(keys, parents):
+            data_types[key] = parent.pk
+            type_name, _, value, unit_id = key
+            if type_name == 'str':
+                children[type_name].append(StrType(datatype_ptr_id=parent.pk))
+            elif type_name == 'bool':
+                children[type_name].append(BoolType(datatype_ptr_id=parent.pk, value=value))
+            else:
+                children[type_name].append(models_by_type[type_name](datatype_ptr_id=parent.pk, value=value, unit_id=unit_id))
+
+        # `bulk_create` не поддерживает наследование через таблицы, поэтому строки наследников
+        # записываются одной вставкой с параметрами на пачку.
+        with connection.cursor() as cursor:
+            for type_name, objs in children.items():
+                model = models_by_type[type_name]
+                fields = model._meta.local_concrete_fields
+                table = connection.ops.quote_name(model._meta.db_table)
+                columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+                placeholder = f"({', '.join(['%s'] * len(fields))})"
+                for start in range(0, len(objs), DataType.INSERT_BATCH_SIZE):
+                    batch = objs[start:start + DataType.INSERT_BATCH_SIZE]
+                    cursor.execute(
+                        f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholder] * len(batch))}',
+                        [field.get_db_prep_save(getattr(obj, field.attname), connection) for obj in batch for field in fields],
+                    )
+        through.objects.bulk_create(
+            through(strtype_id=data_types[key], strtypechoice_id=key[2]) for key in keys if key[0] == 'str'
+        )
+        return data_types
+
 
 class StrType(DataType):
     """
@@ -225,7 +449,22 @@ class Attribute(models.Model):
     - content_type (`ForeignKey[ContentType]`): Тип содержимого для обобщенной связи.
     - object_id (`PositiveIntegerField`): Идентификатор объекта для обобщенной связи.
     - content_object (`GenericForeignKey`): Обобщенная связь с объектом.
+
+    ### Attributes:
+    - FACET_HISTOGRAM_BINS (`int`): Количество интервалов гистограммы числового фасета.
+
+    ### Methods:
+    - get_values_for_objects(model, object_ids): Значения атрибутов набора объектов.
+    - filter_objects(queryset, selection): Отбор объектов по значениям атрибутов.
+    - compile_selection(model, selection, strict): План отбора по схеме атрибутов.
+    - apply_selection(queryset, plan): Отбор объектов по плану.
+    - get_facets(model, object_ids, names, exclude_names): Фасеты по атрибутам набора объектов.
+    - get_histogram(counts, minimum, maximum, integer): Гистограмма числовых значений.
+    - set_for_object(instance, mapping): Замена атрибутов объекта набором значений.
+    - add_attribute_to_model(initial_instance, attr_name, attr_value, attr_category): Добавление атрибута к объекту.
+
     """
+    FACET_HISTOGRAM_BINS = 10
 
     category = models.ForeignKey(AttrCategory, on_delete=models.CASCADE, verbose_name=_('категория атрибута'), null=True, blank=True)
     data_type = models.ForeignKey(DataType, on_delete=models.CASCADE, verbose_name=_('тип данных'))
@@ -241,6 +480,347 @@ class Attribute(models.Model):
     def __str__(self):
         return f'{self.id} | {self.category}'
 
+    @staticmethod
+    def get_values_for_objects(model: type[Model], object_ids) -> dict:
+        """
+        Статический метод получения значений атрибутов набора объектов.
+
+        Подтипы `DataType` подтягиваются через `select_related` по таблицам наследников,
+        а выбранные значения `StrType` — одним `prefetch_related`, поэтому количество запросов
+        не зависит от количества атрибутов.
+
+        ### Args:
+        - model (`type[Model]`): Модель объектов.
+        - object_ids (`Iterable[int]`): Идентификаторы объектов.
+
+        ### Returns:
+        - `dict`: Словарь `{object_id: [{'id', 'name', 'category', 'type', 'value', 'unit'}, ...]}`,
+        где `type` — одно из `int`, `float`, `bool`, `str`.
+
+        """
+        attributes = (
+            Attribute.objects
+            .filter(content_type=ContentType.objects.get_for_model(model), object_id__in=object_ids)
+            .select_related(
+                'category',
+                'data_type__inttype__unit',
+                'data_type__floattype__unit',
+                'data_type__booltype',
+                'data_type__strtype',
+            )
+            .prefetch_related('data_type__strtype__value')
+            .order_by('object_id', 'id')
+        )
+        values = {}
+        for attribute in attributes:
+            data_type = attribute.data_type
+            value = {
+                'id': attribute.id,
+                'name': data_type.name,
+                'category': attribute.category.name if attribute.category else None,
+                'type': None,
+                'value': None,
+                'unit': None,
+            }
+            for type_name, related_name in DataType.SUBTYPES:
+                try:
+                    subtype = getattr(data_type, related_name)
+                except DataType.DoesNotExist:
+                    continue
+                value['type'] = type_name
+                if type_name == 'str':
+                    value['value'] = ', '.join(choice.name for choice in subtype.value.all())
+                else:
+                    value['value'] = subtype.value
+                    unit = getattr(subtype, 'unit', None)
+                    value['unit'] = unit.symbol if unit else None
+                break
+            values.setdefault(attribute.object_id, []).append(value)
+        return values
+
+    @staticmethod
+    def filter_objects(queryset: QuerySet, selection: dict) -> QuerySet:
+        """
+        Статический метод отбора объектов по значениям атрибутов.
+
+        Выбор компилируется `compile_selection()` без проверки схемы: неизвестный атрибут
+        или диапазон по нечисловому атрибуту дают пустой результат.
+
+        ### Args:
+        - queryset (`QuerySet`): Объекты, к которым привязаны атрибуты.
+        - selection (`dict`): Выбор вида `{название: {'in': [...], 'gte': число, 'lte': число}}`.
+
+        ### Returns:
+        - `QuerySet`: Отфильтрованные объекты.
+
+        """
+        if not selection:
+            return queryset
+        return Attribute.apply_selection(queryset, Attribute.compile_selection(queryset.model, selection, strict=False))
+
+    @staticmethod
+    def compile_selection(model: type[Model], selection: dict, strict: bool = True) -> dict:
+        """
+        Статический метод компиляции выбора по схеме атрибутов в план отбора.
+
+        Названия атрибутов, виды их значений и идентификаторы вариантов `StrType` определяются
+        двумя запросами, поэтому план можно кешировать и применять `apply_selection()`
+        без обращений к справочникам.
+
+        ### Args:
+        - model (`type[Model]`): Модель объектов.
+        - selection (`dict`): Выбор вида `{название: {'in': [...], 'gte': число, 'lte': число}}`.
+        Значения `in` сравниваются с вариантами `StrType` по нормализованному ключу, логическими строками
+        из `DataType.BOOL_VALUES` и числами, в зависимости от видов значений атрибута.
+        - strict (`bool`, опционально): Поднимать ошибку на несоответствие схеме,
+        иначе условие становится заведомо ложным.
+
+        ### Raises:
+        - ValidationError: Если `strict` и атрибут неизвестен или диапазон задан для нечислового атрибута.
+
+        ### Returns:
+        - `dict`: План `{'content_type': id, 'conditions': [...]}`, где условие — словарь
+        `{'name', 'choices', 'booleans', 'numbers', 'gte', 'lte'}` или `None` для ложного условия.
+
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        values = AttributeValue.objects.filter(content_type=content_type, name=OuterRef('pk'))
+        schema = {
+            name: (pk, kinds)
+            for name, pk, *kinds in (
+                AttributeName.objects
+                .filter(name__in=selection)
+                .annotate(
+                    has_number=Exists(values.filter(number__isnull=False)),
+                    has_choice=Exists(values.filter(choice__isnull=False)),
+                    has_boolean=Exists(values.filter(boolean__isnull=False)),
+                )
+                .values_list('name', 'pk', 'has_number', 'has_choice', 'has_boolean')
+            )
+        }
+        choice_names = {
+            value
+            for name, lookups in selection.items() if name in schema and schema[name][1][1]
+            for value in lookups.get('in', ())
+        }
+        choices = dict(StrTypeChoice.objects.filter(key__in={normalize_choice(value) for value in choice_names}).values_list('key', 'pk'))
+
+        conditions = []
+        for name, lookups in selection.items():
+            if name not in schema or (('gte' in lookups or 'lte' in lookups) and not schema[name][1][0]):
+                if strict:
+                    message = 'Неизвестный атрибут.' if name not in schema else 'Диапазон допустим только для числового атрибута.'
+                    raise ValidationError({f'attr.{name}': message})
+                conditions.append(None)
+                continue
+            name_id, (has_number, has_choice, has_boolean) = schema[name]
+            condition = {'name': name_id, **{lookup: lookups[lookup] for lookup in ('gte', 'lte') if lookup in lookups}}
+            if 'in' in lookups:
+                items = lookups['in']
+                condition['choices'] = sorted({
+                    choices[normalize_choice(value)] for value in items if normalize_choice(value) in choices
+                }) if has_choice else []
+                condition['booleans'] = sorted({
+                    DataType.BOOL_VALUES[value.lower()] for value in items if value.lower() in DataType.BOOL_VALUES
+                }) if has_boolean else []
+                condition['numbers'] = sorted(Attribute.get_numbers(items)) if has_number else []
+                if not (condition['choices'] or condition['booleans'] or condition['numbers']):
+                    condition = None
+            conditions.append(condition)
+        return {'content_type': content_type.pk, 'conditions': conditions}
+
+    @staticmethod
+    def apply_selection(queryset: QuerySet, plan: dict) -> QuerySet:
+        """
+        Статический метод отбора объектов по плану `compile_selection()`.
+
+        Каждое условие превращается в подзапрос `EXISTS` по проекции `AttributeValue`,
+        который идет по составному индексу `(content_type, name, значение, object_id)`
+        без соединений с таблицами наследников `DataType`.
+
+        """
+        for condition in plan['conditions']:
+            if condition is None:
+                return queryset.none()
+            values = AttributeValue.objects.filter(content_type_id=plan['content_type'], name_id=condition['name'], object_id=OuterRef('pk'))
+            if 'choices' in condition:
+                lookups = (('choice_id__in', 'choices'), ('boolean__in', 'booleans'), ('number__in', 'numbers'))
+                values = values.filter(reduce(or_, (Q(**{lookup: condition[key]}) for lookup, key in lookups if condition[key])))
+            for lookup in ('gte', 'lte'):
+                if lookup in condition:
+                    values = values.filter(**{f'number__{lookup}': condition[lookup]})
+            queryset = queryset.filter(Exists(values))
+        return queryset
+
+    @staticmethod
+    def get_numbers(values) -> set:
+        """Числа из строк значений, нечисловые строки пропускаются."""
+        numbers = set()
+        for value in values:
+            try:
+                numbers.add(float(value.replace(',', '.')))
+            except ValueError:
+                continue
+        return numbers
+
+    @staticmethod
+    def get_facets(model: type[Model], object_ids, names=None, exclude_names=()) -> list:
+        """
+        Статический метод получения фасетов по атрибутам набора объектов.
+
+        Значения всех подтипов `DataType` считаются одним сгруппированным запросом
+        с количеством различных объектов на значение, а гистограммы числовых атрибутов
+        собираются из этих групп без дополнительных запросов.
+
+        ### Args:
+        - model (`type[Model]`): Модель объектов.
+        - object_ids (`QuerySet | Iterable[int]`): Идентификаторы объектов, например `queryset.values('pk')`.
+        - names (`Iterable[str]`, опционально): Учитывать только атрибуты с этими названиями.
+        - exclude_names (`Iterable[str]`, опционально): Не учитывать атрибуты с этими названиями.
+
+        ### Returns:
+        - `list[dict]`: Фасеты с ключами `name`, `type` и
+            - для `str`: `values` — список `{'value', 'count'}`;
+            - для `int` и `float`: `unit`, `min`, `max` и `histogram` — список `{'from', 'to', 'count'}`;
+            - для `bool`: `true` и `false` — количества объектов.
+
+        """
+        attributes = Attribute.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id__in=object_ids)
+        if names is not None:
+            attributes = attributes.filter(data_type__name__in=names)
+        if exclude_names:
+            attributes = attributes.exclude(data_type__name__in=exclude_names)
+        rows = (
+            attributes
+            .values(
+                'data_type__name',
+                'data_type__strtype__value__name',
+                'data_type__inttype__value',
+                'data_type__inttype__unit__symbol',
+                'data_type__floattype__value',
+                'data_type__floattype__unit__symbol',
+                'data_type__booltype__value',
+            )
+            .annotate(count=Count('object_id', distinct=True))
+            .order_by()
+        )
+
+        facets = {}
+        for row in rows:
+            name = row['data_type__name']
+            if row['data_type__strtype__value__name'] is not None:
+                facet = facets.setdefault((name, 'str', None), {'name': name, 'type': 'str', 'values': []})
+                facet['values'].append({'value': row['data_type__strtype__value__name'], 'count': row['count']})
+            elif row['data_type__booltype__value'] is not None:
+                facet = facets.setdefault((name, 'bool', None), {'name': name, 'type': 'bool', 'true': 0, 'false': 0})
+                facet['true' if row['data_type__booltype__value'] else 'false'] += row['count']
+            else:
+                for type_name in ('int', 'float'):
+                    value = row[f'data_type__{type_name}type__value']
+                    if value is None:
+                        continue
+                    unit = row[f'data_type__{type_name}type__unit__symbol']
+                    facet = facets.setdefault((name, type_name, unit), {'name': name, 'type': type_name, 'unit': unit, 'counts': []})
+                    facet['counts'].append((value, row['count']))
+
+        for facet in facets.values():
+            if facet['type'] == 'str':
+                facet['values'].sort(key=lambda value: (-value['count'], value['value']))
+            elif 'counts' in facet:
+                counts = facet.pop('counts')
+                facet['min'] = min(value for value, _ in counts)
+                facet['max'] = max(value for value, _ in counts)
+                facet['histogram'] = Attribute.get_histogram(counts, facet['min'], facet['max'], facet['type'] == 'int')
+        return sorted(facets.values(), key=lambda facet: (facet['name'], facet['type'], facet.get('unit') or ''))
+
+    @staticmethod
+    def get_histogram(counts, minimum, maximum, integer: bool = False) -> list:
+        """
+        Статический метод построения гистограммы по парам (значение, количество).
+
+        Отрезок `[minimum, maximum]` делится на `FACET_HISTOGRAM_BINS` равных интервалов.
+        Для целых значений границы интервалов целые и включаются в интервал.
+
+        ### Returns:
+        - `list[dict]`: Интервалы с ключами `from`, `to` и `count`.
+
+        """
+        bins = Attribute.FACET_HISTOGRAM_BINS
+        if integer:
+            width = -(-(maximum - minimum + 1) // bins)
+            bins = -(-(maximum - minimum + 1) // width)
+            bounds = [(minimum + width * index, min(minimum + width * (index + 1) - 1, maximum)) for index in range(bins)]
+        else:
+            bins = bins if maximum > minimum else 1
+            width = (maximum - minimum) / bins
+            bounds = [(minimum + width * index, maximum if index == bins - 1 else minimum + width * (index + 1)) for index in range(bins)]
+        histogram = [{'from': start, 'to': end, 'count': 0} for start, end in bounds]
+        for value, count in counts:
+            index = min(int((value - minimum) // width), bins - 1) if width else 0
+            histogram[index]['count'] += count
+        return histogram
+
+    @staticmethod
+    def set_for_object(instance: Model, mapping: dict) -> list:
+        """
+        Статический метод замены атрибутов объекта набором значений.
+
+        Значения разбираются `parse_raw_value()`, категории, варианты строк и типы данных
+        находятся и создаются наборами, атрибуты объекта с теми же названиями удаляются,
+        а новые записываются одной вставкой вместе с проекцией `AttributeValue`,
+        поэтому количество запросов не зависит от количества новых и замененных атрибутов.
+
+        Сигналы `post_save` и `post_delete` атрибутов не отправляются, зависимые данные
+        объекта (документ, отметку изменения, кеши) обновляет вызывающий код.
+
+        ### Args:
+        - instance (`Model`): Объект.
+        - mapping (`dict`): Словарь `{название: значение}` или `{название: (значение, категория)}`.
+
+        ### Returns:
+        - `list[Attribute]`: Созданные атрибуты.
+
+        """
+        content_type = ContentType.objects.get_for_model(instance)
+        items = []
+        for name, value in mapping.items():
+            value, category = value if isinstance(value, (tuple, list)) else (value, None)
+            items.append((name, *parse_raw_value(str(value).strip()), category))
+
+        categories = AttrCategory.get_ids(category for *_, category in items if category)
+        choices = StrTypeChoice.get_or_create_many(value for _, type_name, value, *_ in items if type_name == 'str')
+        units = resolver.get_units() if any(type_name in ('int', 'float') for _, type_name, *_ in items) else ()
+        unit_ids = {}
+        keys = []
+        for name, type_name, value, unit, _category in items:
+            if type_name == 'str':
+                keys.append(('str', name, choices[normalize_choice(value)].pk, None))
+            elif type_name == 'bool':
+                keys.append(('bool', name, value, None))
+            else:
+                if unit not in unit_ids:
+                    unit_instance = find_unit(unit, units)
+                    unit_ids[unit] = unit_instance.pk if unit_instance else None
+                keys.append((type_name, name, value, unit_ids[unit]))
+        data_types = DataType.get_or_create_many(keys)
+
+        previous = Attribute.objects.filter(content_type=content_type, object_id=instance.pk, data_type__name__in=mapping)
+        AttributeValue.objects.filter(attribute__in=previous).delete()
+        # Без `post_delete` на каждый замененный атрибут: документ объекта и кеши
+        # вызывающий код обновляет один раз на весь набор.
+        previous._raw_delete(previous.db)
+        attributes = Attribute.objects.bulk_create(
+            Attribute(
+                content_type=content_type,
+                object_id=instance.pk,
+                category_id=categories.get(category),
+                data_type_id=data_types[key],
+            )
+            for (*_, category), key in zip(items, keys)
+        )
+        AttributeValue.sync(attribute.pk for attribute in attributes)
+        return attributes
+
     def add_attribute_to_model(self, initial_instance: Model, attr_name: str, attr_value: str, attr_category: str = None):
         """Метод для добавления атрибута к модели.
 
@@ -273,3 +853,193 @@ class Attribute(models.Model):
             category=category_instance,
             data_type=data_type_instance,
         )
+
+
+class AttributeName(models.Model):
+    """
+    Модель названия атрибута для проекции `AttributeValue`.
+
+    ### Fields:
+    - name (`CharField`): Название атрибута, как в `DataType.name`.
+
+    ### Methods:
+    - get_ids(names): Идентификаторы названий с созданием недостающих.
+
+    """
+    name = models.CharField(_('название'), max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = _('название атрибута')
+        verbose_name_plural = _('названия атрибутов')
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def get_ids(names) -> dict:
+        """Словарь `{название: id}`, недостающие названия создаются одной вставкой."""
+        names = set(names)
+        AttributeName.objects.bulk_create((AttributeName(name=name) for name in names), ignore_conflicts=True)
+        return dict(AttributeName.objects.filter(name__in=names).values_list('name', 'pk'))
+
+
+class AttributeValue(models.Model):
+    """
+    Модель плоской проекции значения атрибута.
+
+    Значение `DataType` хранится в колонке своего вида, поэтому отбор по диапазону
+    или вариантам идет по составным частичным индексам `(content_type, name, значение, object_id)`
+    без соединений с полиморфными таблицами. Строки поддерживаются при записи атрибутов,
+    типов данных и вариантов строк, у `StrType` — по строке на каждый вариант.
+
+    ### Fields:
+    - attribute (`ForeignKey[Attribute]`): Атрибут.
+    - content_type (`ForeignKey[ContentType]`): Тип объекта.
+    - object_id (`PositiveIntegerField`): Идентификатор объекта.
+    - name (`ForeignKey[AttributeName]`): Название атрибута.
+    - number (`FloatField`, опционально): Значение `IntType` или `FloatType`.
+    - unit (`ForeignKey[Unit]`, опционально): Единица измерения числового значения.
+    - choice (`ForeignKey[StrTypeChoice]`, опционально): Вариант `StrType`.
+    - boolean (`BooleanField`, опционально): Значение `BoolType`.
+
+    ### Methods:
+    - sync(attributes): Пересобирает строки проекции атрибутов.
+    - rebuild(chunk_size): Пересобирает всю проекцию.
+
+    """
+    ATTRIBUTE_FIELDS = (
+        'pk',
+        'content_type_id',
+        'object_id',
+        'data_type__name',
+        'data_type__strtype__value',
+        'data_type__inttype__value',
+        'data_type__inttype__unit',
+        'data_type__floattype__value',
+        'data_type__floattype__unit',
+        'data_type__booltype__value',
+    )
+
+    attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE, related_name='values', verbose_name=_('атрибут'))
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+', db_index=False)
+    object_id = models.PositiveIntegerField()
+    name = models.ForeignKey(AttributeName, on_delete=models.CASCADE, related_name='values', verbose_name=_('название'))
+    number = models.FloatField(_('число'), null=True, blank=True)
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='+', null=True, blank=True, verbose_name=_('единица измерения'))
+    choice = models.ForeignKey(StrTypeChoice, on_delete=models.CASCADE, related_name='+', null=True, blank=True, verbose_name=_('вариант'))
+    boolean = models.BooleanField(_('логическое значение'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('значение атрибута')
+        verbose_name_plural = _('значения атрибутов')
+        indexes = (
+            models.Index(
+                fields=('content_type', 'name', 'number', 'object_id'),
+                condition=Q(number__isnull=False),
+                name='attributes_value_number_idx',
+            ),
+            models.Index(
+                fields=('content_type', 'name', 'choice', 'object_id'),
+                condition=Q(choice__isnull=False),
+                name='attributes_value_choice_idx',
+            ),
+            models.Index(
+                fields=('content_type', 'name', 'boolean', 'object_id'),
+                condition=Q(boolean__isnull=False),
+                name='attributes_value_bool_idx',
+            ),
+            models.Index(fields=('content_type', 'object_id'), name='attributes_value_object_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.attribute_id} | {self.name_id}'
+
+    @staticmethod
+    def sync(attributes) -> int:
+        """
+        Статический метод пересборки строк проекции атрибутов.
+
+        Значения всех подтипов читаются одним запросом, старые строки удаляются,
+        новые записываются одной вставкой. Версия кеша планов `attribute_filters` увеличивается.
+
+        ### Args:
+        - attributes (`QuerySet | Iterable[int]`): Атрибуты или их идентификаторы.
+
+        ### Returns:
+        - `int`: Количество записанных строк.
+
+        """
+        if not isinstance(attributes, QuerySet):
+            attributes = Attribute.objects.filter(pk__in=list(attributes))
+        rows = list(attributes.order_by().values_list(*AttributeValue.ATTRIBUTE_FIELDS))
+        AttributeValue.objects.filter(attribute_id__in={row[0] for row in rows}).delete()
+        name_ids = AttributeName.get_ids(row[3] for row in rows)
+
+        bump_cache_version('attribute_filters')
+
+        values = []
+        for attribute_id, content_type_id, object_id, name, choice_id, int_value, int_unit, float_value, float_unit, bool_value in rows:
+            value = AttributeValue(attribute_id=attribute_id, content_type_id=content_type_id, object_id=object_id, name_id=name_ids[name])
+            if choice_id is not None:
+                value.choice_id = choice_id
+            elif bool_value is not None:
+                value.boolean = bool_value
+            elif int_value is not None:
+                value.number, value.unit_id = int_value, int_unit
+            elif float_value is not None:
+                value.number, value.unit_id = float_value, float_unit
+            else:
+                continue
+            values.append(value)
+        return len(AttributeValue.objects.bulk_create(values, batch_size=5000))
+
+    @staticmethod
+    def rebuild(chunk_size: int = 10000) -> int:
+        """Статический метод пересборки всей проекции пачками по `chunk_size` атрибутов."""
+        AttributeValue.objects.all().delete()
+        count, last_id = 0, 0
+        while ids := list(Attribute.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]):
+            count += AttributeValue.sync(ids)
+            last_id = ids[-1]
+        return count
+
+
+@receiver(post_save, sender=Attribute)
+def sync_attribute_values(sender, instance, **kwargs):
+    AttributeValue.sync((instance.pk,))
+
+
+@receiver(post_save, sender=IntType)
+@receiver(post_save, sender=FloatType)
+@receiver(post_save, sender=BoolType)
+@receiver(post_save, sender=StrType)
+def sync_data_type_attribute_values(sender, instance, created, **kwargs):
+    if not created:
+        AttributeValue.sync(Attribute.objects.filter(data_type_id=instance.pk))
+
+
+@receiver(m2m_changed, sender=StrType.value.through)
+def sync_str_type_attribute_values(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            AttributeValue.sync(Attribute.objects.filter(data_type_id=instance.pk))
+    elif action == 'pre_clear':
+        instance._cleared_str_type_ids = list(instance.str_types.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        str_type_ids = pk_set if action != 'post_clear' else instance.__dict__.pop('_cleared_str_type_ids', ())
+        AttributeValue.sync(Attribute.objects.filter(data_type_id__in=str_type_ids))
+
+
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def invalidate_resolver_units(sender, **kwargs):
+    transaction.on_commit(lambda: resolver.invalidate('units'))
+
+
+@receiver(post_save, sender=StrTypeChoice)
+@receiver(post_delete, sender=StrTypeChoice)
+def invalidate_resolver_choices(sender, created=False, **kwargs):
+    # Новый вариант получает наибольший id и не меняет уже найденных вариантов,
+    # а промахи не кешируются, поэтому сбрасывать кеш нужно только при изменении и удалении.
+    if not created:
+        transaction.on_commit(lambda: resolver.invalidate('choices'))
@@ -0,0 +1,67 @@
+import re
+
+FLOAT_OR_INT_WITH_UNIT_PATTERN = re.compile(r'(?P<number>\d+(?:\.\d+)?)(\s*)(?P<unit>[a-zA-ZА-Яа-я]*)$')
+BOOL_PATTERN = re.compile(r'^(да|есть|нет)$', re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TRUE_VALUES = ('да', 'есть')
+
+
+def parse_raw_value(input_string: str) -> tuple:
+    """
+    Разбирает строку значения атрибута без обращений к базе данных.
+
+    Модуль не импортирует Django, поэтому функцию можно вызывать в дочерних процессах.
+
+    ### Args:
+    - input_string (`str`): Входная строка, например `12,5 метр`, `да` или `красный`.
+
+    ### Returns:
+    - `tuple`: Тройка `(тип, значение, ЕИ)`, где тип — одно из `int`, `float`, `bool`, `str`,
+    а ЕИ — строка единицы измерения из входной строки (пустая, если ее нет).
+
+    """
+    input_string = input_string.replace(',', '.').lower()
+    match = FLOAT_OR_INT_WITH_UNIT_PATTERN.match(input_string)
+
+    if match:
+        number = match.group('number')
+        if '.' in number:
+            return 'float', float(number), match.group('unit')
+        return 'int', int(number), match.group('unit')
+    if BOOL_PATTERN.match(input_string):
+        return 'bool', input_string in TRUE_VALUES, ''
+    return 'str', input_string, ''
+
+
+def find_unit(unit: str, units):
+    """
+    Подбирает ЕИ среди уже загруженных так же, как `DataType.parse_value()` подбирает ее запросом.
+
+    ### Args:
+    - unit (`str`): ЕИ из `parse_raw_value()`.
+    - units (`Iterable[Unit]`): ЕИ, упорядоченные по `id`.
+
+    ### Returns:
+    - `Unit | None`: Первая подходящая ЕИ.
+
+    """
+    for instance in units:
+        if unit not in instance.name.lower() or unit not in instance.name_many.lower():
+            continue
+        if len(unit) > 2 or instance.symbol.lower() == unit:
+            return instance
+    return None
+
+
+def normalize_choice(value: str) -> str:
+    """
+    Ключ варианта строки: регистр сброшен `casefold()`, пробелы схлопнуты, `ё` заменена на `е`.
+
+    ### Args:
+    - value (`str`): Строка варианта.
+
+    ### Returns:
+    - `str`: Нормализованный ключ.
+
+    """
+    return WHITESPACE_PATTERN.sub(' ', value).strip().casefold().replace('ё', 'е')
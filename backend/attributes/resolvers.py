@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from redis.exceptions import RedisError
+
+from attributes.parsers import find_unit, normalize_choice
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'attributes:resolver'
+
+
+class ValueResolver:
+    """
+    Кеш справочников для разбора значений атрибутов в памяти процесса.
+
+    ЕИ загружаются целиком и подбираются `find_unit()`, варианты `StrType` хранятся
+    в LRU по нормализованному ключу `normalize_choice()`. Записи живут не дольше `ttl` секунд
+    и сбрасываются во всех процессах сообщением в канал Redis `INVALIDATION_CHANNEL`,
+    поэтому в обычном случае разбор значения не обращается к базе данных.
+
+    Кеш пополняется только после фиксации транзакции, в которой прочитаны или созданы
+    записи, чтобы откат не оставил в нем несуществующих строк.
+
+    ### Args:
+    - ttl (`int`, опционально): Время жизни записей в секундах.
+    - max_choices (`int`, опционально): Максимальное количество вариантов в LRU.
+
+    ### Methods:
+    - get_units(): Все ЕИ, упорядоченные по `id`.
+    - get_unit(unit): ЕИ по строке из `parse_raw_value()`.
+    - get_choice(value): Вариант `StrType` по строке значения.
+    - remember_choice(value, choice): Запоминает созданный вариант.
+    - clear(name): Сбрасывает кеш `units`, `choices` или весь кеш в текущем процессе.
+    - invalidate(name): Сбрасывает кеш во всех процессах.
+
+    """
+    CACHE_NAMES = ('units', 'choices')
+
+    def __init__(self, ttl: int = 300, max_choices: int = 10000):
+        self.ttl = ttl
+        self.max_choices = max_choices
+        self._lock = threading.Lock()
+        self._units = None
+        self._units_loaded_at = 0
+        self._choices = OrderedDict()
+        self._listener = None
+        self._pid = None
+
+    def get_units(self) -> list:
+        self.listen()
+        with self._lock:
+            units = self._units if time.monotonic() - self._units_loaded_at < self.ttl else None
+        if units is None:
+            from attributes.models import Unit
+
+            units = list(Unit.objects.order_by('pk'))
+            transaction.on_commit(lambda: self._set_units(units))
+        return units
+
+    def get_unit(self, unit: str):
+        return find_unit(unit, self.get_units())
+
+    def get_choice(self, value: str):
+        self.listen()
+        key = normalize_choice(value)
+        with self._lock:
+            cached = self._choices.get(key)
+            if cached and time.monotonic() - cached[1] < self.ttl:
+                self._choices.move_to_end(key)
+                return cached[0]
+        from attributes.models import StrTypeChoice
+
+        choice = StrTypeChoice.objects.filter(key=key).first()
+        if choice:
+            self.remember_choice(value, choice)
+        return choice
+
+    def remember_choice(self, value: str, choice) -> None:
+        key = normalize_choice(value)
+        transaction.on_commit(lambda: self._set_choice(key, choice))
+
+    def clear(self, name: str = None) -> None:
+        with self._lock:
+            if name in (None, 'units'):
+                self._units, self._units_loaded_at = None, 0
+            if name in (None, 'choices'):
+                self._choices.clear()
+
+    def invalidate(self, name: str = None) -> None:
+        self.clear(name)
+        try:
+            settings.REDIS_CLIENT.publish(INVALIDATION_CHANNEL, name or '')
+        except RedisError:
+            logger.warning('Не удалось разослать сброс кеша справочников атрибутов.', exc_info=True)
+
+    def listen(self) -> None:
+        """Подписывает процесс на канал сброса кеша, после `fork` — заново."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._units, self._units_loaded_at = None, 0
+            self._choices.clear()
+            try:
+                pubsub = settings.REDIS_CLIENT.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_message})
+                self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=self._on_error)
+            except RedisError:
+                logger.warning('Кеш справочников атрибутов работает без подписки на сброс.', exc_info=True)
+                self._listener = None
+
+    def _on_message(self, message) -> None:
+        name = message['data'].decode() if isinstance(message['data'], bytes) else message['data']
+        self.clear(name if name in self.CACHE_NAMES else None)
+
+    def _on_error(self, exception, pubsub, thread) -> None:
+        logger.warning('Подписка на сброс кеша справочников атрибутов прервана.', exc_info=exception)
+        thread.stop()
+        pubsub.close()
+        self.clear()
+        self._pid = None
+
+    def _set_units(self, units: list) -> None:
+        with self._lock:
+            self._units, self._units_loaded_at = units, time.monotonic()
+
+    def _set_choice(self, key: str, choice) -> None:
+        with self._lock:
+            self._choices[key] = (choice, time.monotonic())
+            self._choices.move_to_end(key)
+            while len(self._choices) > self.max_choices:
+                self._choices.popitem(last=False)
+
+
+resolver = ValueResolver()
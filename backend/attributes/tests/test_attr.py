@@ -1,8 +1,16 @@
+import time
+from io import StringIO
+
 from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
 
-from ..models import (AttrCategory, Attribute, BoolType, DataType, FloatType,
-                      IntType, StrType, Unit)
+from ..models import (AttrCategory, Attribute, AttributeValue, BoolType,
+                      DataType, FloatType, IntType, StrType, StrTypeChoice,
+                      Unit)
+from ..parsers import normalize_choice
+from ..resolvers import ValueResolver, resolver
 
 
 class AttributeModelTest(TestCase):
@@ -80,3 +88,137 @@ class AttributeModelTest(TestCase):
         self.assertEqual(attribute_instance.data_type.value.first().name, "тестовое значение")
         self.assertIsInstance(attribute_instance.data_type, StrType)
         self.assertIs(test_product.attribute_set.exists(), False)
+
+
+class AttributeValueTest(TestCase):
+
+    def setUp(self):
+        self.unit = Unit.objects.create(name="дюйм", name_many="дюймы", symbol="дм")
+        self.objects = [ContentType.objects.create(app_label='tests', model=f'object{index}') for index in range(3)]
+        colors = {name: StrTypeChoice.objects.create(name=name) for name in ('черный', 'серый')}
+        for obj, diagonal, color in zip(self.objects, ('13 дюйм', '15.6 дюйм', '17 дюйм'), ('черный', 'серый', 'черный')):
+            Attribute().add_attribute_to_model(obj, 'Диагональ', diagonal, 'Экран')
+            data_type = StrType.objects.create(name='Цвет')
+            data_type.value.set((colors[color],))
+            Attribute.objects.create(content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk, data_type=data_type)
+        Attribute().add_attribute_to_model(self.objects[0], 'Подсветка', 'да', 'Экран')
+
+    def select(self, selection):
+        return sorted(Attribute.filter_objects(ContentType.objects.all(), selection).values_list('pk', flat=True))
+
+    def test_values_follow_writes(self):
+        values = AttributeValue.objects.filter(object_id=self.objects[1].pk).order_by('name__name')
+        self.assertEqual(
+            [(value.name.name, value.number, value.unit_id, value.choice_id is not None) for value in values],
+            [('Диагональ', 15.6, self.unit.pk, False), ('Цвет', None, None, True)],
+        )
+        self.assertTrue(AttributeValue.objects.get(object_id=self.objects[0].pk, name__name='Подсветка').boolean)
+
+        color = Attribute.objects.get(object_id=self.objects[1].pk, data_type__name='Цвет').data_type
+        extra = StrTypeChoice.objects.create(name='белый')
+        color.value.add(extra)
+        self.assertEqual(AttributeValue.objects.filter(object_id=self.objects[1].pk, choice__isnull=False).count(), 2)
+        extra.str_types.clear()
+        self.assertEqual(AttributeValue.objects.filter(object_id=self.objects[1].pk, choice__isnull=False).count(), 1)
+
+        Attribute.objects.filter(object_id=self.objects[2].pk).delete()
+        self.assertFalse(AttributeValue.objects.filter(object_id=self.objects[2].pk).exists())
+
+        AttributeValue.objects.all().delete()
+        self.assertEqual(AttributeValue.rebuild(chunk_size=2), 5)
+
+    def test_filter_objects(self):
+        self.assertEqual(self.select({'Диагональ': {'gte': 14, 'lte': 16}}), [self.objects[1].pk])
+        self.assertEqual(self.select({'Цвет': {'in': ['черный']}}), [self.objects[0].pk, self.objects[2].pk])
+        self.assertEqual(self.select({'Цвет': {'in': ['черный']}, 'Подсветка': {'in': ['да']}}), [self.objects[0].pk])
+        self.assertEqual(self.select({'Вес': {'gte': 1}}), [])
+
+        values = AttributeValue.objects.filter(name__name='Диагональ', number__gte=14, content_type=ContentType.objects.get_for_model(ContentType))
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = values.values('object_id').explain()
+        self.assertIn('attributes_value_number_idx', plan)
+
+
+class ValueResolverTest(TestCase):
+
+    def setUp(self):
+        resolver.clear()
+        self.addCleanup(resolver.clear)
+        self.unit = Unit.objects.create(name="метр", name_many="метры", symbol="м")
+        self.choice = StrTypeChoice.objects.create(name="красный")
+
+    def parse(self, value):
+        return DataType.parse_value(value, {'name': 'Тест'})
+
+    def test_parse_value_uses_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.parse('12 м')['unit'], self.unit)
+            self.assertEqual(self.parse('красный')['choice'], self.choice)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.parse('5 метр')['unit'], self.unit)
+            self.assertEqual(self.parse('красный')['choice'], self.choice)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.parse('синий')['choice']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.parse('синий')['choice'], created)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unit.symbol = 'мтр'
+            self.unit.save()
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.parse('12 м').get('unit'))
+
+    def test_uncommitted_reads_not_cached(self):
+        self.parse('красный')
+        with self.assertNumQueries(1):
+            self.parse('красный')
+
+    def test_invalidation_reaches_other_processes(self):
+        other = ValueResolver()
+        other.listen()
+        other._set_units([self.unit])
+        other._set_choice('красный', self.choice)
+
+        deadline = time.monotonic() + 5
+        resolver.invalidate('units')
+        while other._units is not None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIsNone(other._units)
+        self.assertIn('красный', other._choices)
+        other._listener.stop()
+
+
+class StrTypeChoiceKeyTest(TestCase):
+
+    def test_normalized_lookup(self):
+        self.assertEqual(normalize_choice('  Тёмно\t КРАСНЫЙ '), 'темно красный')
+        red = StrTypeChoice.objects.create(name='Красный')
+        StrTypeChoice.objects.create(name='Тёмно-красный')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resolver.clear()
+            self.assertEqual(DataType.parse_value('красный', {})['choice'], red)
+        choices = StrTypeChoice.get_or_create_many(['КРАСНЫЙ', 'синий', 'Синий '])
+        self.assertEqual(set(choices), {'красный', 'синий'})
+        self.assertEqual(choices['красный'], red)
+        self.assertEqual(StrTypeChoice.objects.count(), 3)
+
+    def test_dedupe_command(self):
+        keeper = StrTypeChoice.objects.create(name='Зелёный')
+        duplicates = StrTypeChoice.objects.bulk_create(
+            StrTypeChoice(name=name, key=f'legacy-{index}') for index, name in enumerate(('зеленый', 'ЗЕЛЕНЫЙ'))
+        )
+        both = StrType.objects.create(name='Цвет')
+        both.value.set((keeper, duplicates[0]))
+        single = StrType.objects.create(name='Цвет')
+        single.value.set(duplicates)
+        product = ContentType.objects.create(app_label='tests', model='product')
+        attribute = Attribute.objects.create(content_type=ContentType.objects.get_for_model(product), object_id=product.pk, data_type=single)
+
+        call_command('dedupe_str_choices', stdout=StringIO())
+        self.assertEqual(list(StrTypeChoice.objects.values_list('pk', 'key')), [(keeper.pk, 'зеленый')])
+        self.assertEqual(list(both.value.all()), [keeper])
+        self.assertEqual(list(single.value.all()), [keeper])
+        self.assertEqual(list(AttributeValue.objects.filter(attribute=attribute).values_list('choice_id', flat=True)), [keeper.pk])
@@ -1,6 +1,7 @@
 from attributes.filters import AttributeFilter
 from attributes.models import Attribute, Unit
 from attributes.serializers import AttributeSerializer, UnitSerializer
+from core.pagination import KeysetPaginator
 from core.permissions import IsAdminOrReadOnly, IsModeratorOrReadOnly
 from django_filters import rest_framework as filters
 from rest_framework import mixins, viewsets
@@ -23,3 +24,5 @@ class AttributeViewSet(mixins.RetrieveModelMixin,
     queryset = Attribute.objects.all()
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = AttributeFilter
+    pagination_class = KeysetPaginator
+    estimate_count = True
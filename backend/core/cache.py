@@ -0,0 +1,37 @@
+import time
+
+from django.core.cache import cache
+
+
+def get_cache_version(name: str) -> int:
+    """
+    Возвращает текущую версию группы кешей.
+
+    Версия входит в ключи кеша группы, поэтому при её увеличении все прежние ключи
+    перестают читаться и вытесняются по таймауту. Отсутствующая версия заводится
+    из текущего времени в наносекундах, поэтому после вытеснения ключа версии
+    прежние поколения не читаются снова.
+
+    ### Args:
+    - name (`str`): Название группы кешей.
+
+    ### Returns:
+    - `int`: Текущая версия.
+
+    """
+    return cache.get_or_set(f'cache_version:{name}', time.time_ns, timeout=None)
+
+
+def bump_cache_version(name: str) -> None:
+    """
+    Увеличивает версию группы кешей, инвалидируя все её ключи.
+
+    ### Args:
+    - name (`str`): Название группы кешей.
+
+    """
+    key = f'cache_version:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
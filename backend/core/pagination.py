@@ -1,5 +1,148 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (LimitOffsetPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPaginator(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class KeysetPaginator(LimitOffsetPagination):
+    """
+    Пагинация по ключу `(поле сортировки, id)`.
+
+    Подключается во вьюсете через `pagination_class`. Без параметра `cursor` работает как
+    `LimitOffsetPagination`. С параметром `cursor` (пустым для первой страницы) страница выбирается
+    условием по ключу последней записи предыдущей страницы, без OFFSET и без `COUNT(*)`,
+    поэтому обход всего списка занимает линейное время. Количество `count` считается только
+    на первой странице (пустой `cursor`), на следующих оно `null`. Поля сортировки могут
+    допускать NULL, некорректный курсор дает 404.
+
+    ### Attributes вьюсета:
+    - keyset_ordering (`str`, опционально): Поле сортировки, например `'title'` или `'-id'`. По умолчанию `'id'`.
+    - estimate_count (`bool`, опционально): Возвращать количество на первой странице. Для нефильтрованных списков
+    больше `estimate_threshold` строк оно берется из `pg_class.reltuples`, иначе считается `COUNT(*)`.
+
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    max_limit = 1000
+    estimate_threshold = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.estimate_count = getattr(view, 'estimate_count', False)
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        if self.cursor is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = self.get_count(queryset) if self.estimate_count and not self.cursor else None
+
+        ordering = getattr(view, 'keyset_ordering', 'id')
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        queryset = queryset.order_by(ordering, '-pk' if self.descending else 'pk')
+        if self.cursor:
+            queryset = self.filter_after(queryset, *self.decode_cursor(self.cursor))
+
+        results = list(queryset[:self.limit + 1])
+        self.has_next = len(results) > self.limit
+        results = results[:self.limit]
+        self.last = results[-1] if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+    def get_count(self, queryset):
+        if self.estimate_count and not queryset.query.where:
+            estimate = self.get_estimated_count(queryset.model)
+            if estimate >= self.estimate_threshold:
+                return estimate
+        return super().get_count(queryset)
+
+    def get_next_link(self):
+        if self.cursor is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        cursor = self.encode_cursor(getattr(self.last, self.field), self.last.pk)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if self.cursor is None:
+            return super().get_previous_link()
+        return None
+
+    def filter_after(self, queryset, value, pk):
+        """
+        Записи после ключа `(value, pk)` в порядке `ORDER BY field, pk`.
+
+        Postgres ставит NULL последними при сортировке по возрастанию и первыми при сортировке
+        по убыванию, поэтому для полей, допускающих NULL, условие дополняется ветками `isnull`.
+        """
+        lookup = 'lt' if self.descending else 'gt'
+        if self.field in ('pk', 'id'):
+            return queryset.filter(**{f'pk__{lookup}': pk})
+
+        try:
+            field = queryset.model._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            field = None
+        if value is not None and field is not None:
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        nullable = field is None or field.null
+
+        if value is None:
+            if not nullable:
+                raise NotFound(self.invalid_cursor_message)
+            after = Q(**{f'{self.field}__isnull': True, f'pk__{lookup}': pk})
+            return queryset.filter(after | Q(**{f'{self.field}__isnull': False}) if self.descending else after)
+        after = Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value, f'pk__{lookup}': pk})
+        if nullable and not self.descending:
+            after |= Q(**{f'{self.field}__isnull': True})
+        return queryset.filter(after)
+
+    @staticmethod
+    def encode_cursor(value, pk) -> str:
+        data = json.dumps([value, pk], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    @classmethod
+    def decode_cursor(cls, cursor: str) -> tuple:
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if isinstance(pk, bool) or not isinstance(pk, int) or isinstance(value, (list, dict)):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound(cls.invalid_cursor_message)
+        return value, pk
+
+    @staticmethod
+    def get_estimated_count(model) -> int:
+        """Оценка количества строк таблицы по статистике планировщика Postgres."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        return row[0] if row else -1
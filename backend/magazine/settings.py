@@ -14,6 +14,7 @@ from pathlib import Path
 
 import boto3
 import redis
+from celery.schedules import crontab
 from corsheaders.defaults import default_headers, default_methods
 from dotenv import load_dotenv
 
@@ -59,6 +60,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -84,7 +86,8 @@ PROJECT_APPS = [
     'attributes',
     'warehouses',
     'comments',
-    'ratings'
+    'ratings',
+    'prices',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + PROJECT_APPS
@@ -279,6 +282,31 @@ CELERY_RESULT_BACKEND = REDIS_URL
 
 # CELERY BEAT
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'generate-product-feeds': {
+        'task': 'products.tasks.generate_product_feeds',
+        'schedule': crontab(minute=0),
+    },
+    'rebuild-effective-prices': {
+        'task': 'prices.tasks.rebuild_effective_prices',
+        'schedule': crontab(minute='*/15'),
+    },
+    'rebuild-product-similarities': {
+        'task': 'products.tasks.rebuild_product_similarities',
+        'schedule': crontab(minute=30, hour=3),
+    },
+}
+
+# PRODUCT FEEDS
+FEED_SHOP_NAME = os.getenv('FEED_SHOP_NAME', 'Magazine')
+FEED_SHOP_COMPANY = os.getenv('FEED_SHOP_COMPANY', FEED_SHOP_NAME)
+FEED_SITE_URL = os.getenv('FEED_SITE_URL', 'http://localhost')
+FEED_PRODUCT_URL = os.getenv('FEED_PRODUCT_URL', f'{FEED_SITE_URL}/products/{{id}}/')
+FEED_CHUNK_SIZE = int(os.getenv('FEED_CHUNK_SIZE', default=1000))
+
+# PRODUCT CHANGES FEED
+# Не меньше самой долгой транзакции записи товаров (пачки загрузки каталога), в секундах.
+PRODUCT_CHANGES_LAG = int(os.getenv('PRODUCT_CHANGES_LAG', default=60))
 
 # CACHE BACKEND
 CACHES = {
@@ -39,6 +39,7 @@ urlpatterns = [
                 path('attributes/', include(('attributes.urls', 'attributes'))),
                 # path('fileflow/', include(('fileflow.urls', 'fileflow'))),
                 path('outlets/', include(('outlets.urls', 'outlets'))),
+                path('prices/', include(('prices.urls', 'prices'))),
                 path('products/', include(('products.urls', 'products'))),
                 path('warehouses/', include(('warehouses.urls', 'warehouses'))),
             ]
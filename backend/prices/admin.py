@@ -0,0 +1,25 @@
+from django.contrib import admin
+from prices.models import EffectivePrice, PriceList, PriceListItem, Promo
+
+
+class PriceListItemInline(admin.TabularInline):
+    model = PriceListItem
+    raw_id_fields = ('product',)
+
+
+@admin.register(PriceList)
+class PriceListAdmin(admin.ModelAdmin):
+    list_display = ('title', 'outlet', 'priority', 'is_active')
+    inlines = (PriceListItemInline,)
+
+
+@admin.register(Promo)
+class PromoAdmin(admin.ModelAdmin):
+    list_display = ('title', 'outlet', 'discount', 'starts_at', 'ends_at')
+    raw_id_fields = ('products',)
+
+
+@admin.register(EffectivePrice)
+class EffectivePriceAdmin(admin.ModelAdmin):
+    list_display = ('outlet', 'product', 'base_price', 'price', 'promo', 'updated_at')
+    readonly_fields = ('outlet', 'product', 'base_price', 'price', 'promo', 'updated_at')
@@ -0,0 +1,9 @@
+import django_filters
+from prices.models import PriceListItem
+
+
+class PriceListItemFilter(django_filters.FilterSet):
+
+    class Meta:
+        model = PriceListItem
+        fields = ('price_list', 'product')
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:28
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('outlets', '0001_initial'),
+        ('products', '0015_product_shipping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=150, verbose_name='название')),
+                ('priority', models.PositiveSmallIntegerField(default=0, verbose_name='приоритет')),
+                ('is_active', models.BooleanField(default=True, verbose_name='действует')),
+                ('outlet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_lists', to='outlets.outlet', verbose_name='магазин')),
+            ],
+            options={
+                'verbose_name': 'прайс-лист',
+                'verbose_name_plural': 'прайс-листы',
+            },
+        ),
+        migrations.CreateModel(
+            name='Promo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=150, verbose_name='название')),
+                ('discount', models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)], verbose_name='скидка, %')),
+                ('starts_at', models.DateTimeField(verbose_name='начало')),
+                ('ends_at', models.DateTimeField(verbose_name='окончание')),
+                ('outlet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promos', to='outlets.outlet', verbose_name='магазин')),
+                ('products', models.ManyToManyField(related_name='promos', to='products.product', verbose_name='товары')),
+            ],
+            options={
+                'verbose_name': 'акция',
+                'verbose_name_plural': 'акции',
+            },
+        ),
+        migrations.CreateModel(
+            name='EffectivePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='цена по прайс-листу')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='итоговая цена')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='дата и время расчета')),
+                ('outlet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_prices', to='outlets.outlet', verbose_name='магазин')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_prices', to='products.product', verbose_name='товар')),
+                ('promo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='prices.promo', verbose_name='акция')),
+            ],
+            options={
+                'verbose_name': 'итоговая цена',
+                'verbose_name_plural': 'итоговые цены',
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(0)], verbose_name='цена')),
+                ('price_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='prices.pricelist', verbose_name='прайс-лист')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_list_items', to='products.product', verbose_name='товар')),
+            ],
+            options={
+                'verbose_name': 'цена в прайс-листе',
+                'verbose_name_plural': 'цены в прайс-листах',
+                'constraints': [models.UniqueConstraint(fields=('price_list', 'product'), name='prices_pricelistitem_list_product_unique')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='promo',
+            index=models.Index(fields=['starts_at', 'ends_at'], name='prices_promo_dates_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='promo',
+            constraint=models.CheckConstraint(condition=models.Q(('ends_at__gt', models.F('starts_at'))), name='prices_promo_dates_check'),
+        ),
+        migrations.AddConstraint(
+            model_name='effectiveprice',
+            constraint=models.UniqueConstraint(fields=('outlet', 'product'), name='prices_effectiveprice_outlet_product_unique'),
+        ),
+    ]
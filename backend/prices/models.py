@@ -0,0 +1,310 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.deletion import CASCADE, SET_NULL
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from outlets.models import Outlet
+from products.models import Product
+
+
+class PriceList(models.Model):
+    """
+    Модель прайс-листа.
+
+    Прайс-лист без магазина задает базовые цены для всех магазинов, прайс-лист магазина
+    переопределяет их. Если товар есть в нескольких действующих прайс-листах одного уровня,
+    берется прайс-лист с наибольшим приоритетом.
+
+    ### Args:
+    - title (`str`): Название прайс-листа.
+    - outlet (`Outlet`, опционально): Магазин. Пусто — базовый прайс-лист.
+    - priority (`int`): Приоритет прайс-листа.
+    - is_active (`bool`): Действует ли прайс-лист.
+
+    """
+    title = models.CharField(_('название'), max_length=150)
+    outlet = models.ForeignKey(Outlet, verbose_name=_('магазин'), related_name='price_lists', on_delete=CASCADE, null=True, blank=True)
+    priority = models.PositiveSmallIntegerField(_('приоритет'), default=0)
+    is_active = models.BooleanField(_('действует'), default=True)
+
+    class Meta:
+        verbose_name = _('прайс-лист')
+        verbose_name_plural = _('прайс-листы')
+
+    def __str__(self):
+        return f"{self.title} ({self.outlet or _('базовый')})"
+
+
+class PriceListItem(models.Model):
+    """
+    Модель цены товара в прайс-листе.
+
+    ### Args:
+    - price_list (`PriceList`): Прайс-лист.
+    - product (`Product`): Товар.
+    - price (`Decimal`): Цена.
+
+    """
+    price_list = models.ForeignKey(PriceList, verbose_name=_('прайс-лист'), related_name='items', on_delete=CASCADE)
+    product = models.ForeignKey(Product, verbose_name=_('товар'), related_name='price_list_items', on_delete=CASCADE)
+    price = models.DecimalField(_('цена'), max_digits=12, decimal_places=2, validators=(MinValueValidator(0),))
+
+    class Meta:
+        verbose_name = _('цена в прайс-листе')
+        verbose_name_plural = _('цены в прайс-листах')
+        constraints = (
+            models.UniqueConstraint(fields=('price_list', 'product'), name='prices_pricelistitem_list_product_unique'),
+        )
+
+    def __str__(self):
+        return f"{self.price_list_id} | {self.product_id}: {self.price}"
+
+
+class Promo(models.Model):
+    """
+    Модель акции со скидкой в процентах на набор товаров.
+
+    Из нескольких действующих акций на товар применяется акция с наибольшей скидкой.
+
+    ### Args:
+    - title (`str`): Название акции.
+    - outlet (`Outlet`, опционально): Магазин. Пусто — акция во всех магазинах.
+    - products (ManyToManyField[Product]): Товары акции.
+    - discount (`Decimal`): Скидка в процентах.
+    - starts_at (`datetime`): Начало акции.
+    - ends_at (`datetime`): Окончание акции.
+
+    """
+    title = models.CharField(_('название'), max_length=150)
+    outlet = models.ForeignKey(Outlet, verbose_name=_('магазин'), related_name='promos', on_delete=CASCADE, null=True, blank=True)
+    products = models.ManyToManyField(Product, verbose_name=_('товары'), related_name='promos')
+    discount = models.DecimalField(
+        _('скидка, %'), max_digits=5, decimal_places=2,
+        validators=(MinValueValidator(0), MaxValueValidator(100)),
+    )
+    starts_at = models.DateTimeField(_('начало'))
+    ends_at = models.DateTimeField(_('окончание'))
+
+    class Meta:
+        verbose_name = _('акция')
+        verbose_name_plural = _('акции')
+        constraints = (
+            models.CheckConstraint(condition=Q(ends_at__gt=F('starts_at')), name='prices_promo_dates_check'),
+        )
+        indexes = (
+            models.Index(fields=('starts_at', 'ends_at'), name='prices_promo_dates_idx'),
+        )
+
+    def __str__(self):
+        return f"{self.title}: -{self.discount}%"
+
+
+class EffectivePrice(models.Model):
+    """
+    Модель итоговой цены товара в магазине.
+
+    Таблица заполняется задачей `rebuild_effective_prices` по прайс-листам и действующим
+    акциям, поэтому список товаров магазина получает цены одним соединением по индексу
+    `(outlet, product)`, без разбора правил на каждый запрос.
+
+    ### Args:
+    - outlet (`Outlet`): Магазин.
+    - product (`Product`): Товар.
+    - base_price (`Decimal`): Цена по прайс-листу.
+    - price (`Decimal`): Цена с учетом акции.
+    - promo (`Promo`, опционально): Примененная акция.
+    - updated_at (`datetime`): Дата и время расчета.
+
+    ### Methods:
+    - rebuild(outlet_ids, now): Пересчитывает итоговые цены магазинов.
+    - resolve(outlet_id, base_prices, outlet_prices, promos): Итоговые цены одного магазина.
+
+    """
+    outlet = models.ForeignKey(Outlet, verbose_name=_('магазин'), related_name='effective_prices', on_delete=CASCADE)
+    product = models.ForeignKey(Product, verbose_name=_('товар'), related_name='effective_prices', on_delete=CASCADE)
+    base_price = models.DecimalField(_('цена по прайс-листу'), max_digits=12, decimal_places=2)
+    price = models.DecimalField(_('итоговая цена'), max_digits=12, decimal_places=2)
+    promo = models.ForeignKey(Promo, verbose_name=_('акция'), related_name='+', on_delete=SET_NULL, null=True, blank=True)
+    updated_at = models.DateTimeField(_('дата и время расчета'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('итоговая цена')
+        verbose_name_plural = _('итоговые цены')
+        constraints = (
+            models.UniqueConstraint(fields=('outlet', 'product'), name='prices_effectiveprice_outlet_product_unique'),
+        )
+
+    def __str__(self):
+        return f"{self.outlet_id} | {self.product_id}: {self.price}"
+
+    @staticmethod
+    def get_list_prices(outlet_id=None) -> dict:
+        """Цены действующих прайс-листов магазина (или базовых) `{product_id: цена}` с учетом приоритета."""
+        items = (
+            PriceListItem.objects
+            .filter(price_list__is_active=True, price_list__outlet_id=outlet_id)
+            .order_by('price_list__priority', 'price_list_id')
+            .values_list('product_id', 'price')
+        )
+        return dict(items.iterator(chunk_size=5000))
+
+    @staticmethod
+    def get_active_promos(now) -> dict:
+        """Действующие акции `{product_id: [(promo_id, outlet_id, скидка), ...]}`."""
+        rows = (
+            Promo.products.through.objects
+            .filter(promo__starts_at__lte=now, promo__ends_at__gt=now)
+            .values_list('product_id', 'promo_id', 'promo__outlet_id', 'promo__discount')
+        )
+        promos = {}
+        for product_id, promo_id, outlet_id, discount in rows.iterator(chunk_size=5000):
+            promos.setdefault(product_id, []).append((promo_id, outlet_id, discount))
+        return promos
+
+    @staticmethod
+    def resolve(outlet_id: int, base_prices: dict, outlet_prices: dict, promos: dict) -> dict:
+        """
+        Итоговые цены одного магазина.
+
+        ### Args:
+        - outlet_id (`int`): Магазин.
+        - base_prices (`dict`): Базовые цены из `get_list_prices()`.
+        - outlet_prices (`dict`): Цены прайс-листов магазина из `get_list_prices(outlet_id)`.
+        - promos (`dict`): Действующие акции из `get_active_promos()`.
+
+        ### Returns:
+        - `dict`: Словарь `{product_id: (цена по прайс-листу, итоговая цена, promo_id)}`.
+
+        """
+        prices = {}
+        for product_id, base_price in {**base_prices, **outlet_prices}.items():
+            promo_id, discount = None, Decimal(0)
+            for candidate_id, candidate_outlet_id, candidate_discount in promos.get(product_id, ()):
+                if candidate_outlet_id in (None, outlet_id) and candidate_discount > discount:
+                    promo_id, discount = candidate_id, candidate_discount
+            price = (base_price * (100 - discount) / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            prices[product_id] = (base_price, price, promo_id)
+        return prices
+
+    @classmethod
+    def rebuild(cls, outlet_ids=None, now=None) -> int:
+        """
+        Пересчитывает итоговые цены магазинов и записывает только изменившиеся строки.
+
+        Базовые цены и действующие акции читаются один раз на все магазины, цены прайс-листов
+        магазина — одним запросом на магазин.
+
+        ### Args:
+        - outlet_ids (`Iterable[int]`, опционально): Магазины. По умолчанию все.
+        - now (`datetime`, опционально): Момент, на который определяются действующие акции.
+
+        ### Returns:
+        - `int`: Количество созданных, измененных и удаленных строк.
+
+        """
+        now = now or timezone.now()
+        outlets = Outlet.objects.order_by('pk')
+        if outlet_ids is not None:
+            outlets = outlets.filter(pk__in=outlet_ids)
+        base_prices = cls.get_list_prices()
+        promos = cls.get_active_promos(now)
+
+        changed = 0
+        for outlet_id in outlets.values_list('pk', flat=True):
+            prices = cls.resolve(outlet_id, base_prices, cls.get_list_prices(outlet_id), promos)
+            current = {
+                product_id: (base_price, price, promo_id)
+                for product_id, base_price, price, promo_id in (
+                    cls.objects.filter(outlet_id=outlet_id).values_list('product_id', 'base_price', 'price', 'promo_id')
+                )
+            }
+            updates = [
+                cls(outlet_id=outlet_id, product_id=product_id, base_price=base_price, price=price, promo_id=promo_id)
+                for product_id, (base_price, price, promo_id) in prices.items()
+                if current.get(product_id) != (base_price, price, promo_id)
+            ]
+            removed = current.keys() - prices.keys()
+            with transaction.atomic():
+                cls.objects.bulk_create(
+                    updates,
+                    batch_size=5000,
+                    update_conflicts=True,
+                    unique_fields=('outlet', 'product'),
+                    update_fields=('base_price', 'price', 'promo', 'updated_at'),
+                )
+                if removed:
+                    cls.objects.filter(outlet_id=outlet_id, product_id__in=removed).delete()
+            changed += len(updates) + len(removed)
+        return changed
+
+
+def schedule_effective_prices_rebuild(outlet_id=None):
+    """
+    Ставит пересчет итоговых цен магазина (без магазина — всех магазинов) после фиксации транзакции.
+
+    Запросы одной транзакции объединяются: после фиксации ставится одна задача на все затронутые
+    магазины, поэтому массовое изменение строк прайс-листа не порождает задачу на каждую строку.
+    """
+    from prices.tasks import rebuild_effective_prices
+
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'effective_prices_rebuild', None)
+    # отложенный пересчет пропадает из очереди on_commit при откате транзакции или точки сохранения
+    if pending is not None and any(entry[1] is pending for entry in connection.run_on_commit):
+        pending.outlet_ids.add(outlet_id)
+        return
+
+    def rebuild():
+        connection.effective_prices_rebuild = None
+        rebuild_effective_prices.delay(None if None in rebuild.outlet_ids else sorted(rebuild.outlet_ids))
+
+    rebuild.outlet_ids = {outlet_id}
+    connection.effective_prices_rebuild = rebuild
+    transaction.on_commit(rebuild)
+
+
+@receiver(pre_save, sender=PriceList)
+@receiver(pre_save, sender=Promo)
+def remember_rule_outlet(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and 'outlet' not in update_fields):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('outlet_id').first()
+    if previous is not None:
+        instance._previous_outlet_id = previous[0]
+
+
+@receiver(post_save, sender=PriceList)
+@receiver(post_delete, sender=PriceList)
+@receiver(post_save, sender=Promo)
+@receiver(post_delete, sender=Promo)
+def rebuild_rule_effective_prices(sender, instance, **kwargs):
+    if '_previous_outlet_id' in instance.__dict__:
+        previous_outlet_id = instance.__dict__.pop('_previous_outlet_id')
+        if previous_outlet_id != instance.outlet_id:
+            schedule_effective_prices_rebuild(previous_outlet_id)
+    schedule_effective_prices_rebuild(instance.outlet_id)
+
+
+@receiver(post_save, sender=PriceListItem)
+@receiver(post_delete, sender=PriceListItem)
+def rebuild_item_effective_prices(sender, instance, **kwargs):
+    outlet_id = PriceList.objects.filter(pk=instance.price_list_id).values_list('outlet_id', flat=True).first()
+    schedule_effective_prices_rebuild(outlet_id)
+
+
+@receiver(m2m_changed, sender=Promo.products.through)
+def rebuild_promo_effective_prices(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_effective_prices_rebuild(instance.outlet_id if isinstance(instance, Promo) else None)
+
+
+@receiver(post_save, sender=Outlet)
+def rebuild_outlet_effective_prices(sender, instance, created, **kwargs):
+    if created:
+        schedule_effective_prices_rebuild(instance.pk)
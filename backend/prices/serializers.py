@@ -0,0 +1,30 @@
+from rest_framework import serializers
+from prices.models import PriceList, PriceListItem, Promo
+
+
+class PriceListSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PriceList
+        fields = '__all__'
+
+
+class PriceListItemSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PriceListItem
+        fields = '__all__'
+
+
+class PromoSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Promo
+        fields = '__all__'
+
+    def validate(self, attrs):
+        starts_at = attrs.get('starts_at', getattr(self.instance, 'starts_at', None))
+        ends_at = attrs.get('ends_at', getattr(self.instance, 'ends_at', None))
+        if starts_at and ends_at and ends_at <= starts_at:
+            raise serializers.ValidationError({'ends_at': 'Окончание акции должно быть позже начала.'})
+        return attrs
@@ -0,0 +1,11 @@
+from celery import shared_task
+
+from prices.models import EffectivePrice
+
+
+@shared_task
+def rebuild_effective_prices(outlet_ids: list = None) -> int:
+    """
+    Пересчитывает итоговые цены магазинов `outlet_ids` (по умолчанию всех) по прайс-листам и акциям.
+    """
+    return EffectivePrice.rebuild(outlet_ids)
@@ -0,0 +1,131 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from addresses.models import Address, City, Country, Region
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from products.models import Brand, Product, ProductDocument
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import EffectivePrice, PriceList, PriceListItem, Promo
+from ..tasks import rebuild_effective_prices
+from outlets.models import Outlet
+
+User = get_user_model()
+
+
+class EffectivePriceTest(TestCase):
+    def setUp(self):
+        # обратные вызовы on_commit из подготовки выполняются сразу, чтобы пересчет не оставался отложенным в транзакции теста
+        with mock.patch.object(rebuild_effective_prices, 'delay'), self.captureOnCommitCallbacks(execute=True):
+            owner = User.objects.create_user(email='owner@test.py', password='password')
+            country = Country.objects.create(title='Россия')
+            city = City.objects.create(region=Region.objects.create(country=country, title='Область'), title='Город')
+            address = Address.objects.create(city=city, street='Тестовая улица', home=5, postcode='122896')
+            self.outlet = Outlet.objects.create(title='Центр', address=address, owner=owner)
+            self.other_outlet = Outlet.objects.create(title='Окраина', address=address, owner=owner)
+
+            brand = Brand.objects.create(title='Test Brand')
+            self.products = [
+                Product.objects.create(part_number=f'P{index}', title=f'Товар {index}', brand=brand)
+                for index in range(3)
+            ]
+            base = PriceList.objects.create(title='Базовый')
+            for product, price in zip(self.products, ('100.00', '200.00')):
+                PriceListItem.objects.create(price_list=base, product=product, price=price)
+            outlet_list = PriceList.objects.create(title='Центр', outlet=self.outlet)
+            PriceListItem.objects.create(price_list=outlet_list, product=self.products[1], price='180.00')
+
+            now = timezone.now()
+            promo = Promo.objects.create(title='Скидка', discount='10', starts_at=now - timedelta(days=1), ends_at=now + timedelta(days=1))
+            promo.products.set((self.products[0],))
+            self.promo = promo
+        self.client = APIClient()
+
+    def get_prices(self, outlet):
+        return {
+            product_id: (base_price, price)
+            for product_id, base_price, price in EffectivePrice.objects.filter(outlet=outlet).values_list('product_id', 'base_price', 'price')
+        }
+
+    def test_rebuild_resolves_lists_and_promos(self):
+        EffectivePrice.rebuild()
+        self.assertEqual(self.get_prices(self.outlet), {
+            self.products[0].id: (Decimal('100.00'), Decimal('90.00')),
+            self.products[1].id: (Decimal('180.00'), Decimal('180.00')),
+        })
+        self.assertEqual(self.get_prices(self.other_outlet)[self.products[1].id], (Decimal('200.00'), Decimal('200.00')))
+
+        self.assertEqual(EffectivePrice.rebuild(), 0)
+        self.assertEqual(EffectivePrice.rebuild(now=self.promo.ends_at), 2)
+        self.assertEqual(self.get_prices(self.outlet)[self.products[0].id], (Decimal('100.00'), Decimal('100.00')))
+
+    def test_changes_schedule_rebuild(self):
+        with mock.patch.object(rebuild_effective_prices, 'delay', side_effect=rebuild_effective_prices) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                item = PriceListItem.objects.create(price_list=PriceList.objects.get(outlet=self.outlet), product=self.products[2], price='50.00')
+            delay.assert_called_with([self.outlet.id])
+            self.assertEqual(self.get_prices(self.outlet)[self.products[2].id], (Decimal('50.00'), Decimal('50.00')))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                item.delete()
+            self.assertNotIn(self.products[2].id, self.get_prices(self.outlet))
+
+    def test_outlet_reassignment_rebuilds_both_outlets(self):
+        EffectivePrice.rebuild()
+        outlet_list = PriceList.objects.get(outlet=self.outlet)
+        with mock.patch.object(rebuild_effective_prices, 'delay', side_effect=rebuild_effective_prices) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                outlet_list.outlet = self.other_outlet
+                outlet_list.save()
+        delay.assert_called_once_with(sorted((self.outlet.id, self.other_outlet.id)))
+        self.assertEqual(self.get_prices(self.outlet)[self.products[1].id], (Decimal('200.00'), Decimal('200.00')))
+        self.assertEqual(self.get_prices(self.other_outlet)[self.products[1].id], (Decimal('180.00'), Decimal('180.00')))
+
+    def test_item_changes_merged_into_one_task(self):
+        outlet_list = PriceList.objects.get(outlet=self.outlet)
+        with mock.patch.object(rebuild_effective_prices, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                other_list = PriceList.objects.create(title='Окраина', outlet=self.other_outlet)
+                for product in self.products:
+                    PriceListItem.objects.update_or_create(price_list=outlet_list, product=product, defaults={'price': '75.00'})
+                PriceListItem.objects.create(price_list=other_list, product=self.products[0], price='70.00')
+            delay.assert_called_once_with(sorted((self.outlet.id, self.other_outlet.id)))
+
+            delay.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                PriceListItem.objects.filter(price_list=outlet_list).first().delete()
+                PriceListItem.objects.create(price_list=PriceList.objects.get(outlet=None), product=self.products[2], price='300.00')
+            delay.assert_called_once_with(None)
+
+    def test_product_list_with_outlet_prices(self):
+        EffectivePrice.rebuild()
+        ProductDocument.build(self.products)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/products/', {'outlet': self.outlet.id, 'cursor': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum('prices_effectiveprice' in query['sql'] for query in queries.captured_queries), 2)
+        self.assertEqual(sum('products_productdocument' in query['sql'] for query in queries.captured_queries), 1)
+        prices = {product['id']: (product['base_price'], product['price']) for product in response.data['results']}
+        self.assertEqual(prices, {
+            self.products[0].id: ('100.00', '90.00'),
+            self.products[1].id: ('180.00', '180.00'),
+            self.products[2].id: (None, None),
+        })
+        self.assertNotIn('price', self.client.get('/api/v1/products/').data['results'][0])
+
+    def test_promo_dates_validated(self):
+        admin = User.objects.create_superuser('admin@test.py', 'password')
+        self.client.force_authenticate(admin)
+        now = timezone.now()
+        response = self.client.post('/api/v1/prices/promos/', {
+            'title': 'Ошибка', 'discount': '5', 'products': [self.products[0].id],
+            'starts_at': now.isoformat(), 'ends_at': (now - timedelta(days=1)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/v1/prices/lists/').status_code, status.HTTP_200_OK)
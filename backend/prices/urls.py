@@ -0,0 +1,12 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from prices.views import PriceListItemViewSet, PriceListViewSet, PromoViewSet
+
+router = DefaultRouter()
+router.register('lists', PriceListViewSet, basename='price-lists')
+router.register('items', PriceListItemViewSet, basename='price-list-items')
+router.register('promos', PromoViewSet, basename='promos')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,27 @@
+from core.permissions import IsAdmin, IsModerator, ReadOnly
+from django_filters import rest_framework as filters
+from rest_framework import viewsets
+from prices.filters import PriceListItemFilter
+from prices.models import PriceList, PriceListItem, Promo
+from prices.serializers import (PriceListItemSerializer, PriceListSerializer,
+                                PromoSerializer)
+
+
+class PriceListViewSet(viewsets.ModelViewSet):
+    permission_classes = (IsModerator | IsAdmin | ReadOnly,)
+    serializer_class = PriceListSerializer
+    queryset = PriceList.objects.order_by('pk')
+
+
+class PriceListItemViewSet(viewsets.ModelViewSet):
+    permission_classes = (IsModerator | IsAdmin | ReadOnly,)
+    serializer_class = PriceListItemSerializer
+    queryset = PriceListItem.objects.order_by('pk')
+    filterset_class = PriceListItemFilter
+    filter_backends = (filters.DjangoFilterBackend,)
+
+
+class PromoViewSet(viewsets.ModelViewSet):
+    permission_classes = (IsModerator | IsAdmin | ReadOnly,)
+    serializer_class = PromoSerializer
+    queryset = Promo.objects.order_by('-starts_at', 'pk')
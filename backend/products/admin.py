@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from products.models import Product, ProductsCategory, Manufacturer, Brand
+from products.models import Product, ProductCounter, ProductFeed, ProductImage, ProductImport, ProductsCategory, ProductSimilarity, ProductTombstone, ProductUnique, Manufacturer, Brand, StockLevel
 
 
 @admin.register(ProductsCategory)
@@ -21,3 +21,52 @@ class BrandAdmin(admin.ModelAdmin):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(ProductImage)
+class ProductImageAdmin(admin.ModelAdmin):
+    list_display = ('product', 'image', 'is_first')
+    raw_id_fields = ('product', 'image')
+
+
+@admin.register(ProductUnique)
+class ProductUniqueAdmin(admin.ModelAdmin):
+    list_display = ('product', 'warehouse', 'status', 'serial', 'barcode')
+    list_filter = ('status',)
+    search_fields = ('serial', 'barcode')
+    raw_id_fields = ('product', 'warehouse')
+
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    list_display = ('product', 'warehouse', 'quantity', 'reserved')
+    readonly_fields = ('quantity', 'reserved')
+
+
+@admin.register(ProductImport)
+class ProductImportAdmin(admin.ModelAdmin):
+    list_display = ('file', 'status', 'processed', 'created_products', 'failed_rows', 'created_at')
+    readonly_fields = ('processed', 'created_products', 'created_attributes', 'failed_rows', 'errors')
+
+
+@admin.register(ProductFeed)
+class ProductFeedAdmin(admin.ModelAdmin):
+    list_display = ('name', 'file', 'etag', 'generated_at')
+    readonly_fields = ('file', 'etag', 'chunks', 'generated_at')
+
+
+@admin.register(ProductTombstone)
+class ProductTombstoneAdmin(admin.ModelAdmin):
+    list_display = ('product_id', 'deleted_at')
+
+
+@admin.register(ProductSimilarity)
+class ProductSimilarityAdmin(admin.ModelAdmin):
+    list_display = ('product', 'similar', 'rank', 'score')
+    raw_id_fields = ('product', 'similar')
+
+
+@admin.register(ProductCounter)
+class ProductCounterAdmin(admin.ModelAdmin):
+    list_display = ('brand', 'manufacturer', 'category', 'count')
+    readonly_fields = ('count',)
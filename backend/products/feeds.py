@@ -0,0 +1,188 @@
+import re
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+
+def get_flat_categories(tree: list, parent: dict = None) -> list:
+    """
+    Разворачивает дерево `ProductsCategory.get_tree()` в список словарей
+    `{'id', 'parent_id', 'name', 'full_name'}` в порядке обхода дерева.
+    """
+    categories = []
+    for node in tree:
+        category = {
+            'id': node['id'],
+            'parent_id': parent['id'] if parent else None,
+            'name': node['category_name'],
+            'full_name': f"{parent['full_name']} > {node['category_name']}" if parent else node['category_name'],
+        }
+        categories.append(category)
+        categories.extend(get_flat_categories(node['children'], category))
+    return categories
+
+
+def clean(value) -> str:
+    """Строка без управляющих символов, недопустимых в XML 1.0."""
+    return INVALID_XML_CHARS.sub('', str(value))
+
+
+def tag(tag_name: str, value, **attrs) -> str:
+    """Элемент XML с экранированным текстом или пустая строка, если значения нет."""
+    if value is None or value == '':
+        return ''
+    attrs = ''.join(f' {key}={quoteattr(clean(attr))}' for key, attr in attrs.items() if attr is not None)
+    return f'<{tag_name}{attrs}>{escape(clean(value))}</{tag_name}>'
+
+
+def format_value(value) -> str:
+    if isinstance(value, bool):
+        return 'да' if value else 'нет'
+    return value
+
+
+class ProductFeedFormat:
+    """
+    Базовый формат фида товаров.
+
+    Фид собирается из заголовка, фрагментов с товарами и окончания. Товары берутся
+    из документов `ProductDocument`, цены — из `EffectivePrice.resolve()` по базовым
+    прайс-листам, поэтому отрисовка не требует дополнительных запросов.
+
+    ### Methods:
+    - header(categories, updated_at): Заголовок фида.
+    - footer(): Окончание фида.
+    - render_item(data, categories, price): Элемент фида для документа товара.
+
+    """
+    content_type = 'application/xml; charset=utf-8'
+
+    @staticmethod
+    def get_product_url(data: dict) -> str:
+        return settings.FEED_PRODUCT_URL.format(id=data['id'])
+
+    @staticmethod
+    def get_image_urls(data: dict) -> list:
+        """Абсолютные ссылки на изображения товара, главное изображение первым."""
+        return [urljoin(settings.FEED_SITE_URL, url) for url in data.get('images', ())]
+
+    def header(self, categories: list, updated_at) -> str:
+        raise NotImplementedError
+
+    def footer(self) -> str:
+        raise NotImplementedError
+
+    def render_item(self, data: dict, categories: dict, price: tuple) -> str:
+        """
+        Элемент фида для документа товара.
+
+        ### Args:
+        - data (`dict`): Документ товара.
+        - categories (`dict`): Категории `get_flat_categories()` по `id`.
+        - price (`tuple`): Цена `(цена по прайс-листу, итоговая цена, promo_id)`.
+
+        """
+        raise NotImplementedError
+
+
+class YmlFeedFormat(ProductFeedFormat):
+    """Формат YML Яндекс Маркета."""
+
+    def header(self, categories: list, updated_at) -> str:
+        items = ''.join(
+            tag('category', category['name'], id=category['id'], parentId=category['parent_id'])
+            for category in categories
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<yml_catalog date={quoteattr(updated_at.isoformat(timespec="seconds"))}><shop>'
+            f'{tag("name", settings.FEED_SHOP_NAME)}{tag("company", settings.FEED_SHOP_COMPANY)}{tag("url", settings.FEED_SITE_URL)}'
+            '<currencies><currency id="RUR" rate="1"/></currencies>'
+            f'<categories>{items}</categories><offers>\n'
+        )
+
+    def footer(self) -> str:
+        return '</offers></shop></yml_catalog>\n'
+
+    def render_item(self, data: dict, categories: dict, price: tuple) -> str:
+        base_price, price, _ = price
+        dimensions = (data['length'], data['width'], data['depth'])
+        pictures = ''.join(tag('picture', url) for url in self.get_image_urls(data))
+        params = ''.join(
+            tag('param', format_value(attribute['value']), name=attribute['name'], unit=attribute['unit'])
+            for attribute in data['attributes']
+        )
+        return (
+            f'<offer id="{data["id"]}">'
+            f'{tag("name", data["title"])}'
+            f'{tag("vendor", data["brand"]["title"])}'
+            f'{tag("vendorCode", data["part_number"])}'
+            f'{tag("url", self.get_product_url(data))}'
+            f'{tag("price", price)}'
+            f'{tag("oldprice", base_price if price < base_price else None)}'
+            f'{tag("currencyId", "RUR")}'
+            f'{tag("categoryId", data["category"]["id"] if data["category"] else None)}'
+            f'{pictures}'
+            f'{tag("description", data["description"])}'
+            f'{tag("country_of_origin", data["manufacturer"]["country"] if data["manufacturer"] else None)}'
+            f'{tag("weight", data["weight"])}'
+            f'{tag("dimensions", "/".join(str(value) for value in dimensions) if all(dimensions) else None)}'
+            f'{params}</offer>\n'
+        )
+
+
+class GoogleMerchantFeedFormat(ProductFeedFormat):
+    """Формат RSS 2.0 Google Merchant Center."""
+    max_additional_images = 10
+
+    def header(self, categories: list, updated_at) -> str:
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss xmlns:g="http://base.google.com/ns/1.0" version="2.0"><channel>'
+            f'{tag("title", settings.FEED_SHOP_NAME)}{tag("link", settings.FEED_SITE_URL)}'
+            f'{tag("description", settings.FEED_SHOP_COMPANY)}\n'
+        )
+
+    def footer(self) -> str:
+        return '</channel></rss>\n'
+
+    def render_item(self, data: dict, categories: dict, price: tuple) -> str:
+        base_price, price, _ = price
+        category = categories.get(data['category']['id']) if data['category'] else None
+        shipping_weight = f"{data['weight']} kg" if data['weight'] else None
+        images = self.get_image_urls(data)
+        additional_images = ''.join(
+            tag('g:additional_image_link', url) for url in images[1:self.max_additional_images + 1]
+        )
+        details = ''.join(
+            '<g:product_detail>'
+            f'{tag("g:attribute_name", attribute["name"])}'
+            f'{tag("g:attribute_value", " ".join(str(value) for value in (format_value(attribute["value"]), attribute["unit"]) if value is not None))}'
+            '</g:product_detail>'
+            for attribute in data['attributes']
+        )
+        return (
+            '<item>'
+            f'{tag("g:id", data["id"])}'
+            f'{tag("g:title", data["title"])}'
+            f'{tag("g:description", data["description"])}'
+            f'{tag("g:link", self.get_product_url(data))}'
+            f'{tag("g:image_link", images[0] if images else None)}'
+            f'{additional_images}'
+            f'{tag("g:price", f"{base_price} RUB")}'
+            f'{tag("g:sale_price", f"{price} RUB" if price < base_price else None)}'
+            f'{tag("g:brand", data["brand"]["title"])}'
+            f'{tag("g:mpn", data["part_number"])}'
+            f'{tag("g:product_type", category["full_name"] if category else None)}'
+            f'{tag("g:shipping_weight", shipping_weight)}'
+            f'{details}</item>\n'
+        )
+
+
+FEED_FORMATS = {
+    'yml': YmlFeedFormat,
+    'google': GoogleMerchantFeedFormat,
+}
@@ -1,10 +1,121 @@
+import hashlib
+import json
+
 import django_filters
-from products.models import Product
+from attributes.models import Attribute
+from core.cache import get_cache_version
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db.models import F, FilteredRelation, Q
+from products.models import Product, ProductsCategory
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+ATTRIBUTE_PARAM_PREFIX = 'attr.'
+
+
+def get_attribute_selection(query_params) -> dict:
+    """
+    Разбирает параметры `attr.<название>=a,b`, `attr.<название>__gte=x` и `attr.<название>__lte=y`.
+
+    ### Args:
+    - query_params (`QueryDict`): Параметры запроса.
+
+    ### Raises:
+    - ValidationError: Если граница диапазона не число.
+
+    ### Returns:
+    - `dict`: Выбор вида `{название: {'in': [...], 'gte': число, 'lte': число}}`
+    для `Attribute.filter_objects()` с отсортированными значениями.
+
+    """
+    selection = {}
+    for key, value in query_params.items():
+        if not key.startswith(ATTRIBUTE_PARAM_PREFIX) or not value:
+            continue
+        name, _, lookup = key[len(ATTRIBUTE_PARAM_PREFIX):].partition('__')
+        if lookup in ('gte', 'lte'):
+            try:
+                selection.setdefault(name, {})[lookup] = float(value.replace(',', '.'))
+            except ValueError:
+                raise ValidationError({key: 'Ожидается число.'})
+        elif not lookup:
+            selection.setdefault(name, {})['in'] = sorted({item.strip() for item in value.split(',') if item.strip()})
+        else:
+            raise ValidationError({key: 'Допустимые условия: __gte, __lte или список значений.'})
+    return selection
+
+
+class AttributeFilterBackend(BaseFilterBackend):
+    """
+    Фильтр товаров по параметрам `attr.*`: `?attr.Вес__gte=2&attr.Цвет=красный,синий&attr.Wi-Fi=да`.
+
+    Параметры разбираются `get_attribute_selection()` и компилируются по схеме атрибутов
+    `Attribute.compile_selection()` в подзапросы `EXISTS` по индексам `AttributeValue`.
+    План кешируется по хешу нормализованного выбора под версией `attribute_filters`,
+    которая увеличивается при изменении значений атрибутов. Неизвестный атрибут
+    или диапазон по нечисловому атрибуту дают ответ 400.
+    """
+    plan_cache_timeout = 60 * 60
+
+    def filter_queryset(self, request, queryset, view):
+        selection = get_attribute_selection(request.query_params)
+        if not selection:
+            return queryset
+        selection_hash = hashlib.md5(json.dumps(selection, sort_keys=True).encode()).hexdigest()
+        cache_key = f'attribute_filters:{get_cache_version("attribute_filters")}:{queryset.model._meta.label_lower}:{selection_hash}'
+        plan = cache.get(cache_key)
+        if plan is None:
+            plan = Attribute.compile_selection(queryset.model, selection)
+            cache.set(cache_key, plan, timeout=self.plan_cache_timeout)
+        return Attribute.apply_selection(queryset, plan)
 
 
 class ProductFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(lookup_expr='icontains')
+    search = django_filters.CharFilter(method='filter_search', label='Полнотекстовый поиск')
+    category_tree = django_filters.NumberFilter(method='filter_category_tree', label='Категория с подкатегориями')
+    volume = django_filters.RangeFilter(label='Объем, м³')
+    volumetric_weight = django_filters.RangeFilter(label='Объемный вес, кг')
+    weight = django_filters.RangeFilter(label='Вес, кг')
+    shipping_class = django_filters.MultipleChoiceFilter(choices=Product.ShippingClass.choices, label='Класс доставки')
+    outlet = django_filters.NumberFilter(method='filter_outlet', label='Цены магазина')
 
     class Meta:
         model = Product
-        fields = ('title',)
+        fields = ('title', 'search', 'category_tree', 'volume', 'volumetric_weight', 'weight', 'shipping_class', 'outlet')
+
+    def filter_category_tree(self, queryset, name, value):
+        """
+        Товары категории и всех ее потомков.
+
+        Путь категории подставляется в запрос константой, поэтому `path LIKE '<path>%'`
+        идет по индексу `varchar_pattern_ops`, который Django создает для уникального поля `path`.
+        """
+        path = ProductsCategory.objects.filter(pk=value).values_list('path', flat=True).first()
+        if path is None:
+            return queryset.none()
+        return queryset.filter(category__path__startswith=path)
+
+    def filter_outlet(self, queryset, name, value):
+        """
+        Добавляет итоговые цены магазина `price` и `base_price` из таблицы `EffectivePrice`
+        одним LEFT JOIN по уникальному индексу `(outlet, product)`.
+        """
+        return (
+            queryset
+            .alias(outlet_price=FilteredRelation('effective_prices', condition=Q(effective_prices__outlet_id=value)))
+            .annotate(price=F('outlet_price__price'), base_price=F('outlet_price__base_price'))
+        )
+
+    def filter_search(self, queryset, name, value):
+        """Поиск по `search_vector` с сортировкой по релевантности."""
+        query = SearchQuery(value, config='simple', search_type='websearch')
+        for config in Product.SEARCH_CONFIGS:
+            query |= SearchQuery(value, config=config, search_type='websearch')
+        return (
+            queryset
+            .filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', 'id')
+        )
@@ -0,0 +1,254 @@
+import csv
+import io
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from attributes.models import (Attribute, AttributeName, AttributeValue,
+                               DataType, StrTypeChoice, Unit)
+from attributes.parsers import find_unit, normalize_choice
+from core.cache import bump_cache_version
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+from products.models import (Brand, Manufacturer, Product, ProductCounter,
+                             ProductImport, ProductsCategory,
+                             schedule_product_documents_rebuild)
+from products.parsers import IMPORT_DIMENSION_FIELDS, parse_import_row
+
+ATTRIBUTE_COLUMN_PREFIX = 'attr:'
+
+
+def read_import_rows(file, file_format: str):
+    """
+    Читает строки файла каталога в формате выгрузки `Product.export()`.
+
+    ### Args:
+    - file: Бинарный файл.
+    - file_format (`str`): `csv` или `ndjson`.
+
+    ### Yields:
+    - `dict`: Поля товара и `attributes` — словарь `{название: строка значения}`.
+    В CSV атрибуты берутся из колонок `attr:<название>`.
+
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    if file_format == 'ndjson':
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    for row in csv.DictReader(text):
+        row['attributes'] = {
+            column[len(ATTRIBUTE_COLUMN_PREFIX):]: row.pop(column)
+            for column in list(row)
+            if column and column.startswith(ATTRIBUTE_COLUMN_PREFIX)
+        }
+        yield row
+
+
+class ProductImporter:
+    """
+    Загрузчик каталога товаров из файла `ProductImport`.
+
+    Строки разбираются функцией `parse_import_row()` в пуле процессов, бренды, производители,
+    категории, ЕИ и варианты строк берутся из словарей, загруженных один раз, а товары,
+    типы данных и атрибуты записываются `bulk_create` по пачкам в отдельных транзакциях.
+
+    Категория указывается id (так ее выгружает `Product.export()`) или названием, если оно
+    однозначно в дереве. Строки с несуществующими справочниками, слишком длинными полями,
+    названиями или значениями атрибутов и целыми вне диапазона `IntegerField` не записываются
+    и учитываются в `failed_rows`, поэтому не прерывают транзакцию пачки.
+
+    Варианты строк сопоставляются по нормализованному ключу `StrTypeChoice.key`. Типы данных
+    находятся и создаются `DataType.get_or_create_many()`: числовые и логические — по `(название, значение, ЕИ)`,
+    строковые — по названию и единственному варианту, так же, как в `DataType.parse_value_get_or_create()`.
+
+    ### Args:
+    - product_import (`ProductImport`): Загрузка.
+    - chunk_size (`int`, опционально): Количество строк в пачке и транзакции.
+    - workers (`int`, опционально): Количество процессов разбора, `0` — разбор в текущем процессе.
+    - progress (`callable`, опционально): Вызывается с `product_import` после каждой пачки.
+
+    ### Methods:
+    - run(): Загружает файл начиная со строки `product_import.processed`.
+
+    """
+    max_errors = 1000
+    int_range = (-2 ** 31, 2 ** 31 - 1)
+
+    def __init__(self, product_import: ProductImport, chunk_size: int = 1000, workers: int = 0, progress=None):
+        self.product_import = product_import
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.progress = progress
+
+        self.content_type = ContentType.objects.get_for_model(Product)
+        self.max_lengths = {
+            'part_number': Product._meta.get_field('part_number').max_length,
+            'title': Product._meta.get_field('title').max_length,
+            'brand': Brand._meta.get_field('title').max_length,
+        }
+        self.brands = {title.lower(): pk for pk, title in Brand.objects.values_list('pk', 'title')}
+        self.manufacturers = {title.lower(): pk for pk, title in Manufacturer.objects.values_list('pk', 'title')}
+        self.attribute_max_lengths = {
+            'name': min(DataType._meta.get_field('name').max_length, AttributeName._meta.get_field('name').max_length),
+            'value': min(StrTypeChoice._meta.get_field('name').max_length, StrTypeChoice._meta.get_field('key').max_length),
+        }
+        self.category_ids = set(ProductsCategory.objects.values_list('pk', flat=True))
+        self.categories = {}
+        for pk, name in ProductsCategory.objects.values_list('pk', 'category_name'):
+            self.categories[name.lower()] = None if name.lower() in self.categories else pk
+        self.choices = dict(StrTypeChoice.objects.values_list('key', 'pk'))
+        self.units = list(Unit.objects.order_by('pk'))
+        self.unit_ids = {}
+        self.data_types = {}
+
+    def run(self) -> ProductImport:
+        product_import = self.product_import
+        product_import.status = ProductImport.Status.RUNNING
+        product_import.save(update_fields=('status', 'updated_at'))
+
+        executor = None
+        if self.workers:
+            executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            with product_import.file.open('rb') as file:
+                rows = islice(read_import_rows(file, product_import.file_format), product_import.processed, None)
+                while chunk := list(islice(rows, self.chunk_size)):
+                    if executor:
+                        parsed = list(executor.map(parse_import_row, chunk, chunksize=max(len(chunk) // (self.workers * 4), 1)))
+                    else:
+                        parsed = [parse_import_row(row) for row in chunk]
+                    self.write_chunk(parsed)
+                    if self.progress:
+                        self.progress(product_import)
+        except Exception:
+            product_import.status = ProductImport.Status.FAILED
+            product_import.save(update_fields=('status', 'updated_at'))
+            raise
+        finally:
+            if executor:
+                executor.shutdown()
+
+        product_import.status = ProductImport.Status.DONE
+        product_import.save(update_fields=('status', 'updated_at'))
+        return product_import
+
+    def write_chunk(self, parsed: list) -> None:
+        """Записывает пачку разобранных строк и продвигает `processed` в одной транзакции."""
+        product_import = self.product_import
+        errors, rows = [], []
+        for number, (row, error) in enumerate(parsed, start=product_import.processed + 1):
+            error = error or self.validate(row)
+            if error:
+                errors.append({'row': number, 'error': error})
+            else:
+                rows.append(row)
+
+        with transaction.atomic():
+            self.create_brands({row['brand'] for row in rows if row['brand'].lower() not in self.brands})
+            products = Product.objects.bulk_create(
+                Product(
+                    part_number=row['part_number'],
+                    title=row['title'],
+                    description=row['description'] or None,
+                    brand_id=self.brands[row['brand'].lower()],
+                    manufacturer_id=self.manufacturers.get(row['manufacturer'].lower()),
+                    category_id=self.get_category_id(row['category']),
+                    **{field: row[field] for field in IMPORT_DIMENSION_FIELDS},
+                )
+                for row in rows
+            )
+            product_ids = [product.pk for product in products]
+            ProductCounter.add(products)
+            Product.objects.filter(pk__in=product_ids).update(search_vector=Product.get_search_vector(
+                F('title'), F('part_number'), F('description'),
+                Subquery(Brand.objects.filter(pk=OuterRef('brand_id')).values('title')),
+            ))
+
+            attributes = self.create_attributes(products, rows)
+
+            product_import.processed += len(parsed)
+            product_import.created_products += len(products)
+            product_import.created_attributes += len(attributes)
+            product_import.failed_rows += len(errors)
+            product_import.errors = (product_import.errors + errors)[:self.max_errors]
+            product_import.save()
+
+            if product_ids:
+                schedule_product_documents_rebuild(pk__in=product_ids)
+                transaction.on_commit(lambda: bump_cache_version('product_suggestions'))
+                transaction.on_commit(lambda: bump_cache_version('product_facets'))
+                transaction.on_commit(lambda: bump_cache_version('product_counters'))
+
+    def validate(self, row: dict):
+        for field, max_length in self.max_lengths.items():
+            if len(row[field]) > max_length:
+                return f'Поле {field} длиннее {max_length} символов.'
+        if row['manufacturer'] and row['manufacturer'].lower() not in self.manufacturers:
+            return f'Не найдено значение поля manufacturer: {row["manufacturer"]}.'
+        if row['category'] and not self.get_category_id(row['category']):
+            if self.categories.get(row['category'].lower(), 0) is None:
+                return f'Название категории {row["category"]} неоднозначно, укажите id категории.'
+            return f'Не найдено значение поля category: {row["category"]}.'
+        for name, type_name, value, _ in row['attributes']:
+            if len(name) > self.attribute_max_lengths['name']:
+                return f'Название атрибута длиннее {self.attribute_max_lengths["name"]} символов: {name[:50]}…'
+            if type_name == 'str' and max(len(value), len(normalize_choice(value))) > self.attribute_max_lengths['value']:
+                return f'Значение атрибута {name} длиннее {self.attribute_max_lengths["value"]} символов.'
+            if type_name == 'int' and not self.int_range[0] <= value <= self.int_range[1]:
+                return f'Значение атрибута {name} вне диапазона целых чисел.'
+        return None
+
+    def get_category_id(self, category: str):
+        """Категория по id или по названию, если оно однозначно в дереве."""
+        if category.isdigit():
+            return int(category) if int(category) in self.category_ids else None
+        return self.categories.get(category.lower())
+
+    def create_brands(self, titles: set) -> None:
+        for brand in Brand.objects.bulk_create(Brand(title=title) for title in titles):
+            self.brands[brand.title.lower()] = brand.pk
+
+    def create_attributes(self, products: list, rows: list) -> list:
+        """Создает недостающие варианты строк и типы данных, атрибуты товаров пачки и их проекцию `AttributeValue`."""
+        new_choices = {
+            value for row in rows for _, type_name, value, _ in row['attributes']
+            if type_name == 'str' and normalize_choice(value) not in self.choices
+        }
+        if new_choices:
+            for key, choice in StrTypeChoice.get_or_create_many(new_choices).items():
+                self.choices[key] = choice.pk
+
+        keys = [
+            [self.get_data_type_key(name, type_name, value, unit) for name, type_name, value, unit in row['attributes']]
+            for row in rows
+        ]
+        self.create_data_types({key for row_keys in keys for key in row_keys if key not in self.data_types})
+
+        attributes = Attribute.objects.bulk_create(
+            Attribute(content_type=self.content_type, object_id=product.pk, data_type_id=self.data_types[key])
+            for product, row_keys in zip(products, keys)
+            for key in row_keys
+        )
+        AttributeValue.sync(attribute.pk for attribute in attributes)
+        return attributes
+
+    def get_data_type_key(self, name: str, type_name: str, value, unit: str) -> tuple:
+        if type_name == 'str':
+            return 'str', name, self.choices[normalize_choice(value)], None
+        if type_name == 'bool':
+            return 'bool', name, value, None
+        if unit not in self.unit_ids:
+            instance = find_unit(unit, self.units)
+            self.unit_ids[unit] = instance.pk if instance else None
+        return type_name, name, value, self.unit_ids[unit]
+
+    def create_data_types(self, keys: set) -> None:
+        """Находит и создает типы данных пачки наборами запросов `DataType.get_or_create_many()`."""
+        if keys:
+            self.data_types.update(DataType.get_or_create_many(keys))
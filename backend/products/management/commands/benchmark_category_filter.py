@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from products.models import Brand, Product, ProductsCategory
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает отбор товаров поддерева категорий по префиксу пути с отбором по списку '
+        'идентификаторов потомков. Данные создаются во временной транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=10000, help='Количество категорий в дереве.')
+        parser.add_argument('--branching', type=int, default=10, help='Количество детей у узла.')
+        parser.add_argument('--products', type=int, default=100000, help='Количество товаров.')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество повторов каждого запроса.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.benchmark(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def benchmark(self, nodes, branching, products, repeat, **options):
+        categories = self.create_tree(nodes, branching)
+        brand = Brand.objects.create(title='benchmark')
+        leaves = [category for category in categories if not category.numchild]
+        Product.objects.bulk_create(
+            (
+                Product(part_number=f'bench-{number}', title=f'bench {number}', brand=brand, category=leaves[number % len(leaves)])
+                for number in range(products)
+            ),
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE products_productscategory, products_product')
+
+        category = next(category for category in categories if category.depth == 2)
+        self.stdout.write(f'Категорий: {len(categories)}, товаров: {products}, поддерево: {category.path}')
+
+        def by_path():
+            path = ProductsCategory.objects.filter(pk=category.pk).values_list('path', flat=True).first()
+            return list(Product.objects.filter(category__path__startswith=path).values_list('pk', flat=True))
+
+        def by_descendant_ids():
+            ids = list(category.get_descendants().values_list('pk', flat=True)) + [category.pk]
+            return list(Product.objects.filter(category_id__in=ids).values_list('pk', flat=True))
+
+        for name, query in (('префикс пути', by_path), ('id потомков', by_descendant_ids)):
+            found = len(query())
+            started = time.perf_counter()
+            for _ in range(repeat):
+                query()
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(f'{name}: {found} товаров, {elapsed:.2f} мс')
+
+        self.stdout.write(Product.objects.filter(category__path__startswith=category.path).explain())
+
+    @staticmethod
+    def create_tree(nodes: int, branching: int) -> list:
+        """Создает дерево из `nodes` узлов с готовыми путями одной вставкой."""
+        last_root = ProductsCategory.get_last_root_node()
+        root_index = ProductsCategory._str2int(last_root.path) if last_root else 0
+        categories, level = [], [(None, None)]
+        depth = 1
+        while len(categories) < nodes:
+            next_level = []
+            for parent, parent_path in level:
+                count = min(branching, nodes - len(categories))
+                for index in range(1, count + 1):
+                    path = ProductsCategory._get_path(parent_path, depth, root_index + index if parent is None else index)
+                    category = ProductsCategory(path=path, depth=depth, numchild=0, category_name=f'bench {path}')
+                    if parent is not None:
+                        parent.numchild += 1
+                    categories.append(category)
+                    next_level.append((category, path))
+                if len(categories) >= nodes:
+                    break
+            level, depth = next_level, depth + 1
+        return ProductsCategory.objects.bulk_create(categories, batch_size=5000)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка каталога товаров с атрибутами в CSV или NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            choices=Product.EXPORT_FORMATS,
+            default='csv',
+            help='Формат выгрузки.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Путь к файлу выгрузки. По умолчанию выгрузка пишется в stdout.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Размер пачки серверного курсора и подгрузки атрибутов.',
+        )
+
+    def handle(self, *args, **options):
+        lines = Product.export(Product.objects.all(), options['export_format'], options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+            for line in lines:
+                file.write(line)
+        self.stdout.write(f'Выгрузка сохранена в {options["output"]}')
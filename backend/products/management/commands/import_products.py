@@ -0,0 +1,67 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import ProductImporter
+from products.models import Product, ProductImport
+
+
+class Command(BaseCommand):
+    help = 'Загружает каталог товаров из файла CSV или NDJSON в формате выгрузки export_products.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Путь к файлу каталога.')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=Product.EXPORT_FORMATS,
+            help='Формат файла. По умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            metavar='IMPORT_ID',
+            help='Продолжить прерванную загрузку с первой необработанной строки.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество строк в пачке и транзакции.')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Количество процессов разбора строк, 0 — разбор в текущем процессе.',
+        )
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                product_import = ProductImport.objects.get(pk=options['resume'])
+            except ProductImport.DoesNotExist:
+                raise CommandError(f'Загрузка {options["resume"]} не найдена.')
+            if product_import.status == ProductImport.Status.DONE:
+                raise CommandError(f'Загрузка {product_import.pk} уже завершена.')
+        elif options['path']:
+            file_format = options['file_format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+            if file_format not in Product.EXPORT_FORMATS:
+                raise CommandError('Не удалось определить формат файла, укажите --format.')
+            with open(options['path'], 'rb') as file:
+                product_import = ProductImport.objects.create(
+                    file=File(file, name=os.path.basename(options['path'])),
+                    file_format=file_format,
+                )
+        else:
+            raise CommandError('Укажите путь к файлу или --resume.')
+
+        self.stdout.write(f'Загрузка {product_import.pk}')
+        ProductImporter(
+            product_import,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            progress=self.write_progress,
+        ).run()
+        self.stdout.write(self.style.SUCCESS(f'Загрузка {product_import.pk} завершена'))
+
+    def write_progress(self, product_import: ProductImport):
+        self.stdout.write(
+            f'Обработано строк: {product_import.processed}, товаров: {product_import.created_products}, '
+            f'атрибутов: {product_import.created_attributes}, ошибок: {product_import.failed_rows}'
+        )
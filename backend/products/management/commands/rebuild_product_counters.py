@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.models import ProductCounter
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает таблицу счетчиков товаров ProductCounter по товарам.'
+
+    def handle(self, *args, **options):
+        count = ProductCounter.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Строк счетчиков: {count}'))
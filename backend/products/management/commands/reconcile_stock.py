@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.models import ProductUnique, StockLevel
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает таблицу остатков StockLevel по единицам товара и выводит расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести расхождения, не изменяя таблицу остатков.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = self.get_expected()
+            actual = {
+                (level.product_id, level.warehouse_id): level
+                for level in StockLevel.objects.select_for_update()
+            }
+
+            drift = []
+            for key in expected.keys() | actual.keys():
+                quantity, reserved = expected.get(key, (0, 0))
+                level = actual.get(key)
+                current = (level.quantity, level.reserved) if level else (0, 0)
+                if current != (quantity, reserved):
+                    drift.append((key, current, (quantity, reserved)))
+
+            for (product_id, warehouse_id), current, (quantity, reserved) in sorted(drift):
+                self.stdout.write(
+                    f'Товар {product_id}, склад {warehouse_id}: '
+                    f'количество {current[0]} -> {quantity}, резерв {current[1]} -> {reserved}'
+                )
+
+            if not options['dry_run']:
+                self.rebuild(actual, drift)
+
+        self.stdout.write(self.style.SUCCESS(f'Расхождений: {len(drift)}'))
+
+    @staticmethod
+    def get_expected() -> dict:
+        return {
+            (row['product_id'], row['warehouse_id']): (row['quantity'], row['reserved'])
+            for row in ProductUnique.get_counts()
+        }
+
+    @staticmethod
+    def rebuild(actual: dict, drift: list) -> None:
+        to_create, to_update = [], []
+        for key, _current, (quantity, reserved) in drift:
+            level = actual.get(key)
+            if level is None:
+                to_create.append(StockLevel(product_id=key[0], warehouse_id=key[1], quantity=quantity, reserved=reserved))
+            else:
+                level.quantity, level.reserved = quantity, reserved
+                to_update.append(level)
+        StockLevel.objects.bulk_create(to_create)
+        StockLevel.objects.bulk_update(to_update, ('quantity', 'reserved'))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_rename_name_brand_title'),
+        ('warehouses', '0002_warehouse_owner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductUnique',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stocked_products', to='products.product', verbose_name='товар')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stocked_products', to='warehouses.warehouse', verbose_name='склад')),
+            ],
+            options={
+                'verbose_name': 'единица товара',
+                'verbose_name_plural': 'единицы товара',
+                'indexes': [models.Index(fields=['product', 'warehouse'], name='products_pr_product_41f0f5_idx')],
+            },
+        ),
+    ]
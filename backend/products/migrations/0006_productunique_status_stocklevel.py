@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_productunique'),
+        ('warehouses', '0002_warehouse_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productunique',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'на складе'), (2, 'в резерве'), (3, 'продан')], default=1, verbose_name='статус'),
+        ),
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='количество')),
+                ('reserved', models.PositiveIntegerField(default=0, verbose_name='в резерве')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='products.product', verbose_name='товар')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='warehouses.warehouse', verbose_name='склад')),
+            ],
+            options={
+                'verbose_name': 'остаток товара',
+                'verbose_name_plural': 'остатки товаров',
+                'constraints': [models.UniqueConstraint(fields=('product', 'warehouse'), name='products_stocklevel_product_warehouse_unique')],
+            },
+        ),
+    ]
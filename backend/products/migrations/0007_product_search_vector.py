@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_search_vector(apps, schema_editor):
+    Brand = apps.get_model('products', 'Brand')
+    Product = apps.get_model('products', 'Product')
+
+    brand_title = Subquery(Brand.objects.filter(pk=OuterRef('brand_id')).values('title')[:1])
+    vector = SearchVector('part_number', config='simple', weight='A')
+    for config in ('russian', 'english'):
+        vector = (
+            vector
+            + SearchVector('title', config=config, weight='A')
+            + SearchVector(brand_title, config=config, weight='B')
+            + SearchVector('description', config=config, weight='C')
+        )
+    Product.objects.update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_productunique_status_stocklevel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='products_product_search_gin'),
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
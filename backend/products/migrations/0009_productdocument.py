@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='products.product', verbose_name='товар')),
+                ('data', models.JSONField(verbose_name='представление товара')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='дата и время сборки')),
+            ],
+            options={
+                'verbose_name': 'документ товара',
+                'verbose_name_plural': 'документы товаров',
+            },
+        ),
+    ]
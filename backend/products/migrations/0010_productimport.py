@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_productdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/products/', verbose_name='файл')),
+                ('file_format', models.CharField(choices=[('csv', 'csv'), ('ndjson', 'ndjson')], default='csv', max_length=10, verbose_name='формат')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'ожидает'), (2, 'выполняется'), (3, 'завершена'), (4, 'прервана')], default=1, verbose_name='статус')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='обработано строк')),
+                ('created_products', models.PositiveIntegerField(default=0, verbose_name='создано товаров')),
+                ('created_attributes', models.PositiveIntegerField(default=0, verbose_name='создано атрибутов')),
+                ('failed_rows', models.PositiveIntegerField(default=0, verbose_name='строк с ошибками')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='ошибки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='дата и время создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='дата и время изменения')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='product_imports', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'загрузка каталога',
+                'verbose_name_plural': 'загрузки каталога',
+            },
+        ),
+    ]
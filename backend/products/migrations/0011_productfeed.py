@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_productimport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True, verbose_name='формат')),
+                ('file', models.FileField(blank=True, upload_to='feeds/', verbose_name='файл')),
+                ('etag', models.CharField(blank=True, max_length=32, verbose_name='ETag')),
+                ('chunks', models.JSONField(blank=True, default=dict, verbose_name='пачки')),
+                ('generated_at', models.DateTimeField(blank=True, null=True, verbose_name='дата и время сборки')),
+            ],
+            options={
+                'verbose_name': 'фид товаров',
+                'verbose_name_plural': 'фиды товаров',
+            },
+        ),
+    ]
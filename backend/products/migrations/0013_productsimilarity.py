@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='место')),
+                ('score', models.FloatField(verbose_name='близость')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='products.product', verbose_name='товар')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='похожий товар')),
+            ],
+            options={
+                'verbose_name': 'похожий товар',
+                'verbose_name_plural': 'похожие товары',
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='products_similarity_product_rank_uniq')],
+            },
+        ),
+    ]
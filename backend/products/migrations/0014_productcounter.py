@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:24
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_product_counters(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductCounter = apps.get_model('products', 'ProductCounter')
+
+    rows = Product.objects.values('brand_id', 'manufacturer_id', 'category_id').annotate(count=Count('pk')).order_by()
+    ProductCounter.objects.bulk_create(ProductCounter(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_productsimilarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='количество товаров')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_counters', to='products.brand', verbose_name='бренд')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='product_counters', to='products.productscategory', verbose_name='категория')),
+                ('manufacturer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='product_counters', to='products.manufacturer', verbose_name='производитель')),
+            ],
+            options={
+                'verbose_name': 'счетчик товаров',
+                'verbose_name_plural': 'счетчики товаров',
+                'constraints': [models.UniqueConstraint(models.F('brand'), django.db.models.functions.comparison.Coalesce('manufacturer', models.Value(0)), django.db.models.functions.comparison.Coalesce('category', models.Value(0)), name='products_productcounter_key_unique')],
+            },
+        ),
+        migrations.RunPython(fill_product_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:26
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_productcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='shipping_class',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(django.db.models.lookups.GreaterThan(django.db.models.functions.comparison.Greatest('length', 'width', 'depth'), models.Value(150.0)), django.db.models.lookups.GreaterThan(django.db.models.functions.comparison.Greatest('weight', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length'), '*', models.F('width')), '*', models.F('depth')), '/', models.Value(5000.0))), models.Value(30.0)), _connector='OR'), then=models.Value('oversized')), models.When(models.Q(django.db.models.lookups.GreaterThan(django.db.models.functions.comparison.Greatest('length', 'width', 'depth'), models.Value(60.0)), django.db.models.lookups.GreaterThan(django.db.models.functions.comparison.Greatest('weight', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length'), '*', models.F('width')), '*', models.F('depth')), '/', models.Value(5000.0))), models.Value(10.0)), _connector='OR'), then=models.Value('large')), models.When(models.Q(django.db.models.lookups.GreaterThan(django.db.models.functions.comparison.Greatest('length', 'width', 'depth'), models.Value(30.0)), django.db.models.lookups.GreaterThan(django.db.models.functions.comparison.Greatest('weight', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length'), '*', models.F('width')), '*', models.F('depth')), '/', models.Value(5000.0))), models.Value(2.0)), _connector='OR'), then=models.Value('medium')), models.When(models.Q(('weight__isnull', False), ('length__isnull', False), ('width__isnull', False), ('depth__isnull', False), _connector='OR'), then=models.Value('small')), default=None), output_field=models.CharField(choices=[('small', 'малогабаритный'), ('medium', 'среднегабаритный'), ('large', 'крупногабаритный'), ('oversized', 'негабаритный')], max_length=10, null=True), verbose_name='класс доставки'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='volume',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length'), '*', models.F('width')), '*', models.F('depth')), '/', models.Value(1000000.0)), output_field=models.FloatField(), verbose_name='объем'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='volumetric_weight',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('length'), '*', models.F('width')), '*', models.F('depth')), '/', models.Value(5000.0)), output_field=models.FloatField(), verbose_name='объемный вес'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['volume'], name='products_product_volume_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['volumetric_weight'], name='products_product_volweight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['weight'], name='products_product_weight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['shipping_class'], name='products_product_shipping_idx'),
+        ),
+    ]
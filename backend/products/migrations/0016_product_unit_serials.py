@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_product_shipping'),
+        ('warehouses', '0002_warehouse_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productunique',
+            name='barcode',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='штрихкод'),
+        ),
+        migrations.AddField(
+            model_name='productunique',
+            name='serial',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='серийный номер'),
+        ),
+        migrations.AddIndex(
+            model_name='productunique',
+            index=models.Index(condition=models.Q(('status', 3), _negated=True), fields=['product', 'warehouse', 'status'], name='products_unit_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productunique',
+            index=models.Index(condition=models.Q(('barcode__isnull', False)), fields=['barcode'], name='products_unit_barcode_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productunique',
+            constraint=models.UniqueConstraint(condition=models.Q(('serial__isnull', False)), fields=('product', 'serial'), name='products_unit_serial_unique'),
+        ),
+    ]
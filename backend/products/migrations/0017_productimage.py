@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fileflow', '0001_initial'),
+        ('products', '0016_product_unit_serials'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_first', models.BooleanField(default=False, verbose_name='главное изображение')),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_images', to='fileflow.image', verbose_name='картинка')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='products.product', verbose_name='товар')),
+            ],
+            options={
+                'verbose_name': 'изображение товара',
+                'verbose_name_plural': 'изображения товаров',
+                'constraints': [models.UniqueConstraint(fields=('product', 'image'), name='products_image_product_image_unique')],
+            },
+        ),
+    ]
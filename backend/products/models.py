@@ -1,20 +1,46 @@
+import base64
+import csv
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models, transaction
-from django.db.models import Count, Max, Min, QuerySet, Sum
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchVector, SearchVectorField,
+                                            TrigramWordSimilarity)
+from django.db import connection, models, transaction
+from django.db.models import (Case, Count, F, Max, Min, Prefetch, Q,
+                              QuerySet, Sum, Value, When)
 from django.db.models.deletion import CASCADE
-from django.db.models.signals import pre_save
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import GreaterThan
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
 from addresses.models import Country
-from attributes.models import Attribute
+from attributes.models import (Attribute, BoolType, FloatType, IntType,
+                               StrType, StrTypeChoice)
 from fileflow.models import Image
 from warehouses.models import Warehouse
-from treebeard.mp_tree import MP_Node
+from treebeard.mp_tree import MP_Node, nodes_deleted, path_updated
 from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from core.cache import bump_cache_version, get_cache_version
+from core.models import CreateUpdater
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
 
 User = get_user_model()
 
@@ -71,11 +97,15 @@ class ProductsCategory(MP_Node):
     - parent_category (`ProductsCategory`, опционально): Родительская категория.
 
     ### Methods:
-    - get_category_list(): Получает список категорий от текущей до корневой категории.
-    - generate_filters(): Генерирует фильтры для категории, включая строки, числа и логические атрибуты.
+    - get_category_list(): Получает список категорий от корневой до текущей категории одним запросом.
+    - get_tree(): Получает все дерево категорий в виде вложенных словарей, кешируется в Redis.
+    - generate_filters(selection): Генерирует фасеты для товаров категории и ее потомков: варианты строк,
+    диапазоны и гистограммы чисел, количества логических значений. Кешируется в Redis.
 
     """
     node_order_by = ('id', )
+    TREE_CACHE_TIMEOUT = 60 * 60
+    FACETS_CACHE_TIMEOUT = 60 * 60
 
     category_name = models.CharField('название', max_length=100)
     image = models.ForeignKey(Image, verbose_name=_('картинка'), related_name='product_categories', on_delete=CASCADE, null=True, blank=True)
@@ -88,15 +118,125 @@ class ProductsCategory(MP_Node):
         return f"{self.category_name}"
 
     def get_category_list(self):
-        category_list = []
-        category_list.append(self)
-        # for __ in range(self.level):
-        #     category_list.append(category_list[len(category_list) - 1].parent_category)
-        # category_list.reverse()
-        return category_list
+        paths = [self.path[:end] for end in range(self.steplen, len(self.path) + 1, self.steplen)]
+        return list(ProductsCategory.objects.filter(path__in=paths).order_by('depth'))
+
+    @classmethod
+    def get_tree(cls) -> list:
+        """
+        Получает все дерево категорий одним запросом, упорядоченным по `path`.
+
+        Дерево собирается за O(n): родитель каждого узла встречается раньше него, а его путь
+        равен пути узла без последнего шага. Результат кешируется на `TREE_CACHE_TIMEOUT` секунд
+        под версией `product_categories`, которая увеличивается при добавлении, перемещении,
+        изменении и удалении узлов.
+
+        ### Returns:
+        - `list[dict]`: Корневые категории с ключами `id`, `category_name`, `image` и `children`.
+
+        """
+        cache_key = f'product_categories_tree:{get_cache_version("product_categories")}'
+        tree = cache.get(cache_key)
+        if tree is not None:
+            return tree
+
+        tree, nodes = [], {}
+        for category in cls.objects.order_by('path').values('id', 'path', 'category_name', 'image_id'):
+            node = {
+                'id': category['id'],
+                'category_name': category['category_name'],
+                'image': category['image_id'],
+                'children': [],
+            }
+            nodes[category['path']] = node
+            parent = nodes.get(category['path'][:-cls.steplen])
+            (parent['children'] if parent else tree).append(node)
+
+        cache.set(cache_key, tree, timeout=cls.TREE_CACHE_TIMEOUT)
+        return tree
+
+    def generate_filters(self, selection: dict = None) -> dict:
+        """
+        Генерирует фасеты по атрибутам товаров категории и всех ее потомков с учетом выбора.
+
+        Фасеты невыбранных атрибутов считаются одним сгруппированным запросом по товарам,
+        подходящим под весь выбор. Фасет выбранного атрибута считается отдельным запросом
+        без условия на сам этот атрибут, чтобы в нем оставались альтернативные значения.
+        Результат кешируется на `FACETS_CACHE_TIMEOUT` секунд по категории и хешу выбора
+        под версией `product_facets`, которая увеличивается при изменении атрибутов, товаров
+        и дерева категорий.
+
+        ### Args:
+        - selection (`dict`, опционально): Выбор вида `{название: {'in': [...], 'gte': число, 'lte': число}}`,
+        см. `Attribute.filter_objects()`.
 
+        ### Returns:
+        - `dict`: Словарь с ключами `category`, `count` (количество подходящих товаров) и `facets`,
+        см. `Attribute.get_facets()`.
 
-class Product(models.Model):
+        """
+        selection = selection or {}
+        selection_hash = hashlib.md5(json.dumps(selection, sort_keys=True).encode()).hexdigest()
+        cache_key = f'product_facets:{get_cache_version("product_facets")}:{self.pk}:{selection_hash}'
+        filters = cache.get(cache_key)
+        if filters is not None:
+            return filters
+
+        products = Product.objects.filter(category__path__startswith=self.path)
+        selected = Attribute.filter_objects(products, selection)
+        facets = Attribute.get_facets(Product, selected.values('pk'), exclude_names=selection.keys())
+        for name in selection:
+            others = {other: conditions for other, conditions in selection.items() if other != name}
+            facets += Attribute.get_facets(Product, Attribute.filter_objects(products, others).values('pk'), names=(name,))
+
+        filters = {
+            'category': self.pk,
+            'count': selected.count(),
+            'facets': sorted(facets, key=lambda facet: (facet['name'], facet['type'], facet.get('unit') or '')),
+        }
+        cache.set(cache_key, filters, timeout=self.FACETS_CACHE_TIMEOUT)
+        return filters
+
+
+class EchoBuffer:
+    """Буфер для `csv.writer`, возвращающий записанную строку вместо ее хранения."""
+
+    def write(self, value):
+        return value
+
+
+def get_shipping_class_expression(limits, volumetric_divisor: int, default_class: str):
+    """
+    Выражение класса доставки товара для генерируемой колонки `Product.shipping_class`.
+
+    Класс выбирается по первому превышенному порогу наибольшей стороны или расчетного веса
+    (большего из веса и объемного веса). Если размеры и вес не заданы, класс не определен.
+
+    ### Args:
+    - limits (`Iterable[tuple]`): Пороги `(класс, наибольшая сторона в см, расчетный вес в кг)` по убыванию.
+    - volumetric_divisor (`int`): Делитель объема в см³ для объемного веса.
+    - default_class (`str`): Класс товара, не превысившего ни одного порога.
+
+    """
+    longest_side = Greatest('length', 'width', 'depth')
+    chargeable_weight = Greatest('weight', F('length') * F('width') * F('depth') / Value(float(volumetric_divisor)))
+    return Case(
+        *(
+            When(
+                GreaterThan(longest_side, Value(float(side))) | GreaterThan(chargeable_weight, Value(float(weight))),
+                then=Value(shipping_class),
+            )
+            for shipping_class, side, weight in limits
+        ),
+        When(
+            Q(weight__isnull=False) | Q(length__isnull=False) | Q(width__isnull=False) | Q(depth__isnull=False),
+            then=Value(default_class),
+        ),
+        default=None,
+    )
+
+
+class Product(CreateUpdater):
     """
     Модель для представления товаров в магазине.
 
@@ -109,19 +249,65 @@ class Product(models.Model):
     - length (`float`, опционально): Длина товара.
     - width (`float`, опционально): Ширина товара.
     - depth (`float`, опционально): Глубина товара.
-    - weight (`float`, опционально): Вес товара.
+    - weight (`float`, опционально): Вес товара, кг.
+    - volume (`float`): Объем товара, м³. Генерируемая колонка по длине, ширине и глубине в сантиметрах.
+    - volumetric_weight (`float`): Объемный вес товара, кг: объем в см³, деленный на `VOLUMETRIC_DIVISOR`.
+    - shipping_class (`str`): Класс доставки `Product.ShippingClass` по наибольшей стороне
+    и большему из веса и объемного веса. Генерируемая колонка.
     - manufacturer (`Manufacturer`, опционально): Производитель товара.
     - attributes (GenericRelation[Attribute]): Атрибуты товара.
+    - search_vector (`SearchVectorField`): Поисковый вектор по названию, артикулу, описанию и бренду.
+    Заполняется автоматически при сохранении товара и бренда.
+    - created_at (`datetime`): Дата и время создания.
+    - updated_at (`datetime`): Дата и время последнего изменения товара, его атрибутов или связанных
+    бренда, производителя и категории.
 
     ### Methods:
     - get_warehouses_and_amount(): Получает информацию о складах и количестве товара.
     - get_amount_all(): Получает общее количество товара.
+    - get_stock_summary(): Получает остатки товара по складам и общий остаток одним запросом.
+    - get_stock_summaries(products): Получает остатки для набора товаров одним запросом.
     - get_main_image(): Получает главное изображение товара.
     - get_alter_images(): Получает дополнительные изображения товара.
     - get_all_attributes(): Получает все атрибуты товара.
+    - set_attributes(mapping): Заменяет атрибуты товара набором значений.
     - generate_url(): Генерирует URL для страницы товара.
+    - get_search_vector(title, part_number, description, brand_title): Собирает выражение поискового вектора.
+    - get_suggestions(query, limit): Подсказки по названию и артикулу на основе триграмм.
+    - get_export_rows(queryset, chunk_size): Строки выгрузки товаров с развернутыми атрибутами.
+    - export(queryset, export_format, chunk_size): Потоковая выгрузка товаров в CSV или NDJSON.
+    - get_changes(since, limit): Измененные и удаленные товары после метки синхронизации.
+    - get_comparison(product_ids): Матрица сравнения атрибутов набора товаров.
 
     """
+    SEARCH_CONFIGS = ('russian', 'english')
+    CHANGES_LAG = timedelta(seconds=settings.PRODUCT_CHANGES_LAG)
+    COMPARISON_MIN_PRODUCTS = 2
+    COMPARISON_MAX_PRODUCTS = 10
+    COMPARISON_CACHE_TIMEOUT = 60 * 60
+    CUBIC_CM_PER_CUBIC_METER = 1000000
+    VOLUMETRIC_DIVISOR = 5000
+    SHIPPING_CLASS_LIMITS = (
+        # (класс, наибольшая сторона в см, расчетный вес в кг)
+        ('oversized', 150, 30),
+        ('large', 60, 10),
+        ('medium', 30, 2),
+    )
+    EXPORT_FORMATS = ('csv', 'ndjson')
+    EXPORT_FIELDS = {
+        'id': 'id',
+        'part_number': 'part_number',
+        'title': 'title',
+        'description': 'description',
+        'brand': 'brand__title',
+        'manufacturer': 'manufacturer__title',
+        'category': 'category_id',
+        'length': 'length',
+        'width': 'width',
+        'depth': 'depth',
+        'weight': 'weight',
+    }
+
     part_number = models.CharField('артикул', max_length=100)
     title = models.CharField('название', max_length=100)
     description = models.TextField('описание', null=True, blank=True)
@@ -134,29 +320,379 @@ class Product(models.Model):
     depth = models.FloatField('глубина', null=True, blank=True)
     weight = models.FloatField('вес', null=True, blank=True)
 
+    class ShippingClass(models.TextChoices):
+        SMALL = 'small', _('малогабаритный')
+        MEDIUM = 'medium', _('среднегабаритный')
+        LARGE = 'large', _('крупногабаритный')
+        OVERSIZED = 'oversized', _('негабаритный')
+
+    volume = models.GeneratedField(
+        verbose_name='объем',
+        expression=F('length') * F('width') * F('depth') / Value(float(CUBIC_CM_PER_CUBIC_METER)),
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
+    volumetric_weight = models.GeneratedField(
+        verbose_name='объемный вес',
+        expression=F('length') * F('width') * F('depth') / Value(float(VOLUMETRIC_DIVISOR)),
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
+    shipping_class = models.GeneratedField(
+        verbose_name='класс доставки',
+        expression=get_shipping_class_expression(SHIPPING_CLASS_LIMITS, VOLUMETRIC_DIVISOR, ShippingClass.SMALL.value),
+        output_field=models.CharField(max_length=10, choices=ShippingClass.choices, null=True),
+        db_persist=True,
+    )
+
     manufacturer = models.ForeignKey(Manufacturer, verbose_name='производитель', related_name='products', on_delete=CASCADE, null=True, blank=True)
 
     attributes = GenericRelation(Attribute, related_query_name='attributes', content_type_field='content_type', object_id_field='object_id')
 
+    search_vector = SearchVectorField('поисковый вектор', null=True, editable=False)
+
     class Meta:
         verbose_name = "товар"
         verbose_name_plural = "товары"
+        indexes = (
+            GinIndex(fields=('search_vector',), name='products_product_search_gin'),
+            GinIndex(fields=('title',), opclasses=('gin_trgm_ops',), name='products_product_title_trgm'),
+            GinIndex(fields=('part_number',), opclasses=('gin_trgm_ops',), name='products_product_part_trgm'),
+            models.Index(fields=('updated_at', 'id'), name='products_product_updated_idx'),
+            models.Index(fields=('volume',), name='products_product_volume_idx'),
+            models.Index(fields=('volumetric_weight',), name='products_product_volweight_idx'),
+            models.Index(fields=('weight',), name='products_product_weight_idx'),
+            models.Index(fields=('shipping_class',), name='products_product_shipping_idx'),
+        )
 
     def __str__(self):
         return f"{self.name} ({self.part_number})"
 
+    @staticmethod
+    def get_search_vector(title, part_number, description, brand_title):
+        """
+        Статический метод для сборки выражения поискового вектора товара.
+
+        Артикул индексируется конфигурацией `simple`, остальные поля — всеми конфигурациями
+        из `SEARCH_CONFIGS` с весами: название и артикул `A`, бренд `B`, описание `C`.
+
+        ### Args:
+        - title, part_number, description, brand_title: Выражения (`F()`, `Value()`, `Subquery()`) для полей вектора.
+
+        ### Returns:
+        - `CombinedExpression`: Выражение для `search_vector`.
+
+        """
+        vector = SearchVector(part_number, config='simple', weight='A')
+        for config in Product.SEARCH_CONFIGS:
+            vector = (
+                vector
+                + SearchVector(title, config=config, weight='A')
+                + SearchVector(brand_title, config=config, weight='B')
+                + SearchVector(description, config=config, weight='C')
+            )
+        return vector
+
+    @staticmethod
+    def get_suggestions(query: str, limit: int = 10) -> list:
+        """
+        Статический метод получения подсказок по названию и артикулу товара.
+
+        Отбор идет операторами `<%` и `ILIKE` по триграммным GIN индексам, сортировка —
+        по наибольшему сходству слов запроса с названием или артикулом.
+
+        ### Args:
+        - query (`str`): Часть названия или артикула, в том числе с опечатками.
+        - limit (`int`, опционально): Количество подсказок.
+
+        ### Returns:
+        - `list[dict]`: Подсказки с ключами `id`, `title`, `part_number` и `similarity`.
+
+        """
+        return list(
+            Product.objects
+            .filter(
+                Q(title__trigram_word_similar=query)
+                | Q(part_number__trigram_word_similar=query)
+                | Q(part_number__icontains=query)
+            )
+            .annotate(similarity=Greatest(
+                TrigramWordSimilarity(query, 'title'),
+                TrigramWordSimilarity(query, 'part_number'),
+            ))
+            .order_by('-similarity', 'id')
+            .values('id', 'title', 'part_number', 'similarity')[:limit]
+        )
+
+    @staticmethod
+    def get_export_rows(queryset: QuerySet, chunk_size: int = 2000):
+        """
+        Статический метод, отдающий строки выгрузки товаров по одной.
+
+        Товары читаются серверным курсором через `iterator(chunk_size)`, а атрибуты
+        подгружаются одним запросом на каждую пачку из `chunk_size` товаров, поэтому
+        расход памяти не зависит от размера каталога.
+
+        ### Args:
+        - queryset (`QuerySet`): Выгружаемые товары.
+        - chunk_size (`int`, опционально): Размер пачки курсора и подгрузки атрибутов.
+
+        ### Yields:
+        - `dict`: Поля `EXPORT_FIELDS` и `attributes` — словарь `{название: значение с ЕИ}`,
+        значения одноименных атрибутов объединяются через `; `.
+
+        """
+        rows = (
+            queryset
+            .order_by('pk')
+            .values_list(*Product.EXPORT_FIELDS.values())
+            .iterator(chunk_size=chunk_size)
+        )
+        chunk = []
+        for row in rows:
+            chunk.append(dict(zip(Product.EXPORT_FIELDS, row)))
+            if len(chunk) == chunk_size:
+                yield from Product._add_export_attributes(chunk)
+                chunk = []
+        if chunk:
+            yield from Product._add_export_attributes(chunk)
+
+    @staticmethod
+    def _add_export_attributes(rows: list) -> list:
+        values = Attribute.get_values_for_objects(Product, [row['id'] for row in rows])
+        for row in rows:
+            attributes = {}
+            for value in values.get(row['id'], ()):
+                text = f"{value['value']} {value['unit']}" if value['unit'] else str(value['value'])
+                attributes[value['name']] = f"{attributes[value['name']]}; {text}" if value['name'] in attributes else text
+            row['attributes'] = attributes
+        return rows
+
+    @staticmethod
+    def export(queryset: QuerySet, export_format: str = 'csv', chunk_size: int = 2000):
+        """
+        Статический метод потоковой выгрузки товаров.
+
+        В CSV каждый атрибут выносится в отдельную колонку `attr:<название>`; список колонок
+        получается одним запросом по названиям атрибутов выгружаемых товаров.
+        В NDJSON каждая строка — JSON объект товара с вложенным словарем `attributes`.
+
+        ### Args:
+        - queryset (`QuerySet`): Выгружаемые товары.
+        - export_format (`str`, опционально): Одно из `EXPORT_FORMATS`.
+        - chunk_size (`int`, опционально): Размер пачки, см. `get_export_rows()`.
+
+        ### Yields:
+        - `str`: Строки выгрузки.
+
+        """
+        rows = Product.get_export_rows(queryset, chunk_size)
+        if export_format == 'ndjson':
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+            return
+
+        attribute_names = list(
+            Attribute.objects
+            .filter(content_type=ContentType.objects.get_for_model(Product), object_id__in=queryset.values('pk'))
+            .order_by('data_type__name')
+            .values_list('data_type__name', flat=True)
+            .distinct()
+        )
+        buffer = EchoBuffer()
+        writer = csv.writer(buffer)
+        yield writer.writerow([*Product.EXPORT_FIELDS, *(f'attr:{name}' for name in attribute_names)])
+        for row in rows:
+            attributes = row.pop('attributes')
+            yield writer.writerow([*row.values(), *(attributes.get(name, '') for name in attribute_names)])
+
+    @staticmethod
+    def get_changes(since: str = None, limit: int = 1000) -> dict:
+        """
+        Статический метод получения товаров, измененных и удаленных после метки синхронизации.
+
+        Изменения читаются по ключу `(updated_at, id)`, удаления — по ключу `(deleted_at, id)`
+        таблицы `ProductTombstone`, оба по индексам. Записи моложе `CHANGES_LAG` не отдаются,
+        чтобы не пропустить транзакции, зафиксированные позже, чем проставлено время изменения.
+        Транзакция, зафиксированная позже `CHANGES_LAG` после своего `updated_at`, может быть
+        пропущена клиентом, уже прочитавшим это время, поэтому задержка задается настройкой
+        `PRODUCT_CHANGES_LAG` не меньше самой долгой транзакции записи товаров.
+
+        ### Args:
+        - since (`str`, опционально): Метка `next` предыдущего ответа. Без нее отдаются все товары.
+        - limit (`int`, опционально): Максимальное количество изменений и удалений в ответе.
+
+        ### Raises:
+        - ValueError: Если метка синхронизации некорректна.
+
+        ### Returns:
+        - `dict`: Словарь с ключами `changed` и `deleted` (идентификаторы товаров в порядке изменения),
+        `next` (метка для следующего запроса) и `has_more` (есть ли еще изменения).
+
+        """
+        cursor = {}
+        if since:
+            try:
+                cursor = json.loads(base64.urlsafe_b64decode(since.encode()))
+                cursor = {key: (parse_datetime(value), int(pk)) for key, (value, pk) in cursor.items()}
+                if not cursor.keys() <= {'changed', 'deleted'} or any(value is None for value, _ in cursor.values()):
+                    raise ValueError
+            except (TypeError, ValueError, AttributeError):
+                raise ValueError('Неверная метка синхронизации.')
+
+        until = timezone.now() - Product.CHANGES_LAG
+        streams = (
+            ('changed', Product.objects.all(), 'updated_at', 'pk'),
+            ('deleted', ProductTombstone.objects.all(), 'deleted_at', 'product_id'),
+        )
+        changes = {'has_more': False}
+        for key, queryset, field, product_field in streams:
+            queryset = queryset.filter(**{f'{field}__lte': until})
+            if key in cursor:
+                value, pk = cursor[key]
+                queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            rows = list(queryset.order_by(field, 'pk').values_list(field, 'pk', product_field)[:limit + 1])
+            changes['has_more'] |= len(rows) > limit
+            rows = rows[:limit]
+            changes[key] = [row[2] for row in rows]
+            if rows:
+                cursor[key] = rows[-1][:2]
+
+        data = json.dumps({key: [value.isoformat(), pk] for key, (value, pk) in cursor.items()})
+        changes['next'] = base64.urlsafe_b64encode(data.encode()).decode()
+        return changes
+
+    @staticmethod
+    def get_comparison(product_ids) -> dict:
+        """
+        Статический метод получения матрицы сравнения атрибутов набора товаров.
+
+        Товары читаются одним запросом, атрибуты — через `Attribute.get_values_for_objects()`
+        без запросов на каждый подтип. Матрица кешируется на `COMPARISON_CACHE_TIMEOUT` секунд
+        по отсортированному набору идентификаторов под версией `product_comparison`,
+        а колонки затем расставляются в порядке запроса.
+
+        ### Args:
+        - product_ids (`Iterable[int]`): Идентификаторы товаров в порядке колонок.
+
+        ### Returns:
+        - `dict`: Словарь с ключами `products` (колонки `{'id', 'title', 'part_number', 'brand'}`,
+        ненайденные товары пропускаются) и `attributes` (строки `{'name', 'category', 'type',
+        'values', 'differs'}`, где `values` — ячейки `{'value', 'unit'}` или `None` по колонкам,
+        а `differs` — различаются ли значения). Если у товара несколько значений одного атрибута,
+        в ячейку попадает первое.
+
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        sorted_ids = sorted(product_ids)
+        cache_key = f'product_comparison:{get_cache_version("product_comparison")}:{",".join(map(str, sorted_ids))}'
+        comparison = cache.get(cache_key)
+        if comparison is None:
+            comparison = Product._build_comparison(sorted_ids)
+            cache.set(cache_key, comparison, timeout=Product.COMPARISON_CACHE_TIMEOUT)
+
+        columns = [product['id'] for product in comparison['products']]
+        order = [columns.index(pk) for pk in product_ids if pk in columns]
+        return {
+            'products': [comparison['products'][index] for index in order],
+            'attributes': [
+                {**row, 'values': [row['values'][index] for index in order]}
+                for row in comparison['attributes']
+            ],
+        }
+
+    @staticmethod
+    def _build_comparison(product_ids: list) -> dict:
+        products = list(
+            Product.objects
+            .filter(pk__in=product_ids)
+            .order_by('pk')
+            .values('id', 'title', 'part_number', brand_title=F('brand__title'))
+        )
+        columns = {product['id']: index for index, product in enumerate(products)}
+        rows = {}
+        for object_id, values in Attribute.get_values_for_objects(Product, columns).items():
+            for value in values:
+                row = rows.setdefault(value['name'], {
+                    'name': value['name'],
+                    'category': value['category'],
+                    'type': value['type'],
+                    'values': [None] * len(columns),
+                })
+                if row['values'][columns[object_id]] is None:
+                    row['values'][columns[object_id]] = {'value': value['value'], 'unit': value['unit']}
+
+        attributes = sorted(rows.values(), key=lambda row: (row['category'] or '', row['name']))
+        for row in attributes:
+            row['differs'] = len({json.dumps(cell, sort_keys=True) for cell in row['values']}) > 1
+        return {
+            'products': [
+                {'id': product['id'], 'title': product['title'], 'part_number': product['part_number'], 'brand': product['brand_title']}
+                for product in products
+            ],
+            'attributes': attributes,
+        }
+
     def get_warehouses_and_amount(self):
-        stock = self.productunique_set.values('warehouse_id').order_by('warehouse_id').annotate(count=Count('warehouse_id'))
-        stock_warehouse_list = []
-        for stock_warehouse in stock:
-            stock_warehouse_list.append({
-                'count': stock_warehouse['count'],
-                'warehouse_address': str(get_object_or_404(Warehouse, id=stock_warehouse['warehouse_id']).address),
-            })
-        return stock_warehouse_list
+        return [
+            {
+                'count': warehouse['count'],
+                'warehouse_address': warehouse['address'],
+            }
+            for warehouse in self.get_stock_summary()['warehouses']
+        ]
 
     def get_amount_all(self):
-        return len(self.stocked_products.all())
+        return self.stock_levels.aggregate(total=Sum('quantity'))['total'] or 0
+
+    def get_stock_summary(self) -> dict:
+        """
+        Метод получения остатков товара в разрезе складов.
+
+        ### Returns:
+        - `dict`: Сводка остатков, см. `get_stock_summaries()`.
+
+        """
+        return Product.get_stock_summaries((self.pk,))[self.pk]
+
+    @staticmethod
+    def get_stock_summaries(products) -> dict:
+        """
+        Статический метод получения остатков для набора товаров одним запросом.
+
+        Остатки читаются из таблицы `StockLevel` вместе со складом, адресом и городом,
+        поэтому форматирование адреса не порождает дополнительных запросов.
+
+        ### Args:
+        - products (`Iterable[Product | int]`): Товары или их идентификаторы, например страница списка.
+
+        ### Returns:
+        - `dict`: Словарь `{product_id: {'product_id', 'total', 'warehouses'}}`, где `warehouses` —
+        список словарей с ключами `warehouse_id`, `title`, `address`, `count` и `reserved`.
+
+        """
+        product_ids = [getattr(product, 'pk', product) for product in products]
+        summaries = {
+            product_id: {'product_id': product_id, 'total': 0, 'warehouses': []}
+            for product_id in product_ids
+        }
+        stock_levels = (
+            StockLevel.objects
+            .filter(product_id__in=product_ids, quantity__gt=0)
+            .select_related('warehouse__address__city')
+            .order_by('product_id', 'warehouse_id')
+        )
+        for stock_level in stock_levels:
+            summary = summaries[stock_level.product_id]
+            summary['total'] += stock_level.quantity
+            summary['warehouses'].append({
+                'warehouse_id': stock_level.warehouse_id,
+                'title': stock_level.warehouse.title,
+                'address': str(stock_level.warehouse.address),
+                'count': stock_level.quantity,
+                'reserved': stock_level.reserved,
+            })
+        return summaries
 
     def get_main_image(self):
         img = self.images.all().filter(is_first=True).first()
@@ -181,3 +717,1098 @@ class Product(models.Model):
             attr_category=attr_category
         )
         return self
+
+    def set_attributes(self, mapping: dict) -> list:
+        """
+        Метод замены атрибутов товара набором значений.
+
+        Атрибуты записываются `Attribute.set_for_object()` в одной транзакции, количество
+        запросов не зависит от количества новых и замененных атрибутов. После записи
+        отмечается изменение товара, ставится перестройка его документа и сбрасываются
+        кеши фасетов и сравнения.
+
+        ### Args:
+        - mapping (`dict`): Словарь `{название: значение}` или `{название: (значение, категория)}`.
+
+        ### Returns:
+        - `list[Attribute]`: Созданные атрибуты.
+
+        """
+        with transaction.atomic():
+            attributes = Attribute.set_for_object(self, mapping)
+            mark_products_changed(pk=self.pk)
+            schedule_product_documents_rebuild(pk=self.pk)
+            transaction.on_commit(lambda: bump_cache_version('product_facets'))
+            transaction.on_commit(lambda: bump_cache_version('product_comparison'))
+        return attributes
+
+
+@receiver(pre_save, sender=Product)
+def update_product_search_vector(sender, instance, **kwargs):
+    instance.search_vector = Product.get_search_vector(
+        Value(instance.title, output_field=models.TextField()),
+        Value(instance.part_number, output_field=models.TextField()),
+        Value(instance.description, output_field=models.TextField()),
+        Value(instance.brand.title, output_field=models.TextField()),
+    )
+
+
+@receiver(post_save, sender=Brand)
+def update_brand_products_search_vector(sender, instance, created, **kwargs):
+    if created:
+        return
+    instance.products.update(
+        search_vector=Product.get_search_vector(F('title'), F('part_number'), F('description'), Value(instance.title, output_field=models.TextField()))
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_suggestions(sender, instance, **kwargs):
+    bump_cache_version('product_suggestions')
+
+
+class ProductImage(models.Model):
+    """
+    Модель для хранения изображений товара.
+
+    ### Args:
+    - product (`Product`): Товар.
+    - image (`Image`): Картинка.
+    - is_first (`bool`): Главное изображение товара.
+
+    """
+    product = models.ForeignKey(Product, verbose_name=_('товар'), related_name='images', on_delete=CASCADE)
+    image = models.ForeignKey(Image, verbose_name=_('картинка'), related_name='product_images', on_delete=CASCADE)
+    is_first = models.BooleanField(_('главное изображение'), default=False)
+
+    class Meta:
+        verbose_name = _('изображение товара')
+        verbose_name_plural = _('изображения товаров')
+        constraints = (
+            models.UniqueConstraint(fields=('product', 'image'), name='products_image_product_image_unique'),
+        )
+
+    def __str__(self):
+        return f"{self.product_id} | {self.image_id}"
+
+
+class ProductTombstone(models.Model):
+    """
+    Модель для хранения отметок об удаленных товарах для синхронизации `Product.get_changes()`.
+
+    ### Args:
+    - product_id (`int`): Идентификатор удаленного товара.
+    - deleted_at (`datetime`): Дата и время удаления.
+
+    """
+    product_id = models.BigIntegerField(_('идентификатор товара'))
+    deleted_at = models.DateTimeField(_('дата и время удаления'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('удаленный товар')
+        verbose_name_plural = _('удаленные товары')
+        indexes = (
+            models.Index(fields=('deleted_at', 'id'), name='products_tombstone_deleted_idx'),
+        )
+
+    def __str__(self):
+        return f"{self.product_id}"
+
+
+class ProductSimilarity(models.Model):
+    """
+    Модель для хранения похожих товаров, заранее посчитанных по атрибутам.
+
+    ### Args:
+    - product (`Product`): Товар.
+    - similar (`Product`): Похожий товар из той же категории.
+    - rank (`int`): Место похожего товара, начиная с `0`.
+    - score (`float`): Косинусная близость векторов атрибутов.
+
+    ### Methods:
+    - rebuild(k): Пересчитывает похожие товары всех категорий.
+    - rebuild_category(category_id, k): Пересчитывает похожие товары одной категории.
+
+    """
+    NEIGHBOURS = 10
+
+    product = models.ForeignKey(Product, verbose_name=_('товар'), related_name='similarities', on_delete=CASCADE)
+    similar = models.ForeignKey(Product, verbose_name=_('похожий товар'), related_name='+', on_delete=CASCADE)
+    rank = models.PositiveSmallIntegerField(_('место'))
+    score = models.FloatField(_('близость'))
+
+    class Meta:
+        verbose_name = _('похожий товар')
+        verbose_name_plural = _('похожие товары')
+        constraints = (
+            models.UniqueConstraint(fields=('product', 'rank'), name='products_similarity_product_rank_uniq'),
+        )
+
+    def __str__(self):
+        return f"{self.product_id} → {self.similar_id}"
+
+    @classmethod
+    def rebuild_category(cls, category_id: int, k: int = NEIGHBOURS) -> int:
+        """
+        Пересчитывает похожие товары категории и заменяет их в одной транзакции.
+
+        Векторы атрибутов и ближайшие соседи считаются в `products.similarity`.
+
+        ### Args:
+        - category_id (`int`): Идентификатор категории.
+        - k (`int`, опционально): Количество похожих товаров на товар.
+
+        ### Returns:
+        - `int`: Количество записанных строк.
+
+        """
+        from products.similarity import get_category_neighbours
+
+        product_ids = list(Product.objects.filter(category_id=category_id).order_by('pk').values_list('pk', flat=True))
+        neighbours = get_category_neighbours(product_ids, k)
+        with transaction.atomic():
+            cls.objects.filter(product__category_id=category_id).delete()
+            rows = cls.objects.bulk_create(
+                cls(product_id=pk, similar_id=similar_id, rank=rank, score=score)
+                for pk, similar in neighbours.items()
+                for rank, (similar_id, score) in enumerate(similar)
+            )
+        return len(rows)
+
+    @classmethod
+    def rebuild(cls, k: int = NEIGHBOURS) -> int:
+        """Пересчитывает похожие товары всех категорий по очереди."""
+        cls.objects.filter(product__category__isnull=True).delete()
+        category_ids = ProductsCategory.objects.filter(products__isnull=False).distinct().values_list('pk', flat=True)
+        return sum(cls.rebuild_category(category_id, k) for category_id in category_ids)
+
+
+class ProductCounter(models.Model):
+    """
+    Модель счетчиков товаров в разрезе бренда, производителя и категории.
+
+    Таблица поддерживается инкрементально при создании, удалении и переносе товаров,
+    поэтому количество товаров и категорий у брендов и производителей считается
+    сгруппированным запросом по небольшой таблице, а не по товарам. Пересчитать её
+    по товарам можно методом `rebuild()`.
+
+    ### Args:
+    - brand (`Brand`): Бренд.
+    - manufacturer (`Manufacturer`, опционально): Производитель.
+    - category (`ProductsCategory`, опционально): Категория.
+    - count (`int`): Количество товаров.
+
+    ### Methods:
+    - get_key(product): Ключ счетчика товара.
+    - change(key, count): Изменяет счетчик на указанную величину.
+    - add(products, sign): Изменяет счетчики для набора товаров.
+    - annotate(queryset): Добавляет к брендам или производителям `product_count` и `category_count`.
+    - rebuild(): Пересчитывает таблицу по товарам.
+
+    """
+    brand = models.ForeignKey(Brand, verbose_name=_('бренд'), related_name='product_counters', on_delete=CASCADE)
+    manufacturer = models.ForeignKey(Manufacturer, verbose_name=_('производитель'), related_name='product_counters', on_delete=CASCADE, null=True, blank=True)
+    category = models.ForeignKey(ProductsCategory, verbose_name=_('категория'), related_name='product_counters', on_delete=CASCADE, null=True, blank=True)
+    count = models.PositiveIntegerField(_('количество товаров'), default=0)
+
+    class Meta:
+        verbose_name = _('счетчик товаров')
+        verbose_name_plural = _('счетчики товаров')
+        constraints = (
+            models.UniqueConstraint(
+                'brand', Coalesce('manufacturer', Value(0)), Coalesce('category', Value(0)),
+                name='products_productcounter_key_unique',
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.brand_id} | {self.manufacturer_id} | {self.category_id}: {self.count}"
+
+    @staticmethod
+    def get_key(product: Product) -> tuple:
+        return product.brand_id, product.manufacturer_id, product.category_id
+
+    @classmethod
+    def change(cls, key: tuple, count: int) -> None:
+        """
+        Изменяет счетчик через `F()`, не считывая текущее значение.
+
+        Отсутствующая строка создается только при увеличении счетчика: при каскадном удалении
+        бренда или категории строка счетчика может быть удалена раньше товаров.
+
+        ### Args:
+        - key (`tuple`): Ключ `(brand_id, manufacturer_id, category_id)`.
+        - count (`int`): Изменение количества товаров.
+
+        """
+        if not count:
+            return
+        brand_id, manufacturer_id, category_id = key
+        counters = cls.objects.filter(brand_id=brand_id, manufacturer_id=manufacturer_id, category_id=category_id)
+        if not counters.update(count=F('count') + count) and count > 0:
+            cls.objects.get_or_create(brand_id=brand_id, manufacturer_id=manufacturer_id, category_id=category_id)
+            counters.update(count=F('count') + count)
+
+    @classmethod
+    def add(cls, products, sign: int = 1) -> None:
+        """Увеличивает (`sign=1`) или уменьшает (`sign=-1`) счетчики для набора товаров."""
+        for key, count in Counter(cls.get_key(product) for product in products).items():
+            cls.change(key, sign * count)
+
+    @staticmethod
+    def annotate(queryset: QuerySet) -> QuerySet:
+        """
+        Добавляет к queryset брендов или производителей количество товаров `product_count`
+        и количество категорий с товарами `category_count` одним сгруппированным запросом.
+        """
+        return queryset.annotate(
+            product_count=Coalesce(Sum('product_counters__count'), 0),
+            category_count=Count(
+                'product_counters__category',
+                distinct=True,
+                filter=Q(product_counters__count__gt=0),
+            ),
+        )
+
+    @classmethod
+    def rebuild(cls) -> int:
+        """
+        Пересчитывает таблицу одним сгруппированным запросом по товарам.
+
+        ### Returns:
+        - `int`: Количество строк счетчиков.
+
+        """
+        rows = (
+            Product.objects
+            .values('brand_id', 'manufacturer_id', 'category_id')
+            .annotate(count=Count('pk'))
+            .order_by()
+        )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            counters = cls.objects.bulk_create(cls(**row) for row in rows)
+        bump_cache_version('product_counters')
+        return len(counters)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_counter_key(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {'brand', 'manufacturer', 'category'} & set(update_fields):
+        return
+    old = Product.objects.filter(pk=instance.pk).values_list('brand_id', 'manufacturer_id', 'category_id').first()
+    instance._counter_key = old
+
+
+@receiver(post_save, sender=Product)
+def update_product_counters(sender, instance, created, **kwargs):
+    key = ProductCounter.get_key(instance)
+    if created:
+        ProductCounter.change(key, 1)
+        return
+    old = instance.__dict__.pop('_counter_key', None)
+    if old and old != key:
+        ProductCounter.change(old, -1)
+        ProductCounter.change(key, 1)
+
+
+@receiver(post_delete, sender=Product)
+def decrease_product_counters(sender, instance, **kwargs):
+    ProductCounter.change(ProductCounter.get_key(instance), -1)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_save, sender=Country)
+def invalidate_product_counters(sender, **kwargs):
+    bump_cache_version('product_counters')
+
+
+@receiver(post_delete, sender=Product)
+def create_product_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(product_id=instance.pk)
+
+
+def mark_products_changed(**lookup):
+    """Обновляет `updated_at` товаров, отобранных по `lookup`, при изменении связанных с ними данных."""
+    Product.objects.filter(**lookup).update(updated_at=timezone.now())
+
+
+class ProductDocument(models.Model):
+    """
+    Модель для хранения готового представления товара.
+
+    Документ содержит товар вместе с брендом, производителем, страной, категорией и значениями
+    атрибутов, поэтому карточка и список товаров отдаются одним индексированным чтением.
+    Документы перестраиваются задачей Celery `rebuild_product_documents` при изменении товара,
+    его атрибутов, изображений, бренда, производителя, категории или картинки.
+
+    ### Args:
+    - product (`Product`): Товар.
+    - data (`dict`): Представление товара.
+    - updated_at (`datetime`): Дата и время сборки документа.
+
+    ### Methods:
+    - build(products): Собирает и сохраняет документы для набора товаров.
+    - rebuild(queryset, chunk_size): Перестраивает документы товаров из queryset пачками.
+    - get_data(products): Возвращает документы товаров, дособирая отсутствующие.
+
+    """
+    product = models.OneToOneField(Product, verbose_name=_('товар'), related_name='document', on_delete=CASCADE, primary_key=True)
+    data = models.JSONField(_('представление товара'))
+    updated_at = models.DateTimeField(_('дата и время сборки'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('документ товара')
+        verbose_name_plural = _('документы товаров')
+
+    def __str__(self):
+        return f"{self.product_id}"
+
+    @classmethod
+    def build(cls, products) -> list:
+        """
+        Собирает и сохраняет документы для набора товаров за постоянное количество запросов.
+
+        ### Args:
+        - products (`Iterable[Product | int]`): Товары или их идентификаторы.
+
+        ### Returns:
+        - `list[ProductDocument]`: Сохраненные документы.
+
+        """
+        from products.serializers import ProductDocumentSerializer
+
+        product_ids = [getattr(product, 'pk', product) for product in products]
+        products = (
+            Product.objects
+            .filter(pk__in=product_ids)
+            .select_related('brand__image', 'manufacturer__country', 'category__image')
+            .prefetch_related(Prefetch('images', ProductImage.objects.select_related('image').order_by('-is_first', 'pk')))
+            .defer('search_vector')
+        )
+        attributes = Attribute.get_values_for_objects(Product, product_ids)
+        serializer = ProductDocumentSerializer(products, many=True, context={'attributes': attributes})
+        documents = [cls(product_id=data['id'], data=data) for data in serializer.data]
+        return cls.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=('product',),
+            update_fields=('data', 'updated_at'),
+        )
+
+    @classmethod
+    def rebuild(cls, queryset: QuerySet, chunk_size: int = 500) -> int:
+        """
+        Перестраивает документы товаров из queryset пачками по `chunk_size`.
+
+        ### Returns:
+        - `int`: Количество перестроенных документов.
+
+        """
+        count, chunk = 0, []
+        for product_id in queryset.values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+            chunk.append(product_id)
+            if len(chunk) == chunk_size:
+                count += len(cls.build(chunk))
+                chunk = []
+        if chunk:
+            count += len(cls.build(chunk))
+        return count
+
+    @classmethod
+    def get_data(cls, products) -> list:
+        """
+        Возвращает документы товаров в порядке `products`.
+
+        Документы берутся из `product.document`, поэтому queryset товаров следует выбирать
+        с `select_related('document')`. Отсутствующие документы собираются на месте.
+
+        ### Args:
+        - products (`Iterable[Product]`): Товары.
+
+        ### Returns:
+        - `list[dict]`: Представления товаров.
+
+        """
+        documents, missing = {}, []
+        for product in products:
+            try:
+                documents[product.pk] = product.document.data
+            except cls.DoesNotExist:
+                missing.append(product.pk)
+        if missing:
+            documents.update({document.product_id: document.data for document in cls.build(missing)})
+        return [documents[product.pk] for product in products if product.pk in documents]
+
+
+def schedule_product_documents_rebuild(**lookup):
+    """Ставит перестройку документов товаров, отобранных по `lookup`, после фиксации транзакции."""
+    from products.tasks import rebuild_product_documents
+
+    transaction.on_commit(lambda: rebuild_product_documents.delay(lookup))
+
+
+@receiver(post_save, sender=Product)
+def rebuild_product_document(sender, instance, **kwargs):
+    schedule_product_documents_rebuild(pk=instance.pk)
+
+
+@receiver(post_save, sender=Brand)
+def rebuild_brand_product_documents(sender, instance, created, **kwargs):
+    if not created:
+        mark_products_changed(brand_id=instance.pk)
+        schedule_product_documents_rebuild(brand_id=instance.pk)
+
+
+@receiver(post_save, sender=Manufacturer)
+def rebuild_manufacturer_product_documents(sender, instance, created, **kwargs):
+    if not created:
+        mark_products_changed(manufacturer_id=instance.pk)
+        schedule_product_documents_rebuild(manufacturer_id=instance.pk)
+
+
+@receiver(post_save, sender=ProductsCategory)
+def rebuild_category_product_documents(sender, instance, created, **kwargs):
+    if not created:
+        mark_products_changed(category_id=instance.pk)
+        schedule_product_documents_rebuild(category_id=instance.pk)
+
+
+@receiver(post_save, sender=Image)
+def rebuild_image_product_documents(sender, instance, created, **kwargs):
+    if not created:
+        for lookup in ('brand__image_id', 'category__image_id', 'images__image_id'):
+            mark_products_changed(**{lookup: instance.pk})
+            schedule_product_documents_rebuild(**{lookup: instance.pk})
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def rebuild_product_image_product_document(sender, instance, **kwargs):
+    mark_products_changed(pk=instance.product_id)
+    schedule_product_documents_rebuild(pk=instance.product_id)
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+def rebuild_attribute_product_document(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Product).id:
+        mark_products_changed(pk=instance.object_id)
+        schedule_product_documents_rebuild(pk=instance.object_id)
+
+
+def rebuild_data_type_product_documents(**lookup):
+    """Отмечает изменение и ставит перестройку документов товаров с атрибутами типов данных, отобранных по `lookup`."""
+    lookup = {f'attributes__data_type__{key}': value for key, value in lookup.items()}
+    mark_products_changed(**lookup)
+    schedule_product_documents_rebuild(**lookup)
+
+
+@receiver(post_save, sender=IntType)
+@receiver(post_save, sender=FloatType)
+@receiver(post_save, sender=BoolType)
+@receiver(post_save, sender=StrType)
+def rebuild_changed_data_type_product_documents(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_data_type_product_documents(pk=instance.pk)
+
+
+@receiver(m2m_changed, sender=StrType.value.through)
+def rebuild_str_type_product_documents(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            rebuild_data_type_product_documents(pk=instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        rebuild_data_type_product_documents(pk__in=sorted(pk_set))
+    elif action == 'pre_clear':
+        rebuild_data_type_product_documents(strtype__value=instance.pk)
+
+
+@receiver(post_save, sender=StrTypeChoice)
+def rebuild_str_type_choice_product_documents(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_data_type_product_documents(strtype__value=instance.pk)
+
+
+@receiver(post_save, sender=ProductsCategory)
+@receiver(post_delete, sender=ProductsCategory)
+@receiver(path_updated, sender=ProductsCategory)
+@receiver(nodes_deleted, sender=ProductsCategory)
+def invalidate_category_tree(sender, **kwargs):
+    bump_cache_version('product_categories')
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(path_updated, sender=ProductsCategory)
+@receiver(nodes_deleted, sender=ProductsCategory)
+def invalidate_product_facets(sender, **kwargs):
+    bump_cache_version('product_facets')
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+def invalidate_product_comparison(sender, **kwargs):
+    bump_cache_version('product_comparison')
+
+
+@receiver(post_save, sender=IntType)
+@receiver(post_save, sender=FloatType)
+@receiver(post_save, sender=BoolType)
+@receiver(post_save, sender=StrType)
+def invalidate_data_type_caches(sender, **kwargs):
+    bump_cache_version('product_facets')
+    bump_cache_version('product_comparison')
+
+
+@receiver(m2m_changed, sender=StrType.value.through)
+def invalidate_str_type_caches(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_cache_version('product_facets')
+        bump_cache_version('product_comparison')
+
+
+@receiver(path_updated, sender=ProductsCategory)
+def rebuild_moved_category_product_documents(sender, new_path, **kwargs):
+    mark_products_changed(category__path__startswith=new_path)
+    schedule_product_documents_rebuild(category__path__startswith=new_path)
+
+
+class StockLevel(models.Model):
+    """
+    Модель для хранения остатков товара на складе.
+
+    Таблица поддерживается инкрементально операциями `ProductUnique.receive()`, `move()`, `reserve()`,
+    `release()` и `sell()` в той же транзакции, что и изменение единиц товара. Пересчитать её
+    по единицам товара можно командой `reconcile_stock`.
+
+    ### Args:
+    - product (`Product`): Товар.
+    - warehouse (`Warehouse`): Склад.
+    - quantity (`int`): Количество единиц товара на складе, включая зарезервированные.
+    - reserved (`int`): Количество зарезервированных единиц товара.
+
+    ### Methods:
+    - change(product_id, warehouse_id, quantity, reserved): Изменяет остаток на указанные величины.
+
+    """
+    product = models.ForeignKey(Product, verbose_name=_('товар'), related_name='stock_levels', on_delete=CASCADE)
+    warehouse = models.ForeignKey(Warehouse, verbose_name=_('склад'), related_name='stock_levels', on_delete=CASCADE)
+    quantity = models.PositiveIntegerField(_('количество'), default=0)
+    reserved = models.PositiveIntegerField(_('в резерве'), default=0)
+
+    class Meta:
+        verbose_name = _('остаток товара')
+        verbose_name_plural = _('остатки товаров')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('product', 'warehouse'),
+                name='%(app_label)s_%(class)s_product_warehouse_unique'
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.product_id} | {self.warehouse_id}: {self.quantity}"
+
+    @classmethod
+    def change(cls, product_id: int, warehouse_id: int, quantity: int = 0, reserved: int = 0) -> None:
+        """
+        Изменяет остаток товара на складе через `F()`, не считывая текущие значения.
+
+        ### Args:
+        - product_id (`int`): Идентификатор товара.
+        - warehouse_id (`int`): Идентификатор склада.
+        - quantity (`int`, опционально): Изменение количества.
+        - reserved (`int`, опционально): Изменение резерва.
+
+        """
+        if not quantity and not reserved:
+            return
+        updated = cls.objects.filter(product_id=product_id, warehouse_id=warehouse_id).update(
+            quantity=F('quantity') + quantity,
+            reserved=F('reserved') + reserved,
+        )
+        if not updated:
+            cls.objects.get_or_create(product_id=product_id, warehouse_id=warehouse_id)
+            cls.objects.filter(product_id=product_id, warehouse_id=warehouse_id).update(
+                quantity=F('quantity') + quantity,
+                reserved=F('reserved') + reserved,
+            )
+
+
+class ProductUnique(models.Model):
+    """
+    Модель для представления единицы товара на складе.
+
+    Изменять склад и статус единиц следует методами модели: они в той же транзакции
+    поддерживают таблицу остатков `StockLevel`.
+
+    Таблица рассчитана на десятки миллионов строк: статус хранится кодом `smallint`,
+    непроданные единицы покрыты частичным индексом `(product, warehouse, status)`,
+    по которому `get_counts()` считает остатки без чтения строк таблицы, а массовые
+    оприходование и перемещение передают строки в базу через `COPY` пачками.
+
+    ### Args:
+    - product (`Product`): Товар.
+    - warehouse (`Warehouse`): Склад, на котором находится единица товара.
+    - status (`int`): Статус единицы товара.
+    - serial (`str`, опционально): Серийный номер, уникальный в пределах товара.
+    - barcode (`str`, опционально): Штрихкод единицы товара.
+
+    ### Methods:
+    - receive(product, warehouse, quantity): Оприходует новые единицы товара на склад.
+    - receive_bulk(rows, batch_size): Оприходует единицы товара из строк через `COPY`.
+    - move(units, warehouse): Перемещает единицы товара на другой склад.
+    - move_bulk(values, warehouse, by, batch_size): Перемещает единицы товара по идентификаторам,
+    серийным номерам или штрихкодам через `COPY` во временную таблицу.
+    - get_counts(product_ids, warehouse_ids): Количество непроданных единиц по частичному индексу.
+    - reserve(units): Резервирует единицы товара.
+    - release(units): Снимает резерв с единиц товара.
+    - sell(units): Отмечает единицы товара проданными.
+
+    """
+    class Status(models.IntegerChoices):
+        IN_STOCK = 1, _('на складе')
+        RESERVED = 2, _('в резерве')
+        SOLD = 3, _('продан')
+
+    product = models.ForeignKey(Product, verbose_name=_('товар'), related_name='stocked_products', on_delete=CASCADE)
+    warehouse = models.ForeignKey(Warehouse, verbose_name=_('склад'), related_name='stocked_products', on_delete=CASCADE)
+    status = models.PositiveSmallIntegerField(_('статус'), choices=Status.choices, default=Status.IN_STOCK)
+    serial = models.CharField(_('серийный номер'), max_length=64, null=True, blank=True)
+    barcode = models.CharField(_('штрихкод'), max_length=64, null=True, blank=True)
+
+    COPY_BATCH_SIZE = 10000
+    MOVE_LOOKUPS = {'id': 'bigint', 'serial': 'varchar(64)', 'barcode': 'varchar(64)'}
+
+    class Meta:
+        verbose_name = _('единица товара')
+        verbose_name_plural = _('единицы товара')
+        indexes = (
+            models.Index(fields=('product', 'warehouse')),
+            models.Index(
+                fields=('product', 'warehouse', 'status'),
+                condition=~Q(status=3),
+                name='products_unit_stock_idx',
+            ),
+            models.Index(fields=('barcode',), condition=Q(barcode__isnull=False), name='products_unit_barcode_idx'),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('product', 'serial'),
+                condition=Q(serial__isnull=False),
+                name='products_unit_serial_unique',
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.product_id} | {self.warehouse_id}"
+
+    @classmethod
+    def receive(cls, product: Product, warehouse: Warehouse, quantity: int = 1) -> list:
+        """
+        Оприходует новые единицы товара на склад.
+
+        ### Args:
+        - product (`Product`): Товар.
+        - warehouse (`Warehouse`): Склад.
+        - quantity (`int`, опционально): Количество единиц.
+
+        ### Returns:
+        - `list[ProductUnique]`: Созданные единицы товара.
+
+        """
+        with transaction.atomic():
+            units = cls.objects.bulk_create(cls(product=product, warehouse=warehouse) for _ in range(quantity))
+            StockLevel.change(product.pk, warehouse.pk, quantity=len(units))
+        return units
+
+    @classmethod
+    def receive_bulk(cls, rows, batch_size: int = COPY_BATCH_SIZE) -> int:
+        """
+        Оприходует единицы товара, передавая строки в таблицу через `COPY` пачками по `batch_size`.
+
+        Остатки `StockLevel` изменяются одним `F()`-обновлением на пару (товар, склад)
+        в той же транзакции. Повтор серийного номера товара или несуществующий товар
+        либо склад отменяют всю операцию с `IntegrityError`.
+
+        ### Args:
+        - rows (`Iterable[tuple]`): Кортежи `(product_id, warehouse_id, serial, barcode)`,
+        серийный номер и штрихкод могут быть `None`.
+        - batch_size (`int`, опционально): Количество строк в одном `COPY`.
+
+        ### Returns:
+        - `int`: Количество оприходованных единиц.
+
+        """
+        counts = Counter()
+        sql = (
+            f'COPY {connection.ops.quote_name(cls._meta.db_table)} '
+            '(product_id, warehouse_id, status, serial, barcode) FROM STDIN WITH (FORMAT csv)'
+        )
+        rows = iter(rows)
+        with transaction.atomic(), connection.cursor() as cursor:
+            while batch := list(islice(rows, batch_size)):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for product_id, warehouse_id, serial, barcode in batch:
+                    writer.writerow((product_id, warehouse_id, cls.Status.IN_STOCK, serial, barcode))
+                    counts[product_id, warehouse_id] += 1
+                buffer.seek(0)
+                with connection.wrap_database_errors:
+                    cursor.copy_expert(sql, buffer)
+            for (product_id, warehouse_id), count in counts.items():
+                StockLevel.change(product_id, warehouse_id, quantity=count)
+        return sum(counts.values())
+
+    @classmethod
+    def move_bulk(cls, values, warehouse: Warehouse, by: str = 'id', batch_size: int = COPY_BATCH_SIZE) -> int:
+        """
+        Перемещает непроданные единицы товара на другой склад по большому списку значений.
+
+        Значения передаются через `COPY` во временную таблицу, после чего единицы блокируются
+        и перемещаются одним `UPDATE ... FROM` с возвратом прежних складов, по которым
+        меняются остатки `StockLevel`.
+
+        ### Args:
+        - values (`Iterable`): Идентификаторы, серийные номера или штрихкоды единиц.
+        - warehouse (`Warehouse`): Склад назначения.
+        - by (`str`, опционально): Поле поиска: `id`, `serial` или `barcode`.
+        - batch_size (`int`, опционально): Количество строк в одном `COPY`.
+
+        ### Returns:
+        - `int`: Количество перемещенных единиц.
+
+        """
+        if by not in cls.MOVE_LOOKUPS:
+            raise ValueError(f'Поле поиска должно быть одним из: {", ".join(cls.MOVE_LOOKUPS)}.')
+        table = connection.ops.quote_name(cls._meta.db_table)
+        values = iter(values)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMPORARY TABLE product_unit_move (value {cls.MOVE_LOOKUPS[by]}) ON COMMIT DROP')
+            while batch := list(islice(values, batch_size)):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows((value,) for value in batch)
+                buffer.seek(0)
+                with connection.wrap_database_errors:
+                    cursor.copy_expert('COPY product_unit_move (value) FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(
+                f"""
+                WITH locked AS (
+                    SELECT unit.id, unit.warehouse_id
+                    FROM {table} unit
+                    JOIN product_unit_move ON product_unit_move.value = unit.{by}
+                    WHERE unit.status <> %s AND unit.warehouse_id <> %s
+                    FOR UPDATE OF unit
+                ), moved AS (
+                    UPDATE {table} unit SET warehouse_id = %s
+                    FROM locked WHERE unit.id = locked.id
+                    RETURNING unit.product_id, locked.warehouse_id, unit.status
+                )
+                SELECT product_id, warehouse_id, status, COUNT(*) FROM moved GROUP BY 1, 2, 3
+                """,
+                (cls.Status.SOLD, warehouse.pk, warehouse.pk),
+            )
+            groups = cursor.fetchall()
+            cursor.execute('DROP TABLE product_unit_move')
+            for product_id, warehouse_id, status, count in groups:
+                reserved = count if status == cls.Status.RESERVED else 0
+                StockLevel.change(product_id, warehouse_id, quantity=-count, reserved=-reserved)
+                StockLevel.change(product_id, warehouse.pk, quantity=count, reserved=reserved)
+        return sum(count for *_, count in groups)
+
+    @classmethod
+    def get_counts(cls, product_ids=None, warehouse_ids=None) -> list:
+        """
+        Количество непроданных единиц товара сгруппированным запросом по частичному индексу
+        `products_unit_stock_idx`, который покрывает все нужные колонки.
+
+        ### Args:
+        - product_ids (`Iterable[int]`, опционально): Товары.
+        - warehouse_ids (`Iterable[int]`, опционально): Склады.
+
+        ### Returns:
+        - `list[dict]`: Строки `{'product_id', 'warehouse_id', 'quantity', 'reserved'}`.
+
+        """
+        units = cls.objects.exclude(status=cls.Status.SOLD)
+        if product_ids is not None:
+            units = units.filter(product_id__in=product_ids)
+        if warehouse_ids is not None:
+            units = units.filter(warehouse_id__in=warehouse_ids)
+        return list(
+            units
+            .values('product_id', 'warehouse_id')
+            .annotate(quantity=Count('pk'), reserved=Count('pk', filter=Q(status=cls.Status.RESERVED)))
+            .order_by('product_id', 'warehouse_id')
+        )
+
+    @classmethod
+    def move(cls, units, warehouse: Warehouse) -> int:
+        """
+        Перемещает непроданные единицы товара на другой склад.
+
+        ### Args:
+        - units (`QuerySet | Iterable[ProductUnique | int]`): Единицы товара.
+        - warehouse (`Warehouse`): Склад назначения.
+
+        ### Returns:
+        - `int`: Количество перемещенных единиц.
+
+        """
+        with transaction.atomic():
+            locked = cls._lock(units).exclude(status=cls.Status.SOLD).exclude(warehouse=warehouse)
+            groups = cls._group(locked)
+            moved = locked.update(warehouse=warehouse)
+            for (product_id, warehouse_id, status), count in groups.items():
+                reserved = count if status == cls.Status.RESERVED else 0
+                StockLevel.change(product_id, warehouse_id, quantity=-count, reserved=-reserved)
+                StockLevel.change(product_id, warehouse.pk, quantity=count, reserved=reserved)
+        return moved
+
+    @classmethod
+    def reserve(cls, units) -> int:
+        """
+        Резервирует единицы товара, находящиеся на складе.
+
+        ### Args:
+        - units (`QuerySet | Iterable[ProductUnique | int]`): Единицы товара.
+
+        ### Returns:
+        - `int`: Количество зарезервированных единиц.
+
+        """
+        return cls._set_status(units, cls.Status.IN_STOCK, cls.Status.RESERVED)
+
+    @classmethod
+    def release(cls, units) -> int:
+        """
+        Снимает резерв с единиц товара.
+
+        ### Args:
+        - units (`QuerySet | Iterable[ProductUnique | int]`): Единицы товара.
+
+        ### Returns:
+        - `int`: Количество освобожденных единиц.
+
+        """
+        return cls._set_status(units, cls.Status.RESERVED, cls.Status.IN_STOCK)
+
+    @classmethod
+    def sell(cls, units) -> int:
+        """
+        Отмечает единицы товара проданными и списывает их с остатков.
+
+        ### Args:
+        - units (`QuerySet | Iterable[ProductUnique | int]`): Единицы товара.
+
+        ### Returns:
+        - `int`: Количество проданных единиц.
+
+        """
+        with transaction.atomic():
+            locked = cls._lock(units).exclude(status=cls.Status.SOLD)
+            groups = cls._group(locked)
+            sold = locked.update(status=cls.Status.SOLD)
+            for (product_id, warehouse_id, status), count in groups.items():
+                reserved = count if status == cls.Status.RESERVED else 0
+                StockLevel.change(product_id, warehouse_id, quantity=-count, reserved=-reserved)
+        return sold
+
+    @classmethod
+    def _set_status(cls, units, from_status: int, to_status: int) -> int:
+        with transaction.atomic():
+            locked = cls._lock(units).filter(status=from_status)
+            groups = cls._group(locked)
+            changed = locked.update(status=to_status)
+            sign = 1 if to_status == cls.Status.RESERVED else -1
+            for (product_id, warehouse_id, _status), count in groups.items():
+                StockLevel.change(product_id, warehouse_id, reserved=sign * count)
+        return changed
+
+    @classmethod
+    def _lock(cls, units) -> QuerySet:
+        if not isinstance(units, QuerySet):
+            units = cls.objects.filter(pk__in=[getattr(unit, 'pk', unit) for unit in units])
+        ids = list(units.select_for_update().values_list('pk', flat=True))
+        return cls.objects.filter(pk__in=ids)
+
+    @staticmethod
+    def _group(units: QuerySet) -> dict:
+        groups = units.values('product_id', 'warehouse_id', 'status').annotate(count=Count('pk')).order_by()
+        return {(group['product_id'], group['warehouse_id'], group['status']): group['count'] for group in groups}
+
+
+class ProductImport(models.Model):
+    """
+    Модель для представления загрузки каталога товаров из файла.
+
+    Файл разбирается задачей Celery `import_products` или командой `import_products` пачками,
+    каждая пачка записывается в своей транзакции вместе с `processed`, поэтому прерванную
+    загрузку можно продолжить с первой незаписанной строки.
+
+    ### Args:
+    - file (`FileField`): Файл каталога в формате выгрузки `Product.export()`.
+    - file_format (`str`): Формат файла, одно из `Product.EXPORT_FORMATS`.
+    - status (`int`): Статус загрузки.
+    - processed (`int`): Количество обработанных строк файла.
+    - created_products (`int`): Количество созданных товаров.
+    - created_attributes (`int`): Количество созданных атрибутов.
+    - failed_rows (`int`): Количество строк с ошибками.
+    - errors (`list`): Первые ошибки в виде `{'row', 'error'}`.
+    - owner (`User`, опционально): Пользователь, запустивший загрузку.
+    - created_at (`datetime`): Дата и время создания.
+    - updated_at (`datetime`): Дата и время последнего изменения.
+
+    """
+    class Status(models.IntegerChoices):
+        PENDING = 1, _('ожидает')
+        RUNNING = 2, _('выполняется')
+        DONE = 3, _('завершена')
+        FAILED = 4, _('прервана')
+
+    file = models.FileField(_('файл'), upload_to='imports/products/')
+    file_format = models.CharField(_('формат'), max_length=10, choices=tuple((name, name) for name in Product.EXPORT_FORMATS), default='csv')
+    status = models.PositiveSmallIntegerField(_('статус'), choices=Status.choices, default=Status.PENDING)
+    processed = models.PositiveIntegerField(_('обработано строк'), default=0)
+    created_products = models.PositiveIntegerField(_('создано товаров'), default=0)
+    created_attributes = models.PositiveIntegerField(_('создано атрибутов'), default=0)
+    failed_rows = models.PositiveIntegerField(_('строк с ошибками'), default=0)
+    errors = models.JSONField(_('ошибки'), default=list, blank=True)
+    owner = models.ForeignKey(User, verbose_name=_('пользователь'), related_name='product_imports', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(_('дата и время создания'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('дата и время изменения'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('загрузка каталога')
+        verbose_name_plural = _('загрузки каталога')
+
+    def __str__(self):
+        return f"{self.file.name}: {self.get_status_display()}"
+
+
+class ProductFeed(models.Model):
+    """
+    Модель для представления фида товаров для маркетплейсов.
+
+    Фид собирается задачей Celery `generate_product_feeds` из документов `ProductDocument`.
+    Товары разбиты на пачки по диапазонам `id` размером `settings.FEED_CHUNK_SIZE`, каждая пачка
+    хранится в хранилище отдельным фрагментом. При следующей сборке перерисовываются только пачки,
+    у которых изменилось количество документов, время последней сборки документа, дерево категорий
+    или цены, после чего фрагменты склеиваются в файл фида потоково. Цены берутся из базовых
+    прайс-листов с учетом действующих акций, товары без цены в фид не попадают.
+
+    ### Args:
+    - name (`str`): Формат фида, ключ `products.feeds.FEED_FORMATS`.
+    - file (`FileField`): Собранный файл фида.
+    - etag (`str`): Хеш содержимого фида для заголовка `ETag`.
+    - chunks (`dict`): Состояние пачек `{номер: [количество, время сборки, хеш категорий, хеш цен, хеш фрагмента]}`.
+    - generated_at (`datetime`, опционально): Дата и время последней сборки.
+
+    ### Methods:
+    - generate(): Собирает фид, перерисовывая только измененные пачки.
+
+    """
+    name = models.CharField(_('формат'), max_length=20, unique=True)
+    file = models.FileField(_('файл'), upload_to='feeds/', blank=True)
+    etag = models.CharField(_('ETag'), max_length=32, blank=True)
+    chunks = models.JSONField(_('пачки'), default=dict, blank=True)
+    generated_at = models.DateTimeField(_('дата и время сборки'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('фид товаров')
+        verbose_name_plural = _('фиды товаров')
+
+    def __str__(self):
+        return f"{self.name}"
+
+    def get_chunk_name(self, chunk) -> str:
+        return f'feeds/{self.name}/chunks/{chunk}.xml'
+
+    def generate(self) -> list:
+        """
+        Собирает фид, перерисовывая только измененные пачки.
+
+        ### Returns:
+        - `list[int]`: Номера перерисованных пачек.
+
+        """
+        from prices.models import EffectivePrice
+        from products.feeds import FEED_FORMATS, get_flat_categories
+
+        feed_format = FEED_FORMATS[self.name]()
+        chunk_size = settings.FEED_CHUNK_SIZE
+        categories = get_flat_categories(ProductsCategory.get_tree())
+        categories_by_id = {category['id']: category for category in categories}
+        categories_hash = hashlib.md5(json.dumps(categories).encode()).hexdigest()
+        prices = EffectivePrice.resolve(
+            None, EffectivePrice.get_list_prices(), {}, EffectivePrice.get_active_promos(timezone.now()),
+        )
+        prices_hashes = defaultdict(hashlib.md5)
+        for product_id, (base_price, price, promo_id) in sorted(prices.items()):
+            prices_hashes[str(product_id // chunk_size)].update(f'{product_id}:{base_price}:{price};'.encode())
+        signatures = {
+            str(row['chunk']): [row['count'], row['updated'].isoformat(), categories_hash, prices_hashes[str(row['chunk'])].hexdigest()]
+            for row in (
+                ProductDocument.objects
+                .annotate(chunk=F('product_id') / chunk_size)
+                .values('chunk')
+                .annotate(count=Count('pk'), updated=Max('updated_at'))
+                .order_by()
+            )
+        }
+        changed = []
+        for chunk, signature in signatures.items():
+            if self.chunks.get(chunk, [])[:-1] == signature:
+                continue
+            documents = (
+                ProductDocument.objects
+                .filter(product_id__gte=int(chunk) * chunk_size, product_id__lt=(int(chunk) + 1) * chunk_size)
+                .order_by('product_id')
+                .values_list('data', flat=True)
+            )
+            content = ''.join(
+                feed_format.render_item(data, categories_by_id, prices[data['id']])
+                for data in documents if data['id'] in prices
+            ).encode()
+            default_storage.delete(self.get_chunk_name(chunk))
+            default_storage.save(self.get_chunk_name(chunk), ContentFile(content))
+            self.chunks[chunk] = [*signature, hashlib.md5(content).hexdigest()]
+            changed.append(int(chunk))
+        for chunk in set(self.chunks) - set(signatures):
+            default_storage.delete(self.get_chunk_name(chunk))
+            del self.chunks[chunk]
+
+        updated_at = max((datetime.fromisoformat(signature[1]) for signature in signatures.values()), default=timezone.now())
+        header, footer = feed_format.header(categories, updated_at).encode(), feed_format.footer().encode()
+        order = sorted(self.chunks, key=int)
+        etag = hashlib.md5(b''.join([header, *(self.chunks[chunk][-1].encode() for chunk in order), footer])).hexdigest()
+        if etag != self.etag or not self.file:
+            with tempfile.TemporaryFile() as file:
+                file.write(header)
+                for chunk in order:
+                    with default_storage.open(self.get_chunk_name(chunk), 'rb') as fragment:
+                        shutil.copyfileobj(fragment, file)
+                file.write(footer)
+                file.seek(0)
+                if self.file:
+                    self.file.delete(save=False)
+                self.file.save(f'{self.name}.xml', File(file), save=False)
+            self.etag = etag
+
+        self.generated_at = timezone.now()
+        self.save()
+        return sorted(changed)
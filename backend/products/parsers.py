@@ -0,0 +1,39 @@
+from attributes.parsers import parse_raw_value
+
+IMPORT_FIELDS = ('part_number', 'title', 'description', 'brand', 'manufacturer', 'category')
+IMPORT_REQUIRED_FIELDS = ('part_number', 'title', 'brand')
+IMPORT_DIMENSION_FIELDS = ('length', 'width', 'depth', 'weight')
+
+
+def parse_import_row(row: dict) -> tuple:
+    """
+    Разбирает строку импорта каталога без обращений к базе данных.
+
+    Модуль не импортирует Django, поэтому строки можно разбирать в пуле процессов.
+
+    ### Args:
+    - row (`dict`): Поля товара и `attributes` — словарь `{название атрибута: строка значения}`.
+
+    ### Returns:
+    - `tuple`: Пара `(товар, ошибка)`. Товар — словарь полей `IMPORT_FIELDS` и `IMPORT_DIMENSION_FIELDS`
+    с `attributes` — списком `(название, тип, значение, ЕИ)`; при ошибке товар `None`.
+
+    """
+    product = {field: str(row.get(field) or '').strip() for field in IMPORT_FIELDS}
+    missing = [field for field in IMPORT_REQUIRED_FIELDS if not product[field]]
+    if missing:
+        return None, f'Не заполнены поля: {", ".join(missing)}.'
+
+    for field in IMPORT_DIMENSION_FIELDS:
+        value = str(row.get(field) or '').strip().replace(',', '.')
+        try:
+            product[field] = float(value) if value else None
+        except ValueError:
+            return None, f'Поле {field} должно быть числом.'
+
+    product['attributes'] = [
+        (name.strip(), *parse_raw_value(str(value).strip()))
+        for name, value in (row.get('attributes') or {}).items()
+        if name.strip() and str(value).strip()
+    ]
+    return product, None
@@ -1,30 +1,290 @@
+from addresses.serializers import CountrySerializer
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
-from products.models import Product, ProductsCategory, Manufacturer, Brand
+from products.models import Product, ProductImport, ProductsCategory, ProductUnique, Manufacturer, Brand
+from fileflow.models import Image
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Миксин ModelSerializer для выборочных полей `?fields=` и раскрытия связей `?expand=`.
+
+    Параметры читаются из запроса в контексте и применяются только к корневому сериализатору.
+    Связи из `expandable_fields` без `?expand=` отдаются идентификаторами.
+    Для сокращения SQL вьюсет передает queryset в `get_sparse_queryset()`.
+
+    ### Attributes:
+    - expandable_fields (`dict`): Связи, которые можно раскрыть, и их сериализаторы.
+
+    ### Methods:
+    - get_sparse_params(request): Разбирает параметры `fields` и `expand`.
+    - get_sparse_queryset(queryset, request): Ограничивает queryset нужными колонками и связями.
+
+    """
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or not self.is_root_serializer():
+            return fields
+
+        requested, expand = self.get_sparse_params(request)
+        for name in expand:
+            fields[name] = self.expandable_fields[name](read_only=True)
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+    def is_root_serializer(self) -> bool:
+        return self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+
+    @classmethod
+    def get_sparse_params(cls, request) -> tuple:
+        """
+        Разбирает параметры `fields` и `expand`, перечисленные через запятую.
+
+        ### Returns:
+        - `tuple[set, list]`: Запрошенные поля (пустое множество — все поля) и раскрываемые связи.
+        Раскрываемая связь добавляется к запрошенным полям.
+
+        """
+        def split(name):
+            return [item.strip() for item in request.query_params.get(name, '').split(',') if item.strip()]
+
+        expand = [name for name in dict.fromkeys(split('expand')) if name in cls.expandable_fields]
+        requested = set(split('fields'))
+        if requested:
+            requested.update(expand)
+        return requested, expand
+
+    @classmethod
+    def get_sparse_queryset(cls, queryset, request):
+        """
+        Ограничивает queryset колонками запрошенных полей через `only()`
+        и подтягивает раскрытые связи через `select_related()`.
+
+        ### Args:
+        - queryset (`QuerySet`): Исходный queryset.
+        - request (`Request`): Запрос с параметрами `fields` и `expand`.
+
+        ### Returns:
+        - `QuerySet`: Ограниченный queryset.
+
+        """
+        requested, expand = cls.get_sparse_params(request)
+        if expand:
+            queryset = queryset.select_related(*expand)
+        if not requested:
+            return queryset
+
+        opts = queryset.model._meta
+        columns = [opts.pk.name]
+        for field in cls(context={'request': request}).fields.values():
+            name = field.source.split('.')[0]
+            try:
+                model_field = opts.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                columns.append(name)
+        return queryset.only(*columns)
+
+
+class ProductsCategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
-        model = Product
+        model = ProductsCategory
         fields = '__all__'
 
 
-class ProductsCategorySerializer(serializers.ModelSerializer):
+class ProductsCategoryTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    category_name = serializers.CharField()
+    image = serializers.IntegerField(allow_null=True)
+
+    def get_fields(self):
+        fields = super(ProductsCategoryTreeSerializer, self).get_fields()
+        fields['children'] = ProductsCategoryTreeSerializer(many=True, required=False)
+        return fields
+
+
+class BrandSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
-        model = ProductsCategory
+        model = Brand
         fields = '__all__'
 
 
-class ManufacturerSerializer(serializers.ModelSerializer):
+class ManufacturerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'brand': BrandSerializer,
+        'country': CountrySerializer,
+    }
 
     class Meta:
         model = Manufacturer
         fields = '__all__'
 
 
-class BrandSerializer(serializers.ModelSerializer):
+class BrandDirectorySerializer(BrandSerializer):
+    """Бренд со счетчиками из `ProductCounter.annotate()`."""
+    product_count = serializers.IntegerField(read_only=True)
+    category_count = serializers.IntegerField(read_only=True)
+
+
+class ManufacturerDirectorySerializer(ManufacturerSerializer):
+    """Производитель со счетчиками из `ProductCounter.annotate()` и названием страны."""
+    product_count = serializers.IntegerField(read_only=True)
+    category_count = serializers.IntegerField(read_only=True)
+    country_title = serializers.CharField(source='country.title', read_only=True)
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'brand': BrandSerializer,
+        'manufacturer': ManufacturerSerializer,
+        'category': ProductsCategorySerializer,
+    }
 
     class Meta:
-        model = Brand
+        model = Product
+        exclude = ('search_vector',)
+
+
+class StockWarehouseSerializer(serializers.Serializer):
+    warehouse_id = serializers.IntegerField()
+    title = serializers.CharField()
+    address = serializers.CharField()
+    count = serializers.IntegerField()
+    reserved = serializers.IntegerField()
+
+
+class StockSummarySerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    total = serializers.IntegerField()
+    warehouses = StockWarehouseSerializer(many=True)
+
+
+class ProductAttributeValueSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    value = serializers.CharField(max_length=100)
+    category = serializers.CharField(max_length=100, required=False, allow_null=True, default=None)
+
+
+class ProductAttributesSerializer(serializers.Serializer):
+    attributes = ProductAttributeValueSerializer(many=True, allow_empty=False)
+
+    def validate_attributes(self, value):
+        names = [item['name'] for item in value]
+        if len(names) != len(set(names)):
+            raise serializers.ValidationError('Названия атрибутов не должны повторяться.')
+        return value
+
+
+class UnitReceiveRowSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    warehouse = serializers.IntegerField(min_value=1)
+    serial = serializers.CharField(max_length=64, required=False, allow_null=True, default=None)
+    barcode = serializers.CharField(max_length=64, required=False, allow_null=True, default=None)
+
+
+class UnitReceiveSerializer(serializers.Serializer):
+    units = UnitReceiveRowSerializer(many=True, allow_empty=False)
+
+
+class UnitMoveSerializer(serializers.Serializer):
+    warehouse = serializers.IntegerField(min_value=1)
+    by = serializers.ChoiceField(choices=tuple(ProductUnique.MOVE_LOOKUPS), default='id')
+    values = serializers.ListField(child=serializers.CharField(max_length=64), allow_empty=False)
+
+    def validate(self, attrs):
+        if attrs['by'] == 'id' and not all(value.isdigit() for value in attrs['values']):
+            raise serializers.ValidationError({'values': 'Идентификаторы должны быть целыми числами.'})
+        return attrs
+
+
+class UnitCountSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    warehouse_id = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    reserved = serializers.IntegerField()
+
+
+class ProductSuggestionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    part_number = serializers.CharField()
+    similarity = serializers.FloatField()
+
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source='owner.id')
+
+    class Meta:
+        model = ProductImport
         fields = '__all__'
+        read_only_fields = (
+            'status', 'processed', 'created_products', 'created_attributes', 'failed_rows', 'errors',
+            'created_at', 'updated_at',
+        )
+
+
+class DocumentImageField(serializers.Field):
+
+    def to_representation(self, value: Image):
+        return value.image_webp.url if value.image_webp else None
+
+
+class DocumentBrandSerializer(serializers.ModelSerializer):
+    image = DocumentImageField()
+
+    class Meta:
+        model = Brand
+        fields = ('id', 'title', 'image')
+
+
+class DocumentManufacturerSerializer(serializers.ModelSerializer):
+    country = serializers.CharField(source='country.title')
+
+    class Meta:
+        model = Manufacturer
+        fields = ('id', 'title', 'country')
+
+
+class DocumentCategorySerializer(serializers.ModelSerializer):
+    image = DocumentImageField()
+
+    class Meta:
+        model = ProductsCategory
+        fields = ('id', 'category_name', 'path', 'image')
+
+
+class ProductDocumentSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор полного представления товара для `ProductDocument`.
+
+    Значения атрибутов передаются в контексте `attributes` в виде результата
+    `Attribute.get_values_for_objects()`. Изображения товара ожидаются выбранными
+    через `prefetch_related('images')`, главное изображение идет первым.
+
+    """
+    brand = DocumentBrandSerializer()
+    manufacturer = DocumentManufacturerSerializer()
+    category = DocumentCategorySerializer()
+    attributes = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = (
+            'id', 'part_number', 'title', 'description', 'brand', 'manufacturer', 'category',
+            'length', 'width', 'depth', 'weight', 'volume', 'volumetric_weight', 'shipping_class', 'attributes',
+            'images',
+        )
+
+    def get_attributes(self, obj):
+        return self.context['attributes'].get(obj.pk, [])
+
+    def get_images(self, obj):
+        return [product_image.image.image_webp.url for product_image in obj.images.all() if product_image.image.image_webp]
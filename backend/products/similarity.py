@@ -0,0 +1,138 @@
+from collections import Counter
+
+import numpy as np
+from attributes.models import Attribute
+from django.contrib.contenttypes.models import ContentType
+
+from products.models import Product
+
+MAX_CHOICE_COLUMNS = 2048
+
+ATTRIBUTE_FIELDS = (
+    'object_id',
+    'data_type__name',
+    'data_type__strtype__value',
+    'data_type__inttype__value',
+    'data_type__inttype__unit',
+    'data_type__floattype__value',
+    'data_type__floattype__unit',
+    'data_type__booltype__value',
+)
+
+
+def get_attribute_rows(product_ids) -> list:
+    """Значения атрибутов товаров всех подтипов `DataType` одним запросом в виде кортежей `ATTRIBUTE_FIELDS`."""
+    return list(
+        Attribute.objects
+        .filter(content_type=ContentType.objects.get_for_model(Product), object_id__in=product_ids)
+        .order_by()
+        .values_list(*ATTRIBUTE_FIELDS)
+    )
+
+
+def encode_products(product_ids: list, rows: list) -> np.ndarray:
+    """
+    Кодирует атрибуты товаров в матрицу признаков.
+
+    Колонки матрицы:
+    - числовые значения — по колонке на `(название, ЕИ)`, приведенные к `[0, 1]` по минимуму
+    и максимуму колонки и центрированные по среднему, отсутствующие значения равны `0`;
+    - варианты `StrType` — по колонке на `(название, вариант)` со значениями `0`/`1`, не более
+    `MAX_CHOICE_COLUMNS` самых частых вариантов, остальные не учитываются;
+    - значения `BoolType` — по колонке на название со значениями `0`/`1`.
+
+    Отсутствующий признак не добавляет близости, поэтому товар без атрибутов получает нулевую строку.
+
+    ### Args:
+    - product_ids (`list[int]`): Товары в порядке строк матрицы.
+    - rows (`list[tuple]`): Результат `get_attribute_rows()`.
+
+    ### Returns:
+    - `np.ndarray`: Матрица `float32` размера `(товары, признаки)`.
+
+    """
+    positions = {pk: index for index, pk in enumerate(product_ids)}
+    choices = Counter(('str', row[1], row[2]) for row in rows if row[2] is not None)
+    choices = {key for key, _ in choices.most_common(MAX_CHOICE_COLUMNS)}
+    columns, numeric, cells = {}, set(), []
+    for object_id, name, choice_id, int_value, int_unit, float_value, float_unit, bool_value in rows:
+        if choice_id is not None:
+            key, value = ('str', name, choice_id), 1.0
+            if key not in choices:
+                continue
+        elif bool_value is not None:
+            key, value = ('bool', name), float(bool_value)
+        elif int_value is not None or float_value is not None:
+            key = ('number', name, int_unit if int_value is not None else float_unit)
+            value = float(int_value if int_value is not None else float_value)
+            numeric.add(key)
+        else:
+            continue
+        cells.append((positions[object_id], columns.setdefault(key, len(columns)), value))
+
+    matrix = np.zeros((len(product_ids), len(columns)), dtype=np.float32)
+    if not cells:
+        return matrix
+    row_index, column_index, values = (np.array(values) for values in zip(*cells))
+    matrix[row_index, column_index] = values
+
+    numeric_columns = [columns[key] for key in numeric]
+    if numeric_columns:
+        present = np.zeros(matrix.shape, dtype=bool)
+        present[row_index, column_index] = True
+        block = np.where(present[:, numeric_columns], matrix[:, numeric_columns], np.nan)
+        minimum, maximum = np.nanmin(block, axis=0), np.nanmax(block, axis=0)
+        block = (block - minimum) / np.where(maximum > minimum, maximum - minimum, 1)
+        block -= np.nanmean(block, axis=0)
+        matrix[:, numeric_columns] = np.where(np.isnan(block), 0, block)
+    return matrix
+
+
+def get_top_neighbours(matrix: np.ndarray, k: int, block_size: int = 1024) -> tuple:
+    """
+    Находит для каждой строки матрицы `k` ближайших строк по косинусной близости.
+
+    Близости считаются блоками по `block_size` строк, поэтому память ограничена
+    `block_size × количество строк`, а не квадратом количества строк.
+
+    ### Returns:
+    - `tuple`: Пара массивов `(индексы, близости)` размера `(строки, k)`, отсортированных
+    по убыванию близости. Строки без признаков получают близость `0` со всеми.
+
+    """
+    count = matrix.shape[0]
+    k = min(k, count - 1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    normalized = matrix / np.where(norms > 0, norms, 1)
+
+    indices = np.empty((count, k), dtype=np.int64)
+    scores = np.empty((count, k), dtype=np.float32)
+    for start in range(0, count, block_size):
+        stop = min(start + block_size, count)
+        similarity = normalized[start:stop] @ normalized.T
+        similarity[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarity, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+def get_category_neighbours(product_ids: list, k: int) -> dict:
+    """
+    Похожие товары внутри набора товаров одной категории.
+
+    ### Returns:
+    - `dict`: Словарь `{product_id: [(similar_id, близость), ...]}` с не более чем `k`
+    соседями с положительной близостью.
+
+    """
+    if len(product_ids) < 2:
+        return {}
+    matrix = encode_products(product_ids, get_attribute_rows(product_ids))
+    indices, scores = get_top_neighbours(matrix, k)
+    return {
+        pk: [(product_ids[index], float(score)) for index, score in zip(indices[row], scores[row]) if score > 0]
+        for row, pk in enumerate(product_ids)
+    }
@@ -0,0 +1,44 @@
+from celery import shared_task
+
+from products.models import (Product, ProductDocument, ProductFeed,
+                             ProductImport, ProductSimilarity)
+
+
+@shared_task
+def rebuild_product_documents(lookup: dict) -> int:
+    """
+    Перестраивает документы товаров, отобранных фильтром `Product.objects.filter(**lookup)`.
+    """
+    return ProductDocument.rebuild(Product.objects.filter(**lookup).distinct())
+
+
+@shared_task
+def import_products(import_id: int) -> int:
+    """
+    Загружает каталог из файла `ProductImport`, продолжая с первой необработанной строки.
+    """
+    from products.importer import ProductImporter
+
+    product_import = ProductImport.objects.get(pk=import_id)
+    return ProductImporter(product_import).run().created_products
+
+
+@shared_task
+def generate_product_feeds() -> dict:
+    """
+    Собирает фиды товаров всех форматов, перерисовывая только измененные пачки.
+    """
+    from products.feeds import FEED_FORMATS
+
+    return {
+        name: ProductFeed.objects.get_or_create(name=name)[0].generate()
+        for name in FEED_FORMATS
+    }
+
+
+@shared_task
+def rebuild_product_similarities() -> int:
+    """
+    Пересчитывает похожие товары всех категорий по векторам атрибутов.
+    """
+    return ProductSimilarity.rebuild()
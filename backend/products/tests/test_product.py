@@ -1,8 +1,54 @@
-from addresses.models import Country
-from attributes.models import StrType
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from xml.etree import ElementTree
 
-from ..models import Attribute, Brand, Manufacturer, Product, ProductsCategory
+from addresses.models import Address, City, Country, Region
+from attributes.models import (AttributeValue, BoolType, FloatType, IntType,
+                               StrType, StrTypeChoice, Unit)
+from attributes.resolvers import resolver
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from fileflow.models import Image
+from prices.models import PriceList, PriceListItem, Promo
+from rest_framework import status
+from rest_framework.test import APIClient
+from warehouses.models import Warehouse
+
+from ..importer import ProductImporter
+from ..models import (Attribute, Brand, Manufacturer, Product, ProductCounter,
+                      ProductDocument, ProductFeed, ProductImage,
+                      ProductImport, ProductsCategory, ProductSimilarity,
+                      ProductUnique, StockLevel)
+from ..similarity import (encode_products, get_attribute_rows,
+                          get_top_neighbours)
+from ..tasks import (generate_product_feeds, import_products,
+                     rebuild_product_documents, rebuild_product_similarities)
+from ..views import ProductViewSet
+
+User = get_user_model()
+
+
+def add_attribute(product, data_type):
+    return Attribute.objects.create(
+        content_type=ContentType.objects.get_for_model(Product),
+        object_id=product.id,
+        data_type=data_type,
+    )
 
 
 class ProductModelTest(TestCase):
@@ -39,3 +85,1290 @@ class ProductModelTest(TestCase):
         self.assertEqual(attribute_instance.data_type.name, "Тестовый атрибут")
         self.assertEqual(attribute_instance.data_type.value.first().name, "тестовое значение")
         self.assertIsInstance(attribute_instance.data_type, StrType)
+
+
+class ProductStockTest(TestCase):
+    def setUp(self):
+        country = Country.objects.create(title="Test Country")
+        region = Region.objects.create(country=country, title="Test Region")
+        city = City.objects.create(region=region, title="Test City")
+        owner = User.objects.create_user(email='owner@test.py', password='password')
+        brand = Brand.objects.create(title="Test Brand")
+        self.warehouses = [
+            Warehouse.objects.create(
+                title=f'Склад {number}',
+                address=Address.objects.create(city=city, street='Тестовая улица', home=number),
+                owner=owner,
+            )
+            for number in range(1, 4)
+        ]
+        self.product = Product.objects.create(part_number='stock-1', title='Товар 1', brand=brand)
+        self.other_product = Product.objects.create(part_number='stock-2', title='Товар 2', brand=brand)
+        ProductUnique.receive(self.product, self.warehouses[0], 3)
+        ProductUnique.receive(self.product, self.warehouses[1], 2)
+        ProductUnique.receive(self.other_product, self.warehouses[2])
+        self.client = APIClient()
+
+    def test_get_stock_summary(self):
+        with self.assertNumQueries(1):
+            summary = self.product.get_stock_summary()
+        self.assertEqual(summary['total'], 5)
+        self.assertEqual(
+            [(warehouse['warehouse_id'], warehouse['count']) for warehouse in summary['warehouses']],
+            [(self.warehouses[0].id, 3), (self.warehouses[1].id, 2)],
+        )
+        self.assertEqual(summary['warehouses'][0]['address'], str(self.warehouses[0].address))
+        self.assertEqual(self.product.get_amount_all(), 5)
+
+    def test_get_stock_summaries(self):
+        empty_product = Product.objects.create(part_number='stock-3', title='Товар 3', brand=self.product.brand)
+        with self.assertNumQueries(1):
+            summaries = Product.get_stock_summaries((self.product, self.other_product, empty_product))
+        self.assertEqual(summaries[self.product.id]['total'], 5)
+        self.assertEqual(summaries[self.other_product.id]['total'], 1)
+        self.assertEqual(summaries[empty_product.id], {'product_id': empty_product.id, 'total': 0, 'warehouses': []})
+
+    def test_stock_operations(self):
+        units = list(self.product.stocked_products.filter(warehouse=self.warehouses[0]))
+
+        self.assertEqual(ProductUnique.move(units[:2], self.warehouses[2]), 2)
+        self.assertEqual(ProductUnique.reserve(units[2:]), 1)
+        self.assertEqual(ProductUnique.sell(units[:1]), 1)
+        self.assertEqual(ProductUnique.sell(units[:1]), 0)
+
+        levels = {
+            level.warehouse_id: (level.quantity, level.reserved)
+            for level in StockLevel.objects.filter(product=self.product)
+        }
+        self.assertEqual(levels, {
+            self.warehouses[0].id: (1, 1),
+            self.warehouses[1].id: (2, 0),
+            self.warehouses[2].id: (1, 0),
+        })
+        self.assertEqual(self.product.get_amount_all(), 4)
+
+    def test_reconcile_stock(self):
+        StockLevel.objects.filter(product=self.product, warehouse=self.warehouses[0]).update(quantity=10)
+        StockLevel.objects.filter(product=self.other_product).delete()
+
+        out = StringIO()
+        call_command('reconcile_stock', '--dry-run', stdout=out)
+        self.assertIn('Расхождений: 2', out.getvalue())
+        self.assertEqual(StockLevel.objects.get(product=self.product, warehouse=self.warehouses[0]).quantity, 10)
+
+        call_command('reconcile_stock', stdout=StringIO())
+        self.assertEqual(StockLevel.objects.get(product=self.product, warehouse=self.warehouses[0]).quantity, 3)
+        self.assertEqual(StockLevel.objects.get(product=self.other_product).quantity, 1)
+
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('Расхождений: 0', out.getvalue())
+
+    def test_stock_endpoints(self):
+        response = self.client.get(f'/api/v1/products/{self.product.id}/stock/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 5)
+        self.assertEqual(len(response.data['warehouses']), 2)
+
+        response = self.client.get('/api/v1/products/stock/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        totals = {summary['product_id']: summary['total'] for summary in response.data['results']}
+        self.assertEqual(totals, {self.product.id: 5, self.other_product.id: 1})
+
+    def get_levels(self, product):
+        return {
+            level.warehouse_id: (level.quantity, level.reserved)
+            for level in StockLevel.objects.filter(product=product)
+        }
+
+    def test_receive_bulk(self):
+        rows = [(self.product.id, self.warehouses[2].id, f'SN-{number}', f'460{number:010}') for number in range(5)]
+        rows.append((self.other_product.id, self.warehouses[2].id, 'SN,"1"', None))
+        self.assertEqual(ProductUnique.receive_bulk(rows, batch_size=2), 6)
+
+        self.assertEqual(self.get_levels(self.product)[self.warehouses[2].id], (5, 0))
+        self.assertEqual(self.get_levels(self.other_product)[self.warehouses[2].id], (2, 0))
+        unit = ProductUnique.objects.get(barcode='4600000000003')
+        self.assertEqual((unit.serial, unit.status), ('SN-3', ProductUnique.Status.IN_STOCK))
+        self.assertTrue(ProductUnique.objects.filter(product=self.other_product, serial='SN,"1"').exists())
+        self.assertEqual(ProductUnique.objects.filter(product=self.other_product, serial__isnull=True).count(), 1)
+
+        with self.assertRaises(IntegrityError):
+            ProductUnique.receive_bulk([(self.product.id, self.warehouses[0].id, 'SN-0', None)])
+        self.assertEqual(self.get_levels(self.product)[self.warehouses[0].id], (3, 0))
+
+    def test_move_bulk(self):
+        units = list(self.product.stocked_products.filter(warehouse=self.warehouses[0]).order_by('pk'))
+        ProductUnique.reserve(units[:1])
+        ProductUnique.sell(units[1:2])
+
+        self.assertEqual(ProductUnique.move_bulk([unit.id for unit in units], self.warehouses[1], batch_size=2), 2)
+        self.assertEqual(self.get_levels(self.product), {
+            self.warehouses[0].id: (0, 0),
+            self.warehouses[1].id: (4, 1),
+        })
+
+        ProductUnique.objects.filter(pk=units[2].pk).update(barcode='4601')
+        self.assertEqual(ProductUnique.move_bulk(['4601', 'missing'], self.warehouses[2], by='barcode'), 1)
+        self.assertEqual(self.get_levels(self.product)[self.warehouses[2].id], (1, 0))
+        with self.assertRaises(ValueError):
+            ProductUnique.move_bulk(['4601'], self.warehouses[2], by='status')
+
+    def test_get_counts_uses_partial_index(self):
+        ProductUnique.reserve(self.product.stocked_products.filter(warehouse=self.warehouses[1])[:1])
+        self.assertEqual(ProductUnique.get_counts(product_ids=[self.product.id]), [
+            {'product_id': self.product.id, 'warehouse_id': self.warehouses[0].id, 'quantity': 3, 'reserved': 0},
+            {'product_id': self.product.id, 'warehouse_id': self.warehouses[1].id, 'quantity': 2, 'reserved': 1},
+        ])
+
+        query = ProductUnique.objects.exclude(status=ProductUnique.Status.SOLD).filter(product_id=self.product.id)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = query.values('warehouse_id').explain()
+        self.assertIn('products_unit_stock_idx', plan)
+
+    def test_unit_endpoints(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin@test.py', 'password'))
+        response = self.client.post('/api/v1/products/units/receive/', {'units': [
+            {'product': self.other_product.id, 'warehouse': self.warehouses[0].id, 'serial': 'A1'},
+            {'product': self.other_product.id, 'warehouse': self.warehouses[0].id, 'barcode': '4602'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'received': 2})
+
+        response = self.client.post('/api/v1/products/units/receive/', {'units': [
+            {'product': self.other_product.id, 'warehouse': self.warehouses[0].id, 'serial': 'A1'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post('/api/v1/products/units/move/', {
+            'warehouse': self.warehouses[1].id, 'by': 'serial', 'values': ['A1'],
+        }, format='json')
+        self.assertEqual(response.data, {'moved': 1})
+        response = self.client.post('/api/v1/products/units/move/', {
+            'warehouse': self.warehouses[1].id, 'values': ['A1'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/v1/products/units/counts/', {'product': self.other_product.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {row['warehouse_id']: row['quantity'] for row in response.data},
+            {self.warehouses[0].id: 1, self.warehouses[1].id: 1, self.warehouses[2].id: 1},
+        )
+        self.assertEqual(self.client.get('/api/v1/products/units/counts/', {'warehouse': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/v1/products/units/counts/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.brand = Brand.objects.create(title="Bosch")
+        self.drill = Product.objects.create(
+            part_number='GSB-13RE',
+            title='Дрель ударная',
+            description='Компактная дрель для сверления бетона',
+            brand=self.brand,
+        )
+        self.saw = Product.objects.create(
+            part_number='PKS-55',
+            title='Circular saw',
+            description='Пила с дрелью в комплекте',
+            brand=Brand.objects.create(title="Makita"),
+        )
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get('/api/v1/products/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['id'] for product in response.data['results']]
+
+    def test_search_morphology_and_rank(self):
+        self.assertEqual(self.search('дрели'), [self.drill.id, self.saw.id])
+        self.assertEqual(self.search('saws'), [self.saw.id])
+        self.assertEqual(self.search('GSB-13RE'), [self.drill.id])
+        self.assertNotIn('search_vector', self.client.get(f'/api/v1/products/{self.drill.id}/').data)
+
+    def test_search_vector_follows_brand(self):
+        self.assertEqual(self.search('dewalt'), [])
+        self.brand.title = 'DeWalt'
+        self.brand.save()
+        self.assertEqual(self.search('dewalt'), [self.drill.id])
+
+        self.drill.title = 'Перфоратор'
+        self.drill.save()
+        self.assertEqual(self.search('перфоратор'), [self.drill.id])
+
+
+class ProductSuggestTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Bosch")
+        self.drill = Product.objects.create(part_number='GSB-13RE', title='Дрель ударная', brand=brand)
+        self.grinder = Product.objects.create(part_number='GWS-750', title='Угловая шлифмашина', brand=brand)
+        self.client = APIClient()
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/v1/products/suggest/', {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [suggestion['id'] for suggestion in response.data]
+
+    def test_suggest_by_part_number_and_misspelled_title(self):
+        self.assertEqual(self.suggest('gsb-13'), [self.drill.id])
+        self.assertEqual(self.suggest('шлифмашна'), [self.grinder.id])
+        self.assertEqual(self.suggest('g'), [])
+
+    def test_suggest_cache_invalidated_on_save(self):
+        self.assertEqual(self.suggest('gws'), [self.grinder.id])
+        self.drill.part_number = 'GWS-13'
+        self.drill.save()
+        self.assertCountEqual(self.suggest('gws'), [self.grinder.id, self.drill.id])
+
+
+class ProductKeysetPaginationTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        self.products = [
+            Product.objects.create(part_number=f'part-{number}', title=f'Товар {number % 3}', brand=brand)
+            for number in range(7)
+        ]
+        self.client = APIClient()
+
+    def walk(self, url, params):
+        ids = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [product['id'] for product in response.data['results']]
+            url, params = response.data['next'], None
+        return ids
+
+    def test_cursor_walks_whole_list(self):
+        ids = self.walk('/api/v1/products/', {'cursor': '', 'limit': 3})
+        self.assertEqual(ids, [product.id for product in self.products])
+
+    def test_count_only_on_first_page(self):
+        response = self.client.get('/api/v1/products/', {'cursor': '', 'limit': 3, 'title': 'Товар'})
+        self.assertEqual(response.data['count'], 7)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(response.data['next'])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_cursor_with_ordering_field(self):
+        with mock.patch.object(ProductViewSet, 'keyset_ordering', '-title', create=True):
+            ids = self.walk('/api/v1/products/', {'cursor': '', 'limit': 2})
+        expected = sorted(self.products, key=lambda product: (product.title, product.id), reverse=True)
+        self.assertEqual(ids, [product.id for product in expected])
+
+    def test_cursor_with_nullable_ordering_field(self):
+        for product, weight in zip(self.products, (None, 2, None, 1, 2, None, 3)):
+            product.weight = weight
+            product.save()
+        for ordering in ('weight', '-weight'):
+            with mock.patch.object(ProductViewSet, 'keyset_ordering', ordering, create=True):
+                ids = self.walk('/api/v1/products/', {'cursor': '', 'limit': 2})
+            expected = list(Product.objects.order_by(ordering, '-pk' if ordering.startswith('-') else 'pk').values_list('pk', flat=True))
+            self.assertEqual(ids, expected)
+
+    def test_offset_pagination_kept_without_cursor(self):
+        response = self.client.get('/api/v1/products/', {'limit': 2, 'offset': 2})
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/products/', {'cursor': 'broken'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for ordering, cursor in (('id', [1, 'x']), ('id', [1]), ('weight', ['abc', 1]), ('title', [None, 1])):
+            with mock.patch.object(ProductViewSet, 'keyset_ordering', ordering, create=True):
+                response = self.client.get('/api/v1/products/', {'cursor': base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductChangesTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        self.products = [
+            Product.objects.create(part_number=f'part-{number}', title=f'Товар {number}', brand=brand)
+            for number in range(5)
+        ]
+        self.client = APIClient()
+        patcher = mock.patch.object(Product, 'CHANGES_LAG', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def walk(self, since=None, limit=2):
+        changed, deleted = [], []
+        while True:
+            response = self.client.get('/api/v1/products/changes/', {'since': since or '', 'limit': limit})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            changed += response.data['changed']
+            deleted += response.data['deleted']
+            since = response.data['next']
+            if not response.data['has_more']:
+                return changed, deleted, since
+
+    def test_changes_walk_in_keyset_order(self):
+        changed, deleted, since = self.walk()
+        self.assertEqual(changed, [product.id for product in self.products])
+        self.assertEqual(deleted, [])
+        self.assertEqual(self.walk(since)[:2], ([], []))
+
+    def test_updates_and_deletions_after_token(self):
+        since = self.walk()[2]
+        self.products[3].title = 'Новое название'
+        self.products[3].save()
+        Attribute.objects.create(
+            content_type=ContentType.objects.get_for_model(Product),
+            object_id=self.products[1].id,
+            data_type=BoolType.objects.create(name='Wi-Fi', value=True),
+        )
+        deleted_id = self.products[0].id
+        self.products[0].delete()
+
+        changed, deleted, _ = self.walk(since)
+        self.assertEqual(changed, [self.products[3].id, self.products[1].id])
+        self.assertEqual(deleted, [deleted_id])
+
+    def test_recent_changes_held_back(self):
+        with mock.patch.object(Product, 'CHANGES_LAG', timedelta(minutes=1)):
+            self.assertEqual(Product.get_changes()['changed'], [])
+
+    def test_invalid_token(self):
+        for cursor in ('broken', {'changed': ['not a date', 1]}, {'changed': [timezone.now().isoformat(), 'x']}, {'other': []}):
+            since = cursor if isinstance(cursor, str) else base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+            response = self.client.get('/api/v1/products/changes/', {'since': since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_data_type_change_marks_products(self):
+        _, _, since = self.walk()
+        self.products[1].set_attribute('Цвет', 'синий', 'Внешний вид')
+        self.products[3].set_attribute('Цвет', 'синий', 'Внешний вид')
+        _, _, since = self.walk(since)
+        choice = StrTypeChoice.objects.get(name='синий')
+        choice.name = 'голубой'
+        choice.save()
+        self.assertEqual(self.walk(since)[0], [self.products[1].id, self.products[3].id])
+
+
+class ProductComparisonTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        self.products = [
+            Product.objects.create(part_number=f'P{index}', title=f'Дрель {index}', brand=brand)
+            for index in range(3)
+        ]
+        unit = Unit.objects.create(name='ватт', name_many='ватт', symbol='Вт')
+        for product, power in zip(self.products, (500, 500, 900)):
+            add_attribute(product, IntType.objects.create(name='Мощность', value=power, unit=unit))
+        color = StrType.objects.create(name='Цвет')
+        color.value.set((StrTypeChoice.objects.create(name='красный'),))
+        add_attribute(self.products[0], color)
+        add_attribute(self.products[1], BoolType.objects.create(name='Wi-Fi', value=True))
+        add_attribute(self.products[2], BoolType.objects.create(name='Wi-Fi', value=True))
+        self.client = APIClient()
+
+    def test_matrix_aligned_in_requested_order(self):
+        ids = [self.products[2].id, self.products[0].id, self.products[1].id]
+        response = self.client.get('/api/v1/products/compare/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([product['id'] for product in response.data['products']], ids)
+        rows = {row['name']: row for row in response.data['attributes']}
+        self.assertEqual(
+            rows['Мощность']['values'],
+            [{'value': 900, 'unit': 'Вт'}, {'value': 500, 'unit': 'Вт'}, {'value': 500, 'unit': 'Вт'}],
+        )
+        self.assertTrue(rows['Мощность']['differs'])
+        self.assertEqual(rows['Цвет']['values'], [None, {'value': 'красный', 'unit': None}, None])
+        self.assertEqual(rows['Wi-Fi']['values'][0], {'value': True, 'unit': None})
+
+    def test_cached_by_sorted_ids(self):
+        ids = [product.id for product in self.products]
+        Product.get_comparison(ids)
+        with self.assertNumQueries(0):
+            comparison = Product.get_comparison(ids[::-1])
+        self.assertEqual([product['id'] for product in comparison['products']], ids[::-1])
+
+        self.products[0].attributes.first().delete()
+        comparison = Product.get_comparison(ids)
+        self.assertEqual(
+            {row['name']: row['values'][0] for row in comparison['attributes']}['Мощность'],
+            None,
+        )
+
+    def test_data_type_change_invalidates_cache(self):
+        ids = [product.id for product in self.products]
+        Product.get_comparison(ids)
+        power = IntType.objects.get(attribute__object_id=self.products[2].id)
+        power.value = 1000
+        power.save()
+        rows = {row['name']: row for row in Product.get_comparison(ids)['attributes']}
+        self.assertEqual(rows['Мощность']['values'][2], {'value': 1000, 'unit': 'Вт'})
+
+    def test_uncached_query_count(self):
+        with self.assertNumQueries(3):
+            Product.get_comparison([product.id for product in self.products])
+
+    def test_invalid_ids(self):
+        for ids in ('', str(self.products[0].id), 'a,b', ','.join(str(pk) for pk in range(1, 12))):
+            response = self.client.get('/api/v1/products/compare/', {'ids': ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductSimilarityTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        self.drills = ProductsCategory.add_root(category_name='Дрели')
+        self.saws = ProductsCategory.add_root(category_name='Пилы')
+        self.products = [
+            Product.objects.create(part_number=f'P{index}', title=f'Дрель {index}', brand=brand, category=self.drills)
+            for index in range(4)
+        ]
+        self.saw = Product.objects.create(part_number='S0', title='Пила', brand=brand, category=self.saws)
+        unit = Unit.objects.create(name='ватт', name_many='ватт', symbol='Вт')
+        red, blue = StrTypeChoice.objects.create(name='красный'), StrTypeChoice.objects.create(name='синий')
+        for product, power, color, wifi in zip(
+            self.products + [self.saw], (500, 550, 1500, 1400, 500), (red, red, blue, blue, red), (True, True, False, False, True),
+        ):
+            add_attribute(product, IntType.objects.create(name='Мощность', value=power, unit=unit))
+            str_type = StrType.objects.create(name='Цвет')
+            str_type.value.set((color,))
+            add_attribute(product, str_type)
+            add_attribute(product, BoolType.objects.create(name='Wi-Fi', value=wifi))
+        self.client = APIClient()
+
+    def test_encode_products(self):
+        product_ids = [product.id for product in self.products]
+        bare = Product.objects.create(part_number='P-bare', title='Дрель', brand=self.saw.brand, category=self.drills)
+        product_ids.append(bare.id)
+        matrix = encode_products(product_ids, get_attribute_rows(product_ids))
+        self.assertEqual(matrix.shape, (5, 4))
+        self.assertAlmostEqual(float(matrix[:4, 0].sum()), 0.0, places=5)
+        self.assertEqual(matrix[4].tolist(), [0.0] * 4)
+        self.assertEqual(get_top_neighbours(matrix, 2)[1][4].tolist(), [0.0, 0.0])
+
+        with mock.patch('products.similarity.MAX_CHOICE_COLUMNS', 1):
+            self.assertEqual(encode_products(product_ids, get_attribute_rows(product_ids)).shape, (5, 3))
+
+    def test_rebuild_within_category(self):
+        rebuild_product_similarities()
+        first = ProductSimilarity.objects.filter(product=self.products[0]).order_by('rank')
+        self.assertEqual(first[0].similar_id, self.products[1].id)
+        self.assertEqual(list(first.values_list('similar_id', flat=True)), [self.products[1].id])
+        self.assertFalse(ProductSimilarity.objects.filter(product=self.saw).exists())
+        self.assertFalse(ProductSimilarity.objects.filter(similar=self.saw).exists())
+
+        self.assertEqual(ProductSimilarity.rebuild(k=1), 4)
+        self.assertEqual(ProductSimilarity.objects.filter(rank__gt=0).count(), 0)
+
+    def test_similar_endpoint_single_query(self):
+        ProductSimilarity.rebuild()
+        ProductDocument.build(self.products)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/products/{self.products[2].id}/similar/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # с товарами другого цвета, без Wi-Fi и с меньшей мощностью близость отрицательная
+        self.assertEqual([item['id'] for item in response.data], [self.products[3].id])
+        self.assertGreater(response.data[0]['similarity'], 0.9)
+        self.assertEqual(self.client.get(f'/api/v1/products/{self.saw.id}/similar/').data, [])
+        self.assertEqual(self.client.get('/api/v1/products/0/similar/').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductDocumentTest(TestCase):
+    def setUp(self):
+        country = Country.objects.create(title="Германия")
+        self.brand = Brand.objects.create(title="Bosch")
+        self.manufacturer = Manufacturer.objects.create(brand=self.brand, title="Robert Bosch GmbH", country=country)
+        self.category = ProductsCategory.add_root(category_name="Электроинструмент")
+        self.products = [
+            Product.objects.create(
+                part_number=f'GSB-{number}',
+                title=f'Дрель {number}',
+                brand=self.brand,
+                manufacturer=self.manufacturer,
+                category=self.category,
+            )
+            for number in range(3)
+        ]
+        for product in self.products:
+            product.set_attribute('Мощность', '750 Вт', 'Характеристики')
+            product.set_attribute('Цвет', 'синий', 'Внешний вид')
+            product.set_attribute('Реверс', 'да', 'Характеристики')
+        self.client = APIClient()
+
+    def test_build_document(self):
+        for name, is_first in (('side', False), ('main', True)):
+            image = Image.objects.create(image_id=uuid.uuid4(), image_webp=f'products/{name}.webp', image_crop=f'products/{name}.webp')
+            ProductImage.objects.create(product=self.products[0], image=image, is_first=is_first)
+        with self.assertNumQueries(5):
+            ProductDocument.build(self.products)
+        data = ProductDocument.objects.get(product=self.products[0]).data
+        self.assertEqual([url.rsplit('/', 1)[-1] for url in data['images']], ['main.webp', 'side.webp'])
+        self.assertEqual(data['brand']['title'], 'Bosch')
+        self.assertEqual(data['manufacturer']['country'], 'Германия')
+        self.assertEqual(data['category']['category_name'], 'Электроинструмент')
+        self.assertEqual(
+            [(attribute['name'], attribute['type'], attribute['value']) for attribute in data['attributes']],
+            [('Мощность', 'int', 750), ('Цвет', 'str', 'синий'), ('Реверс', 'bool', True)],
+        )
+
+    def test_list_and_detail_served_from_documents(self):
+        ProductDocument.build(self.products)
+        # первая страница: оценка количества, точный COUNT(*) для маленькой таблицы и выборка страницы с документами
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/products/', {'cursor': '', 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(len(response.data['results'][0]['attributes']), 3)
+
+        # следующие страницы количество не считают
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'])
+        self.assertIsNone(response.data['count'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/products/{self.products[0].id}/')
+        self.assertEqual(response.data['title'], 'Дрель 0')
+
+    def test_rebuild_on_data_type_and_choice_change(self):
+        ProductDocument.build(self.products)
+        with mock.patch.object(rebuild_product_documents, 'delay', side_effect=rebuild_product_documents):
+            with self.captureOnCommitCallbacks(execute=True):
+                power = IntType.objects.get(name='Мощность')
+                power.value = 900
+                power.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                choice = StrTypeChoice.objects.get(name='синий')
+                choice.name = 'голубой'
+                choice.save()
+        for document in ProductDocument.objects.all():
+            values = {attribute['name']: attribute['value'] for attribute in document.data['attributes']}
+            self.assertEqual((values['Мощность'], values['Цвет']), (900, 'голубой'))
+
+    def test_missing_document_is_built(self):
+        response = self.client.get(f'/api/v1/products/{self.products[1].id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(ProductDocument.objects.filter(product=self.products[1]).exists())
+
+    def test_rebuild_on_brand_change(self):
+        ProductDocument.build(self.products)
+        with mock.patch.object(rebuild_product_documents, 'delay', side_effect=rebuild_product_documents):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.brand.title = 'DeWalt'
+                self.brand.save()
+        titles = {document.data['brand']['title'] for document in ProductDocument.objects.all()}
+        self.assertEqual(titles, {'DeWalt'})
+
+    def test_rebuild_on_product_image_change(self):
+        ProductDocument.build(self.products)
+        image = Image.objects.create(image_id=uuid.uuid4(), image_webp='products/main.webp', image_crop='products/main.webp')
+        with mock.patch.object(rebuild_product_documents, 'delay', side_effect=rebuild_product_documents):
+            with self.captureOnCommitCallbacks(execute=True):
+                product_image = ProductImage.objects.create(product=self.products[0], image=image, is_first=True)
+            self.assertEqual(len(ProductDocument.objects.get(product=self.products[0]).data['images']), 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                image.image_webp = 'products/other.webp'
+                image.save()
+            self.assertTrue(ProductDocument.objects.get(product=self.products[0]).data['images'][0].endswith('other.webp'))
+            with self.captureOnCommitCallbacks(execute=True):
+                product_image.delete()
+        self.assertEqual(ProductDocument.objects.get(product=self.products[0]).data['images'], [])
+
+
+class ProductsCategoryTreeTest(TestCase):
+    def setUp(self):
+        electronics = ProductsCategory.add_root(category_name='Электроника')
+        electronics.add_child(category_name='Телефоны').add_child(category_name='Смартфоны')
+        ProductsCategory.add_root(category_name='Инструменты')
+        self.electronics, self.phones, self.smartphones, self.tools = (
+            ProductsCategory.objects.get(category_name=name)
+            for name in ('Электроника', 'Телефоны', 'Смартфоны', 'Инструменты')
+        )
+        self.client = APIClient()
+
+    @staticmethod
+    def names(tree):
+        return {node['category_name']: ProductsCategoryTreeTest.names(node['children']) for node in tree}
+
+    def test_get_tree_is_cached(self):
+        with self.assertNumQueries(1):
+            tree = ProductsCategory.get_tree()
+        self.assertEqual(self.names(tree), {
+            'Электроника': {'Телефоны': {'Смартфоны': {}}},
+            'Инструменты': {},
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(ProductsCategory.get_tree(), tree)
+
+    def test_tree_invalidated_on_add_move_delete(self):
+        ProductsCategory.get_tree()
+        self.tools.add_child(category_name='Дрели')
+        self.assertEqual(self.names(ProductsCategory.get_tree())['Инструменты'], {'Дрели': {}})
+
+        ProductsCategory.objects.move(self.smartphones, self.tools, 'sorted-child')
+        self.assertEqual(self.names(ProductsCategory.get_tree()), {
+            'Электроника': {'Телефоны': {}},
+            'Инструменты': {'Дрели': {}, 'Смартфоны': {}},
+        })
+
+        ProductsCategory.objects.get(pk=self.phones.pk).delete()
+        self.assertEqual(self.names(ProductsCategory.get_tree())['Электроника'], {})
+
+    def test_category_list(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.smartphones.get_category_list(), [self.electronics, self.phones, self.smartphones])
+
+    def test_tree_endpoint(self):
+        response = self.client.get('/api/v1/products/categories/tree/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(response.data)['Электроника'], {'Телефоны': {'Смартфоны': {}}})
+
+        response = self.client.get(f'/api/v1/products/categories/{self.smartphones.id}/breadcrumbs/')
+        self.assertEqual([category['id'] for category in response.data], [self.electronics.id, self.phones.id, self.smartphones.id])
+
+
+class ProductCategoryTreeFilterTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        electronics = ProductsCategory.add_root(category_name='Электроника')
+        electronics.add_child(category_name='Телефоны').add_child(category_name='Смартфоны')
+        ProductsCategory.add_root(category_name='Инструменты')
+        self.categories = {category.category_name: category for category in ProductsCategory.objects.all()}
+        self.products = {
+            name: Product.objects.create(part_number=name, title=name, brand=brand, category=category)
+            for name, category in self.categories.items()
+        }
+        self.client = APIClient()
+
+    def filter(self, category_id):
+        response = self.client.get('/api/v1/products/', {'category_tree': category_id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {product['title'] for product in response.data['results']}
+
+    def test_category_tree_filter(self):
+        self.assertEqual(self.filter(self.categories['Электроника'].id), {'Электроника', 'Телефоны', 'Смартфоны'})
+        self.assertEqual(self.filter(self.categories['Телефоны'].id), {'Телефоны', 'Смартфоны'})
+        self.assertEqual(self.filter(self.categories['Инструменты'].id), {'Инструменты'})
+        self.assertEqual(self.filter(0), set())
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_category_filter', nodes=50, branching=5, products=200, repeat=1, stdout=out)
+        self.assertIn('префикс пути', out.getvalue())
+        self.assertEqual(ProductsCategory.objects.count(), len(self.categories))
+
+
+class ProductShippingFilterTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        dimensions = {
+            'Флешка': (5, 2, 1, 0.01),
+            'Дрель': (30, 25, 10, 1.8),
+            'Пылесос': (50, 40, 40, 6),
+            'Диван': (200, 90, 80, 60),
+            'Без размеров': (None, None, None, None),
+        }
+        self.products = {
+            title: Product.objects.create(part_number=title, title=title, brand=brand, length=length, width=width, depth=depth, weight=weight)
+            for title, (length, width, depth, weight) in dimensions.items()
+        }
+        self.client = APIClient()
+
+    def filter(self, params):
+        response = self.client.get('/api/v1/products/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {product['title'] for product in response.data['results']}
+
+    def test_generated_columns(self):
+        drill = Product.objects.get(pk=self.products['Дрель'].pk)
+        self.assertAlmostEqual(drill.volume, 0.0075)
+        self.assertAlmostEqual(drill.volumetric_weight, 1.5)
+        self.assertEqual(
+            dict(Product.objects.values_list('title', 'shipping_class')),
+            {'Флешка': 'small', 'Дрель': 'small', 'Пылесос': 'large', 'Диван': 'oversized', 'Без размеров': None},
+        )
+
+        drill.weight = 2.5
+        drill.save()
+        self.assertEqual(Product.objects.get(pk=drill.pk).shipping_class, Product.ShippingClass.MEDIUM)
+
+    def test_range_and_shipping_class_filters(self):
+        self.assertEqual(self.filter({'volume_max': 0.1, 'weight_max': 5}), {'Флешка', 'Дрель'})
+        self.assertEqual(self.filter({'volumetric_weight_min': 10}), {'Пылесос', 'Диван'})
+        self.assertEqual(self.filter({'shipping_class': ['large', 'oversized']}), {'Пылесос', 'Диван'})
+
+    def test_range_filter_uses_index(self):
+        queryset = Product.objects.filter(volume__lte=0.1, weight__lte=5)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertRegex(plan, 'products_product_(volume|weight)_idx')
+
+
+class ProductsCategoryFacetsTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        tools = ProductsCategory.add_root(category_name='Инструменты')
+        tools.add_child(category_name='Дрели')
+        self.tools = ProductsCategory.objects.get(category_name='Инструменты')
+        drills = ProductsCategory.objects.get(category_name='Дрели')
+        self.products = [
+            Product.objects.create(part_number=f'P{index}', title=f'Дрель {index}', brand=brand, category=category)
+            for index, category in enumerate((self.tools, drills, drills))
+        ]
+        for product, color, power, wifi in zip(self.products, ('красный', 'красный', 'синий'), (500, 900, 1500), (True, False, False)):
+            add_attribute(product, StrType.objects.create(name='Цвет'))
+            StrTypeChoice.objects.get_or_create(name=color)
+            product.attributes.last().data_type.strtype.value.set(StrTypeChoice.objects.filter(name=color))
+            add_attribute(product, IntType.objects.create(name='Мощность', value=power))
+            add_attribute(product, BoolType.objects.create(name='Wi-Fi', value=wifi))
+        self.client = APIClient()
+
+    @staticmethod
+    def facets(filters):
+        return {(facet['name'], facet['type']): facet for facet in filters['facets']}
+
+    def test_generate_filters(self):
+        filters = self.tools.generate_filters()
+        facets = self.facets(filters)
+        self.assertEqual(filters['count'], 3)
+        self.assertEqual(facets['Цвет', 'str']['values'], [{'value': 'красный', 'count': 2}, {'value': 'синий', 'count': 1}])
+        self.assertEqual((facets['Wi-Fi', 'bool']['true'], facets['Wi-Fi', 'bool']['false']), (1, 2))
+        power = facets['Мощность', 'int']
+        self.assertEqual((power['min'], power['max']), (500, 1500))
+        self.assertEqual(len(power['histogram']), Attribute.FACET_HISTOGRAM_BINS)
+        self.assertEqual(sum(bucket['count'] for bucket in power['histogram']), 3)
+        self.assertEqual((power['histogram'][0]['count'], power['histogram'][-1]['count']), (1, 1))
+
+    def test_selection_keeps_alternatives_of_selected_attribute(self):
+        filters = self.tools.generate_filters({'Цвет': {'in': ['красный']}, 'Мощность': {'gte': 600}})
+        facets = self.facets(filters)
+        self.assertEqual(filters['count'], 1)
+        self.assertEqual(facets['Цвет', 'str']['values'], [{'value': 'красный', 'count': 1}, {'value': 'синий', 'count': 1}])
+        self.assertEqual((facets['Мощность', 'int']['min'], facets['Мощность', 'int']['max']), (500, 900))
+        self.assertEqual((facets['Wi-Fi', 'bool']['true'], facets['Wi-Fi', 'bool']['false']), (0, 1))
+
+    def test_filters_cached_and_invalidated_on_attribute_write(self):
+        self.tools.generate_filters()
+        with self.assertNumQueries(0):
+            self.tools.generate_filters()
+        add_attribute(self.products[0], BoolType.objects.create(name='Аккумулятор', value=True))
+        self.assertIn(('Аккумулятор', 'bool'), self.facets(self.tools.generate_filters()))
+
+    def test_facets_endpoint(self):
+        response = self.client.get(
+            f'/api/v1/products/categories/{self.tools.id}/facets/',
+            {'attr.Цвет': 'синий,красный', 'attr.Wi-Fi': 'нет'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(f'/api/v1/products/categories/{self.tools.id}/facets/', {'attr.Мощность__gte': 'много'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductAttributeFilterTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        self.products = [
+            Product.objects.create(part_number=f'P{index}', title=f'Ноутбук {index}', brand=brand)
+            for index in range(3)
+        ]
+        colors = {name: StrTypeChoice.objects.create(name=name) for name in ('красный', 'синий')}
+        for product, color, weight, wifi in zip(self.products, ('красный', 'синий', 'красный'), (1.2, 2.5, 3), (True, True, False)):
+            data_type = StrType.objects.create(name='Цвет')
+            data_type.value.set((colors[color],))
+            add_attribute(product, data_type)
+            add_attribute(product, FloatType.objects.create(name='Вес', value=weight))
+            add_attribute(product, BoolType.objects.create(name='Wi-Fi', value=wifi))
+        self.client = APIClient()
+
+    def filter(self, params):
+        response = self.client.get('/api/v1/products/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(product['id'] for product in response.data['results'])
+
+    def test_filter_products_by_attributes(self):
+        ids = [product.id for product in self.products]
+        self.assertEqual(self.filter({'attr.Вес__gte': '2'}), ids[1:])
+        self.assertEqual(self.filter({'attr.Вес__gte': '1', 'attr.Вес__lte': '2,5'}), ids[:2])
+        self.assertEqual(self.filter({'attr.Цвет': 'синий,красный', 'attr.Wi-Fi': 'да'}), ids[:2])
+        self.assertEqual(self.filter({'attr.Цвет': 'зеленый'}), [])
+        self.assertEqual(self.filter({'attr.Вес': '3'}), ids[2:])
+
+    def test_schema_errors(self):
+        for params in ({'attr.Экран': '15'}, {'attr.Цвет__gte': '1'}, {'attr.Вес__gt': '1'}, {'attr.Вес__lte': 'много'}):
+            response = self.client.get('/api/v1/products/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_plan_cached_per_normalized_query(self):
+        self.filter({'attr.Цвет': 'синий,красный', 'attr.Вес__gte': '1'})
+        with CaptureQueriesContext(connection) as queries:
+            self.filter({'attr.Вес__gte': '1.0', 'attr.Цвет': 'красный, синий'})
+        self.assertFalse(any('attributes_attributename' in query['sql'] for query in queries.captured_queries))
+        self.assertTrue(any('attributes_attributevalue' in query['sql'] for query in queries.captured_queries))
+
+        add_attribute(self.products[0], FloatType.objects.create(name='Диагональ', value=14))
+        self.assertEqual(self.filter({'attr.Диагональ__gte': '13'}), [self.products[0].id])
+
+
+class ProductSetAttributesTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        self.products = [Product.objects.create(part_number=f'P{index}', title=f'Товар {index}', brand=brand) for index in range(2)]
+        self.unit = Unit.objects.create(name='ватт', name_many='ватты', symbol='Вт')
+        resolver.clear()
+        self.addCleanup(resolver.clear)
+        self.client = APIClient()
+
+    @staticmethod
+    def get_mapping(product, count):
+        mapping = {}
+        for index in range(count):
+            mapping[f'Мощность {index}'] = (f'{product.id * 100 + index} ватт', 'Питание')
+            mapping[f'Цвет {index}'] = f'цвет {product.id}-{index}'
+            mapping[f'Вес {index}'] = f'{index}.5'
+            mapping[f'Wi-Fi {index}'] = 'да'
+        return mapping
+
+    def test_constant_number_of_queries(self):
+        self.products[0].set_attributes({'Напряжение': '220 ватт'})
+        counts = []
+        for product, count in zip(self.products, (1, 10)):
+            with CaptureQueriesContext(connection) as queries:
+                attributes = product.set_attributes(self.get_mapping(product, count))
+            self.assertEqual(len(attributes), count * 4)
+            counts.append(len(queries.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+        values = Attribute.get_values_for_objects(Product, (self.products[1].id,))[self.products[1].id]
+        power = next(value for value in values if value['name'] == 'Мощность 3')
+        self.assertEqual((power['value'], power['unit'], power['category']), (self.products[1].id * 100 + 3, 'Вт', 'Питание'))
+        self.assertEqual(
+            AttributeValue.objects.filter(object_id=self.products[1].id).count(),
+            Attribute.objects.filter(object_id=self.products[1].id).count(),
+        )
+
+    def test_replacement_constant_number_of_queries(self):
+        product = self.products[0]
+        product.set_attributes({'Напряжение': '220 ватт'})
+        counts = []
+        for count in (1, 10):
+            product.set_attributes(self.get_mapping(product, count))
+            with CaptureQueriesContext(connection) as queries:
+                attributes = product.set_attributes(self.get_mapping(product, count))
+            self.assertEqual(len(attributes), count * 4)
+            counts.append(len(queries.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Attribute.objects.filter(object_id=product.id).count(), 41)
+
+    def test_replacement_schedules_single_rebuild(self):
+        product = self.products[0]
+        product.set_attributes(self.get_mapping(product, 5))
+        with mock.patch.object(rebuild_product_documents, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.set_attributes(self.get_mapping(product, 5))
+        delay.assert_called_once_with({'pk': product.id})
+
+    def test_replaces_only_given_names(self):
+        product = self.products[0]
+        product.set_attributes({'Цвет': 'красный', 'Мощность': '500 ватт'})
+        color = Attribute.objects.get(object_id=product.id, data_type__name='Цвет').data_type
+        self.products[1].set_attributes({'Цвет': 'Красный'})
+        self.assertEqual(Attribute.objects.get(object_id=self.products[1].id).data_type_id, color.pk)
+
+        product.set_attributes({'Цвет': 'синий'})
+        values = {value['name']: value['value'] for value in Attribute.get_values_for_objects(Product, (product.id,))[product.id]}
+        self.assertEqual(values, {'Цвет': 'синий', 'Мощность': 500})
+        self.assertEqual(AttributeValue.objects.filter(object_id=product.id).count(), 2)
+        self.assertEqual(Attribute.filter_objects(Product.objects.all(), {'Цвет': {'in': ['синий']}}).get(), product)
+
+    def test_set_attribute_after_set_attributes(self):
+        self.products[0].set_attributes({'Цвет': 'красный'})
+        self.products[1].set_attributes({'Цвет': 'синий'})
+
+        self.products[0].set_attribute('Цвет', 'зеленый', 'Внешний вид')
+        self.products[0].set_attribute('Цвет', 'Синий', 'Внешний вид')
+        values = Attribute.get_values_for_objects(Product, [product.id for product in self.products])
+        self.assertEqual(sorted(value['value'] for value in values[self.products[0].id]), ['зеленый', 'красный', 'синий'])
+        self.assertEqual([value['value'] for value in values[self.products[1].id]], ['синий'])
+        self.assertEqual(StrType.objects.filter(name='Цвет').count(), 3)
+
+    def test_attributes_endpoint(self):
+        url = f'/api/v1/products/{self.products[0].id}/attributes/'
+        payload = {'attributes': [{'name': 'Цвет', 'value': 'красный'}, {'name': 'Мощность', 'value': '900 ватт', 'category': 'Питание'}]}
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(User.objects.create_superuser('admin@test.py', 'password'))
+        with mock.patch.object(rebuild_product_documents, 'delay', side_effect=rebuild_product_documents) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        delay.assert_called_once_with({'pk': self.products[0].id})
+        self.assertEqual({value['name']: value['value'] for value in response.data}, {'Цвет': 'красный', 'Мощность': 900})
+        self.assertEqual(len(ProductDocument.objects.get(product=self.products[0]).data['attributes']), 2)
+
+        payload['attributes'].append({'name': 'Цвет', 'value': 'синий'})
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SparseFieldsTest(TestCase):
+    def setUp(self):
+        self.brand = Brand.objects.create(title="Test Brand")
+        country = Country.objects.create(title='Германия')
+        manufacturer = Manufacturer.objects.create(title='Завод', brand=self.brand, country=country)
+        self.product = Product.objects.create(
+            part_number='P1', title='Дрель', description='Длинное описание', brand=self.brand, manufacturer=manufacturer,
+        )
+        self.client = APIClient()
+
+    def test_fields_prune_payload_and_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/products/', {'fields': 'id,title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{'id': self.product.id, 'title': 'Дрель'}])
+        self.assertFalse(any('description' in query['sql'] for query in queries.captured_queries))
+
+    def test_expand_related(self):
+        response = self.client.get(f'/api/v1/products/{self.product.id}/', {'fields': 'title', 'expand': 'brand,manufacturer'})
+        self.assertEqual(set(response.data), {'title', 'brand', 'manufacturer'})
+        self.assertEqual(response.data['brand']['title'], 'Test Brand')
+        self.assertEqual(response.data['manufacturer']['title'], 'Завод')
+        self.assertEqual(response.data['manufacturer']['brand'], self.brand.id)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/products/{self.product.id}/', {'expand': 'brand'})
+        self.assertEqual(response.data['brand']['id'], self.brand.id)
+        self.assertEqual(response.data['manufacturer'], self.product.manufacturer_id)
+
+    def test_brand_and_manufacturer_fields(self):
+        response = self.client.get('/api/v1/products/brands/', {'fields': 'title'})
+        self.assertEqual(response.data['results'], [{'title': 'Test Brand'}])
+
+        response = self.client.get('/api/v1/products/manufacturers/', {'expand': 'country', 'fields': 'id,country'})
+        self.assertEqual(response.data['results'][0]['country']['title'], 'Германия')
+
+
+class ProductCounterTest(TestCase):
+    def setUp(self):
+        self.brand = Brand.objects.create(title="Test Brand")
+        self.other_brand = Brand.objects.create(title="Other Brand")
+        country = Country.objects.create(title='Германия')
+        self.manufacturer = Manufacturer.objects.create(title='Завод', brand=self.brand, country=country)
+        self.drills = ProductsCategory.add_root(category_name='Дрели')
+        self.saws = ProductsCategory.add_root(category_name='Пилы')
+        self.products = [
+            Product.objects.create(part_number=f'P{index}', title=f'Товар {index}', brand=self.brand, manufacturer=self.manufacturer, category=category)
+            for index, category in enumerate((self.drills, self.drills, self.saws))
+        ]
+        self.client = APIClient()
+
+    def get_brands(self):
+        response = self.client.get('/api/v1/products/brands/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {brand['id']: (brand['product_count'], brand['category_count']) for brand in response.data['results']}
+
+    def test_counters_follow_create_move_and_delete(self):
+        self.assertEqual(self.get_brands(), {self.brand.id: (3, 2), self.other_brand.id: (0, 0)})
+
+        self.products[2].category = self.drills
+        self.products[2].save()
+        self.products[0].brand = self.other_brand
+        self.products[0].save()
+        self.assertEqual(self.get_brands(), {self.brand.id: (2, 1), self.other_brand.id: (1, 1)})
+
+        self.products[1].delete()
+        self.assertEqual(self.get_brands()[self.brand.id], (1, 1))
+
+        self.drills.delete()
+        self.assertEqual(self.get_brands(), {self.brand.id: (0, 0), self.other_brand.id: (0, 0)})
+
+    def test_manufacturers_listing(self):
+        response = self.client.get('/api/v1/products/manufacturers/')
+        manufacturer = response.data['results'][0]
+        self.assertEqual(
+            (manufacturer['product_count'], manufacturer['category_count'], manufacturer['country_title']),
+            (3, 2, 'Германия'),
+        )
+
+    def test_listing_cached(self):
+        self.get_brands()
+        with self.assertNumQueries(0):
+            self.get_brands()
+        Product.objects.create(part_number='P9', title='Товар 9', brand=self.other_brand)
+        self.assertEqual(self.get_brands()[self.other_brand.id], (1, 0))
+
+    def test_rebuild(self):
+        ProductCounter.objects.update(count=0)
+        call_command('rebuild_product_counters', stdout=StringIO())
+        self.assertEqual(
+            set(ProductCounter.objects.values_list('brand_id', 'category_id', 'count')),
+            {(self.brand.id, self.drills.id, 2), (self.brand.id, self.saws.id, 1)},
+        )
+
+
+class ProductExportTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        self.products = [
+            Product.objects.create(part_number=f'P{index}', title=f'Дрель {index}', description='Строка 1\nСтрока 2', brand=brand)
+            for index in range(3)
+        ]
+        for product, power in zip(self.products, (500, 900)):
+            Attribute.objects.create(
+                content_type=ContentType.objects.get_for_model(Product),
+                object_id=product.id,
+                data_type=IntType.objects.create(name='Мощность', value=power),
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser(email='admin@test.py', password='password'))
+
+    def test_export_rows_batch_attributes(self):
+        with self.assertNumQueries(3):
+            rows = list(Product.get_export_rows(Product.objects.all(), chunk_size=2))
+        self.assertEqual([row['id'] for row in rows], [product.id for product in self.products])
+        self.assertEqual([row['attributes'] for row in rows], [{'Мощность': '500'}, {'Мощность': '900'}, {}])
+        self.assertEqual(rows[0]['brand'], 'Test Brand')
+
+    def test_export_csv_endpoint(self):
+        response = self.client.get('/api/v1/products/export/', {'title': 'Дрель 1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][-1], 'attr:Мощность')
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[1][2], rows[1][3], rows[1][-1]), ('Дрель 1', 'Строка 1\nСтрока 2', '900'))
+
+    def test_export_ndjson_endpoint(self):
+        response = self.client.get('/api/v1/products/export/', {'file_format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['part_number'] for row in rows], ['P0', 'P1', 'P2'])
+
+        self.assertEqual(self.client.get('/api/v1/products/export/', {'file_format': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(APIClient().get('/api/v1/products/export/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_products', '--format', 'ndjson', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProductImportTest(TestCase):
+    CSV = (
+        'part_number,title,description,brand,manufacturer,category,length,width,depth,weight,attr:Мощность,attr:Цвет,attr:Wi-Fi\n'
+        'P1,Дрель ударная,,Макита,,Дрели,1,2,3,1.5,500 ватт,Красный,да\n'
+        'P2,Дрель,,макита,,,,,,,500 ватт,синий,\n'
+        'P3,,,Макита,,,,,,,,,\n'
+        'P4,Шуруповерт,,Bosch,,Неизвестная,,,,,,,\n'
+        'P5,Шуруповерт,,Bosch,,,,,,abc,,,\n'
+        'P6,Перфоратор,,Bosch,,,,,,,900 ватт,красный,нет\n'
+    )
+
+    def setUp(self):
+        Brand.objects.create(title='Макита')
+        ProductsCategory.add_root(category_name='Дрели')
+        Unit.objects.create(name='ватт', name_many='ватты', symbol='Вт')
+
+    def create_import(self, content=CSV, file_format='csv'):
+        return ProductImport.objects.create(file=ContentFile(content.encode(), name=f'catalog.{file_format}'), file_format=file_format)
+
+    def test_import_csv(self):
+        product_import = ProductImporter(self.create_import(), chunk_size=4).run()
+        self.assertEqual(product_import.status, ProductImport.Status.DONE)
+        self.assertEqual((product_import.processed, product_import.created_products, product_import.failed_rows), (6, 3, 3))
+        self.assertEqual(ProductCounter.objects.aggregate(total=Sum('count'))['total'], Product.objects.count())
+        self.assertEqual([error['row'] for error in product_import.errors], [3, 4, 5])
+        self.assertEqual(product_import.created_attributes, 8)
+
+        products = {product.part_number: product for product in Product.objects.select_related('brand', 'category')}
+        self.assertEqual(set(products), {'P1', 'P2', 'P6'})
+        self.assertEqual(Brand.objects.filter(title__iexact='макита').count(), 1)
+        self.assertEqual(products['P1'].category.category_name, 'Дрели')
+        self.assertEqual(products['P1'].weight, 1.5)
+        self.assertTrue(Product.objects.filter(search_vector='ударная').exists())
+
+        values = Attribute.get_values_for_objects(Product, [products['P1'].pk, products['P2'].pk])
+        self.assertEqual(
+            {value['name']: (value['value'], value['unit']) for value in values[products['P1'].pk]},
+            {'Мощность': (500, 'Вт'), 'Цвет': ('красный', None), 'Wi-Fi': (True, None)},
+        )
+        power = [value['id'] for value in values[products['P1'].pk] + values[products['P2'].pk] if value['name'] == 'Мощность']
+        self.assertEqual(Attribute.objects.filter(pk__in=power).values('data_type').distinct().count(), 1)
+        self.assertEqual(StrTypeChoice.objects.filter(name='красный').count(), 1)
+
+        products['P2'].set_attribute('Цвет', 'зеленый', 'Внешний вид')
+        products['P2'].set_attribute('Цвет', 'красный', 'Внешний вид')
+        values = Attribute.get_values_for_objects(Product, [products['P1'].pk, products['P2'].pk])
+        self.assertEqual(sorted(value['value'] for value in values[products['P2'].pk] if value['name'] == 'Цвет'), ['зеленый', 'красный', 'синий'])
+        self.assertEqual([value['value'] for value in values[products['P1'].pk] if value['name'] == 'Цвет'], ['красный'])
+        self.assertEqual(StrType.objects.filter(name='Цвет').count(), 3)
+
+    def test_invalid_attributes_and_ambiguous_categories_fail_rows(self):
+        drills = ProductsCategory.objects.get(category_name='Дрели')
+        drills.add_child(category_name='Аккумуляторные')
+        ProductsCategory.add_root(category_name='Садовые').add_child(category_name='Аккумуляторные')
+        nested = drills.get_children().get()
+        long_name, long_value = 'А' * 101, 'б' * 101
+        content = (
+            f'part_number,title,brand,category,attr:{long_name},attr:Цвет,attr:Длина\n'
+            'P1,Дрель,Макита,Аккумуляторные,,,\n'
+            f'P2,Дрель,Макита,{nested.id},,,\n'
+            'P3,Дрель,Макита,,1,,\n'
+            f'P4,Дрель,Макита,,,{long_value},\n'
+            'P5,Дрель,Макита,,,,99999999999\n'
+            'P6,Дрель,Макита,,,красный,10\n'
+        )
+        product_import = ProductImporter(self.create_import(content), chunk_size=10).run()
+        self.assertEqual(product_import.status, ProductImport.Status.DONE)
+        self.assertEqual((product_import.created_products, product_import.failed_rows), (2, 4))
+        self.assertEqual([error['row'] for error in product_import.errors], [1, 3, 4, 5])
+        self.assertIn('неоднозначно', product_import.errors[0]['error'])
+        self.assertEqual(Product.objects.get(part_number='P2').category, nested)
+
+    def test_resume_after_failure(self):
+        product_import = self.create_import()
+        write_chunk = ProductImporter.write_chunk
+        calls = []
+
+        def fail_second_chunk(importer, parsed):
+            calls.append(parsed)
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            write_chunk(importer, parsed)
+
+        with mock.patch.object(ProductImporter, 'write_chunk', fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                ProductImporter(product_import, chunk_size=2).run()
+        product_import.refresh_from_db()
+        self.assertEqual((product_import.status, product_import.processed), (ProductImport.Status.FAILED, 2))
+
+        call_command('import_products', resume=product_import.pk, workers=0, stdout=StringIO())
+        product_import.refresh_from_db()
+        self.assertEqual((product_import.status, product_import.processed), (ProductImport.Status.DONE, 6))
+        self.assertEqual(sorted(Product.objects.values_list('part_number', flat=True)), ['P1', 'P2', 'P6'])
+
+    def test_import_ndjson_command_with_workers(self):
+        path = os.path.join(tempfile.mkdtemp(), 'catalog.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            for index in range(5):
+                file.write(json.dumps({'part_number': f'N{index}', 'title': 'Товар', 'brand': 'Макита', 'attributes': {'Вес': 2}}) + '\n')
+        out = StringIO()
+        call_command('import_products', path, workers=2, chunk_size=2, stdout=out)
+        self.assertIn('Обработано строк: 5', out.getvalue())
+        self.assertEqual(Product.objects.filter(attributes__data_type__name='Вес').count(), 5)
+
+    def test_import_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser(email='admin@test.py', password='password'))
+        with mock.patch.object(import_products, 'delay', side_effect=import_products), self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/v1/products/imports/', {
+                'file': SimpleUploadedFile('catalog.csv', self.CSV.encode()),
+                'file_format': 'csv',
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = client.get(f'/api/v1/products/imports/{response.data["id"]}/')
+        self.assertEqual((response.data['status'], response.data['created_products']), (ProductImport.Status.DONE, 3))
+        self.assertEqual(client.post(f'/api/v1/products/imports/{response.data["id"]}/resume/').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), FEED_CHUNK_SIZE=2)
+class ProductFeedTest(TestCase):
+    def setUp(self):
+        brand = Brand.objects.create(title="Test Brand")
+        tools = ProductsCategory.add_root(category_name='Инструменты')
+        tools.add_child(category_name='Дрели')
+        drills = ProductsCategory.objects.get(category_name='Дрели')
+        self.products = [
+            Product.objects.create(part_number=f'P{index}', title=f'Дрель <{index}>', brand=brand, category=drills, weight=1.5)
+            for index in range(5)
+        ]
+        Attribute.objects.create(
+            content_type=ContentType.objects.get_for_model(Product),
+            object_id=self.products[0].id,
+            data_type=BoolType.objects.create(name='Wi-Fi', value=True),
+        )
+        self.products[1].description = 'Ударная\x0b дрель\x01'
+        self.products[1].save()
+        self.price_list = PriceList.objects.create(title='Базовый')
+        for product in self.products[:4]:
+            PriceListItem.objects.create(price_list=self.price_list, product=product, price='1000.00')
+        now = timezone.now()
+        promo = Promo.objects.create(title='Скидка', discount='10', starts_at=now - timedelta(days=1), ends_at=now + timedelta(days=1))
+        promo.products.set((self.products[0],))
+        for name in ('main', 'side'):
+            image = Image.objects.create(image_id=uuid.uuid4(), image_webp=f'products/{name}.webp', image_crop=f'products/{name}.webp')
+            ProductImage.objects.create(product=self.products[0], image=image, is_first=name == 'main')
+        ProductDocument.build(self.products)
+
+    def test_generate_yml_and_google(self):
+        feed = ProductFeed.objects.create(name='yml')
+        self.assertEqual(len(feed.generate()), len({product.id // 2 for product in self.products}))
+        with feed.file.open('rb') as file:
+            root = ElementTree.parse(file).getroot()
+        offers = root.findall('shop/offers/offer')
+        self.assertEqual([offer.findtext('vendorCode') for offer in offers], [f'P{index}' for index in range(4)])
+        self.assertEqual(offers[0].findtext('name'), 'Дрель <0>')
+        self.assertEqual(offers[0].find('param').text, 'да')
+        self.assertEqual((offers[0].findtext('price'), offers[0].findtext('oldprice')), ('900.00', '1000.00'))
+        self.assertEqual((offers[1].findtext('price'), offers[1].findtext('oldprice')), ('1000.00', None))
+        self.assertEqual(offers[1].findtext('currencyId'), 'RUR')
+        self.assertEqual(offers[1].findtext('description'), 'Ударная дрель')
+        pictures = [picture.text for picture in offers[0].findall('picture')]
+        self.assertEqual([url.rsplit('/', 1)[-1] for url in pictures], ['main.webp', 'side.webp'])
+        self.assertTrue(all(url.startswith('http') for url in pictures))
+        self.assertEqual(offers[1].findall('picture'), [])
+        self.assertEqual(
+            {(category.get('id'), category.get('parentId')) for category in root.findall('shop/categories/category')},
+            {(str(category.id), str(category.get_parent().id) if category.get_parent() else None) for category in ProductsCategory.objects.all()},
+        )
+
+        feed = ProductFeed.objects.create(name='google')
+        feed.generate()
+        with feed.file.open('rb') as file:
+            items = ElementTree.parse(file).getroot().findall('channel/item')
+        self.assertEqual(items[0].findtext('{http://base.google.com/ns/1.0}product_type'), 'Инструменты > Дрели')
+        self.assertEqual(items[0].findtext('{http://base.google.com/ns/1.0}price'), '1000.00 RUB')
+        self.assertEqual(items[0].findtext('{http://base.google.com/ns/1.0}sale_price'), '900.00 RUB')
+        self.assertEqual(items[1].findtext('{http://base.google.com/ns/1.0}description'), 'Ударная дрель')
+        self.assertEqual(items[0].findtext('{http://base.google.com/ns/1.0}image_link'), pictures[0])
+        self.assertEqual(items[0].findtext('{http://base.google.com/ns/1.0}additional_image_link'), pictures[1])
+
+    def test_only_changed_chunks_regenerated(self):
+        feed = ProductFeed.objects.create(name='yml')
+        feed.generate()
+        etag = feed.etag
+        self.assertEqual(feed.generate(), [])
+        self.assertEqual(feed.etag, etag)
+
+        changed = self.products[3]
+        changed.title = 'Перфоратор'
+        changed.save()
+        ProductDocument.build((changed,))
+        self.assertEqual(feed.generate(), [changed.id // 2])
+        self.assertNotEqual(feed.etag, etag)
+
+        PriceListItem.objects.filter(product=self.products[1]).update(price='1100.00')
+        self.assertEqual(feed.generate(), [self.products[1].id // 2])
+
+        chunk = self.products[0].id // 2
+        self.products[0].delete()
+        remaining = [product for product in self.products[1:] if product.id // 2 == chunk]
+        self.assertEqual(feed.generate(), [chunk] if remaining else [])
+        self.assertEqual(str(chunk) in feed.chunks, bool(remaining))
+        with feed.file.open('rb') as file:
+            content = file.read().decode()
+        self.assertIn('Перфоратор', content)
+        self.assertNotIn('<vendorCode>P0</vendorCode>', content)
+
+    def test_feed_endpoint_with_etag(self):
+        generate_product_feeds()
+        client = APIClient()
+        response = client.get('/api/v1/products/feeds/yml/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'<yml_catalog', b''.join(response.streaming_content))
+
+        response = client.get('/api/v1/products/feeds/yml/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(client.get('/api/v1/products/feeds/unknown/').status_code, status.HTTP_404_NOT_FOUND)
@@ -1,13 +1,18 @@
 from django.urls import include, path
 from products.views import (BrandViewSet, ManufacturerViewSet,
-                            ProductsCategoryViewSet, ProductViewSet)
+                            ProductFeedViewSet, ProductImportViewSet,
+                            ProductsCategoryViewSet, ProductUniqueViewSet,
+                            ProductViewSet)
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
-router.register('', ProductViewSet, basename='warehouses')
-router.register('', BrandViewSet, basename='brands')
-router.register('', ProductsCategoryViewSet, basename='product-categories')
-router.register('', ManufacturerViewSet, basename='manufacturers')
+router.register('categories', ProductsCategoryViewSet, basename='product-categories')
+router.register('brands', BrandViewSet, basename='brands')
+router.register('manufacturers', ManufacturerViewSet, basename='manufacturers')
+router.register('feeds', ProductFeedViewSet, basename='product-feeds')
+router.register('imports', ProductImportViewSet, basename='product-imports')
+router.register('units', ProductUniqueViewSet, basename='product-units')
+router.register('', ProductViewSet, basename='products')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,37 +1,424 @@
+import hashlib
+
+from attributes.models import Attribute
+from core.cache import get_cache_version
+from core.pagination import KeysetPaginator
 from core.permissions import IsAdmin, IsModerator, IsOwner, ReadOnly
+from django.utils.cache import quote_etag
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, HttpResponseNotModified, StreamingHttpResponse
 from django_filters import rest_framework as filters
-from products.filters import ProductFilter
-from products.models import Brand, Manufacturer, Product, ProductsCategory
-from products.serializers import (BrandSerializer, ManufacturerSerializer,
+from products.filters import (AttributeFilterBackend, ProductFilter,
+                              get_attribute_selection)
+from products.feeds import FEED_FORMATS
+from products.models import (Brand, Manufacturer, Product, ProductCounter,
+                             ProductDocument, ProductFeed, ProductImport,
+                             ProductsCategory, ProductSimilarity,
+                             ProductUnique)
+from products.serializers import (BrandDirectorySerializer, BrandSerializer,
+                                  ManufacturerDirectorySerializer,
+                                  ManufacturerSerializer,
+                                  ProductAttributesSerializer,
                                   ProductsCategorySerializer,
-                                  ProductSerializer)
-from rest_framework import viewsets
+                                  ProductsCategoryTreeSerializer,
+                                  ProductImportSerializer, ProductSerializer,
+                                  ProductSuggestionSerializer,
+                                  StockSummarySerializer,
+                                  UnitCountSerializer, UnitMoveSerializer,
+                                  UnitReceiveSerializer)
+from products.tasks import import_products
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from warehouses.models import Warehouse
+
+
+class SparseFieldsViewSetMixin:
+    """
+    Миксин вьюсета для сериализаторов с `SparseFieldsMixin`.
+
+    Для списка и карточки ограничивает queryset полями из `?fields=` и связями из `?expand=`.
+    """
+    sparse_query_params = ('fields', 'expand')
 
+    def is_sparse_request(self) -> bool:
+        return any(self.request.query_params.get(param) for param in self.sparse_query_params)
 
-class ProductViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve') and self.is_sparse_request():
+            queryset = self.get_serializer_class().get_sparse_queryset(queryset, self.request)
+        return queryset
+
+
+class ProductViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     permission_classes = (IsOwner | IsModerator | IsAdmin | ReadOnly,)
     serializer_class = ProductSerializer
     queryset = Product.objects.all()
     filterset_class = ProductFilter
-    filter_backends = (filters.DjangoFilterBackend,)
+    filter_backends = (filters.DjangoFilterBackend, AttributeFilterBackend)
+    pagination_class = KeysetPaginator
+    estimate_count = True
+
+    suggest_min_length = 2
+    suggest_max_limit = 50
+    suggest_cache_timeout = 60 * 5
+
+    changes_max_limit = 10000
+
+    export_chunk_size = 2000
+    export_content_types = {
+        'csv': 'text/csv; charset=utf-8',
+        'ndjson': 'application/x-ndjson; charset=utf-8',
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            if not self.is_sparse_request():
+                queryset = queryset.select_related('document')
+            queryset = queryset.defer('search_vector')
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Список товаров из готовых документов `ProductDocument`.
+
+        С параметром `?outlet=` к документам добавляются итоговые цены магазина `price` и `base_price`.
+
+        С параметрами `?fields=` или `?expand=` товары сериализуются из ограниченного queryset.
+        """
+        if self.is_sparse_request():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_documents(page))
+        return Response(self.get_documents(queryset))
+
+    def get_documents(self, products) -> list:
+        """Документы товаров с ценами магазина, если они запрошены фильтром `?outlet=`."""
+        products = list(products)
+        documents = ProductDocument.get_data(products)
+        if not self.request.query_params.get('outlet'):
+            return documents
+        prices = {
+            product.pk: tuple(None if value is None else str(value) for value in (product.price, product.base_price))
+            for product in products
+        }
+        return [
+            {**document, 'price': prices[document['id']][0], 'base_price': prices[document['id']][1]}
+            for document in documents
+        ]
+
+    def retrieve(self, request, *args, **kwargs):
+        """Карточка товара из готового документа `ProductDocument` или, с `?fields=`/`?expand=`, из модели."""
+        if self.is_sparse_request():
+            return super().retrieve(request, *args, **kwargs)
+        product = self.get_object()
+        return Response(ProductDocument.get_data((product,))[0])
+
+    @action(methods=('POST',), detail=True, url_path='attributes', permission_classes=(IsAdmin | IsModerator,))
+    def set_attributes(self, request, pk=None):
+        """
+        Заменяет атрибуты товара набором `{"attributes": [{"name", "value", "category"}, ...]}`
+        за постоянное количество запросов и возвращает все атрибуты товара.
+        """
+        product = self.get_object()
+        serializer = ProductAttributesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product.set_attributes({
+            item['name']: (item['value'], item['category'])
+            for item in serializer.validated_data['attributes']
+        })
+        return Response(Attribute.get_values_for_objects(Product, (product.pk,)).get(product.pk, []))
+
+    @action(methods=('GET',), detail=False)
+    def suggest(self, request):
+        """
+        Подсказки по названию и артикулу товара: `?q=<запрос>&limit=<количество>`.
+
+        Ответы кешируются в Redis по нормализованному запросу, поэтому самые частые префиксы
+        отдаются без обращения к базе. Сохранение или удаление товара сбрасывает кеш подсказок.
+        """
+        query = ' '.join(request.query_params.get('q', '').split()).casefold()
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.suggest_max_limit)
+        except ValueError:
+            limit = 10
+        if len(query) < self.suggest_min_length or limit < 1:
+            return Response([])
+
+        cache_key = f'product_suggestions:{get_cache_version("product_suggestions")}:{limit}:{query}'
+        suggestions = cache.get(cache_key)
+        if suggestions is None:
+            suggestions = ProductSuggestionSerializer(Product.get_suggestions(query, limit), many=True).data
+            cache.set(cache_key, suggestions, self.suggest_cache_timeout)
+        return Response(suggestions)
+
+    @action(methods=('GET',), detail=False)
+    def changes(self, request):
+        """
+        Изменения каталога для синхронизации: `?since=<метка>&limit=<количество>`.
+
+        Возвращает идентификаторы измененных и удаленных товаров и метку `next` для следующего
+        запроса. Пока `has_more` истинно, изменения можно запрашивать сразу же.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', 1000)), self.changes_max_limit)
+        except ValueError:
+            limit = 1000
+        if limit < 1:
+            raise ValidationError({'limit': 'Количество должно быть положительным.'})
+        try:
+            changes = Product.get_changes(request.query_params.get('since'), limit)
+        except ValueError as error:
+            raise ValidationError({'since': str(error)})
+        return Response(changes)
+
+    @action(methods=('GET',), detail=False)
+    def compare(self, request):
+        """
+        Матрица сравнения товаров: `?ids=1,2,3`.
+
+        Строки — атрибуты, колонки — товары в порядке `ids`. Ответ кешируется по набору товаров.
+        """
+        try:
+            product_ids = list(dict.fromkeys(int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()))
+        except ValueError:
+            raise ValidationError({'ids': 'Идентификаторы товаров должны быть числами через запятую.'})
+        if not Product.COMPARISON_MIN_PRODUCTS <= len(product_ids) <= Product.COMPARISON_MAX_PRODUCTS:
+            raise ValidationError({
+                'ids': f'Сравнивать можно от {Product.COMPARISON_MIN_PRODUCTS} до {Product.COMPARISON_MAX_PRODUCTS} товаров.'
+            })
+        return Response(Product.get_comparison(product_ids))
+
+    @action(methods=('GET',), detail=False, permission_classes=(IsAdmin | IsModerator,))
+    def export(self, request):
+        """
+        Потоковая выгрузка каталога: `?file_format=csv|ndjson` и фильтры списка товаров.
+
+        Товары читаются серверным курсором, атрибуты подгружаются пачками, поэтому память
+        не растет с размером каталога.
+        """
+        export_format = request.query_params.get('file_format', 'csv')
+        if export_format not in Product.EXPORT_FORMATS:
+            raise ValidationError({'file_format': f'Допустимые форматы: {", ".join(Product.EXPORT_FORMATS)}.'})
+        queryset = self.filter_queryset(Product.objects.all())
+        response = StreamingHttpResponse(
+            Product.export(queryset, export_format, self.export_chunk_size),
+            content_type=self.export_content_types[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="products.{export_format}"'
+        return response
+
+    @action(methods=('GET',), detail=True)
+    def similar(self, request, pk=None):
+        """
+        Похожие товары из той же категории, посчитанные ночной задачей по атрибутам.
+
+        Похожие товары и их документы читаются одним запросом по индексу `(product, rank)`.
+        """
+        if not str(pk).isdigit():
+            raise Http404
+        similarities = list(
+            ProductSimilarity.objects
+            .filter(product_id=pk)
+            .select_related('similar__document')
+            .order_by('rank')
+        )
+        if not similarities and not Product.objects.filter(pk=pk).exists():
+            raise Http404
+        documents = ProductDocument.get_data([similarity.similar for similarity in similarities])
+        return Response([
+            {**document, 'similarity': similarity.score}
+            for similarity, document in zip(similarities, documents)
+        ])
 
-class ProductsCategoryViewSet(viewsets.ModelViewSet):
+    @action(methods=('GET',), detail=True)
+    def stock(self, request, pk=None):
+        """Остатки товара по складам и общий остаток."""
+        product = self.get_object()
+        serializer = StockSummarySerializer(product.get_stock_summary())
+        return Response(serializer.data)
+
+    @action(methods=('GET',), detail=False, url_path='stock')
+    def stock_list(self, request):
+        """Остатки по складам для страницы товаров."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        products = page if page is not None else queryset
+        summaries = Product.get_stock_summaries(products).values()
+        serializer = StockSummarySerializer(summaries, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class ProductsCategoryViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     permission_classes = (IsOwner | IsModerator | IsAdmin | ReadOnly,)
     serializer_class = ProductsCategorySerializer
     queryset = ProductsCategory.objects.all()
 
+    @action(methods=('GET',), detail=False)
+    def tree(self, request):
+        """Все дерево категорий, собранное из одного запроса и закешированное."""
+        return Response(ProductsCategoryTreeSerializer(ProductsCategory.get_tree(), many=True).data)
+
+    @action(methods=('GET',), detail=True)
+    def breadcrumbs(self, request, pk=None):
+        """Цепочка категорий от корня до текущей."""
+        category = self.get_object()
+        return Response(ProductsCategorySerializer(category.get_category_list(), many=True).data)
+
+    @action(methods=('GET',), detail=True)
+    def facets(self, request, pk=None):
+        """Фасеты по атрибутам товаров категории с учетом параметров `attr.*`."""
+        category = self.get_object()
+        return Response(category.generate_filters(get_attribute_selection(request.query_params)))
+
+
+class ProductCounterViewSetMixin:
+    """
+    Миксин вьюсета брендов и производителей со счетчиками товаров.
 
-class ManufacturerViewSet(viewsets.ModelViewSet):
+    Список и карточка аннотируются `ProductCounter.annotate()` и сериализуются
+    `directory_serializer_class`. Ответ списка кешируется по параметрам запроса
+    под версией `product_counters`, которая увеличивается при изменении счетчиков.
+    """
+    directory_serializer_class = None
+    directory_cache_timeout = 60 * 60
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return self.directory_serializer_class
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = ProductCounter.annotate(queryset).order_by('pk')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        query_hash = hashlib.md5(request.query_params.urlencode().encode()).hexdigest()
+        cache_key = f'product_directory:{get_cache_version("product_counters")}:{self.basename}:{query_hash}'
+        data = cache.get(cache_key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(cache_key, data, self.directory_cache_timeout)
+        return Response(data)
+
+
+class ManufacturerViewSet(ProductCounterViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     permission_classes = (IsOwner | IsModerator | IsAdmin | ReadOnly,)
     serializer_class = ManufacturerSerializer
-    queryset = Manufacturer.objects.all()
+    directory_serializer_class = ManufacturerDirectorySerializer
+    queryset = Manufacturer.objects.select_related('country')
 
 
-class BrandViewSet(viewsets.ModelViewSet):
+class BrandViewSet(ProductCounterViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     permission_classes = (IsOwner | IsModerator | IsAdmin | ReadOnly,)
     serializer_class = BrandSerializer
+    directory_serializer_class = BrandDirectorySerializer
     queryset = Brand.objects.all()
+
+
+class ProductImportViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Загрузки каталога: создание с файлом запускает задачу `import_products`,
+    ход загрузки виден в полях `processed`, `created_products` и `errors`.
+    """
+    permission_classes = (IsAdmin | IsModerator,)
+    serializer_class = ProductImportSerializer
+    queryset = ProductImport.objects.order_by('-id')
+
+    def perform_create(self, serializer):
+        product_import = serializer.save(owner=self.request.user)
+        transaction.on_commit(lambda: import_products.delay(product_import.pk))
+
+    @action(methods=('POST',), detail=True)
+    def resume(self, request, pk=None):
+        """Продолжает незавершенную загрузку с первой необработанной строки."""
+        product_import = self.get_object()
+        if product_import.status == ProductImport.Status.DONE:
+            raise ValidationError({'status': 'Загрузка уже завершена.'})
+        transaction.on_commit(lambda: import_products.delay(product_import.pk))
+        return Response(self.get_serializer(product_import).data)
+
+
+class ProductUniqueViewSet(viewsets.GenericViewSet):
+    """
+    Массовые операции с единицами товара: оприходование и перемещение через `COPY`
+    и остатки по частичному индексу непроданных единиц.
+    """
+    permission_classes = (IsAdmin | IsModerator,)
+    queryset = ProductUnique.objects.all()
+
+    @action(methods=('POST',), detail=False)
+    def receive(self, request):
+        """Оприходует единицы товара `{"units": [{"product", "warehouse", "serial", "barcode"}, ...]}`."""
+        serializer = UnitReceiveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rows = (
+            (unit['product'], unit['warehouse'], unit['serial'], unit['barcode'])
+            for unit in serializer.validated_data['units']
+        )
+        try:
+            received = ProductUnique.receive_bulk(rows)
+        except IntegrityError:
+            raise ValidationError({'units': 'Несуществующий товар или склад либо повтор серийного номера.'})
+        return Response({'received': received})
+
+    @action(methods=('POST',), detail=False)
+    def move(self, request):
+        """Перемещает единицы товара `{"warehouse", "by": "id" | "serial" | "barcode", "values": [...]}`."""
+        serializer = UnitMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        warehouse = Warehouse.objects.filter(pk=data['warehouse']).first()
+        if warehouse is None:
+            raise ValidationError({'warehouse': 'Склад не найден.'})
+        return Response({'moved': ProductUnique.move_bulk(data['values'], warehouse, by=data['by'])})
+
+    @action(methods=('GET',), detail=False)
+    def counts(self, request):
+        """Количество непроданных единиц по товарам и складам, фильтры `?product=1,2&warehouse=3`."""
+        lookups = {}
+        for param in ('product', 'warehouse'):
+            if param in request.query_params:
+                values = request.query_params[param].split(',')
+                if not all(value.strip().isdigit() for value in values):
+                    raise ValidationError({param: 'Ожидается список целых чисел через запятую.'})
+                lookups[f'{param}_ids'] = [int(value) for value in values]
+        return Response(UnitCountSerializer(ProductUnique.get_counts(**lookups), many=True).data)
+
+
+class ProductFeedViewSet(viewsets.GenericViewSet):
+    """
+    Фиды товаров для маркетплейсов: `/products/feeds/yml/` и `/products/feeds/google/`.
+
+    Файл собирается задачей `generate_product_feeds` и отдается из хранилища с заголовком `ETag`,
+    на запрос с совпадающим `If-None-Match` возвращается `304 Not Modified`.
+    """
+    permission_classes = (ReadOnly,)
+    queryset = ProductFeed.objects.exclude(file='')
+    lookup_field = 'name'
+
+    def retrieve(self, request, name=None):
+        feed = self.get_object()
+        etag = quote_etag(feed.etag)
+        if etag in (value.strip() for value in request.headers.get('If-None-Match', '').split(',')):
+            return HttpResponseNotModified(headers={'ETag': etag})
+        try:
+            file = feed.file.open('rb')
+        except FileNotFoundError:
+            raise Http404
+        response = FileResponse(file, content_type=FEED_FORMATS[feed.name].content_type)
+        response['ETag'] = etag
+        return response